@@ -24,11 +24,12 @@
 #
 # ----------------------------------------------------------------------------------------------------
 
-import os, stat, errno, sys, shutil, zipfile, tarfile, tempfile, re, time, datetime, platform, subprocess, socket
+import os, stat, errno, sys, shutil, zipfile, tarfile, tempfile, re, time, datetime, platform, subprocess, socket, random, threading, Queue, glob
 from os.path import join, exists, dirname, basename
 from argparse import ArgumentParser, REMAINDER
 import xml.dom.minidom
-import json, textwrap
+import json, textwrap, hashlib
+import unittest as pyunit
 from collections import OrderedDict
 
 import mx
@@ -37,6 +38,19 @@ from mx_unittest import unittest
 from mx_gate import Task
 import mx_gate
 import mx_jvmci_makefile
+import mx_jvmci_gatecache
+import mx_jvmci_gateschedule
+import mx_jvmci_compilestats
+import mx_jvmci_startupbench
+import mx_jvmci_jol
+import mx_jvmci_igvstats
+import mx_jvmci_cfgstats
+import mx_jvmci_artifacts
+import mx_jvmci_trash
+import mx_jvmci_jdklock
+import mx_jvmci_jdkpool
+import mx_jvmci_pgo
+import mx_jvmci_ccache
 
 _suite = mx.suite('jvmci')
 
@@ -66,7 +80,48 @@ _JVMCI_JDK_TAG = 'jvmci'
 _vm = None
 
 """ The VM builds that will be run by the 'vm' command - default is first in list """
-_vmbuildChoices = ['product', 'fastdebug', 'debug', 'optimized']
+_vmbuildChoices = ['product', 'fastdebug', 'debug', 'optimized', 'product-lto', 'product-native', mx_jvmci_pgo.PGO_VMBUILD]
+
+def _ltoCflags(vm):
+    # The number of parallel LTRANS jobs is passed by the build (see HotSpotBuildTask.build)
+    # as it does not change the generated code and must not make a rebuild necessary
+    return ['-flto', '-fno-fat-lto-objects']
+
+def _nativeCflags(vm):
+    """
+    Gets the flags that tune the generated code for the CPU given by $JVMCI_NATIVE_MARCH
+    (e.g. "haswell"), by default the CPU of the build host.
+    """
+    cpu = mx.get_env('JVMCI_NATIVE_MARCH', 'native')
+    if mx.get_arch() == 'sparcv9':
+        return ['-mcpu=' + cpu]
+    return ['-march=' + cpu]
+
+"""
+The VM builds that are variants of a build of the HotSpot makefiles. A variant is
+built with the make target of its base build and extra compiler flags into an
+output directory of its own and is deployed into a JVMCI JDK of its own. Each
+entry maps a variant to its base build and to a function that returns the extra
+compiler flags for a given VM.
+"""
+_vmbuildVariants = {
+    'product-lto' : ('product', _ltoCflags),
+    'product-native' : ('product', _nativeCflags),
+    mx_jvmci_pgo.PGO_VMBUILD : ('product', mx_jvmci_pgo.cflags),
+}
+
+def _vmbuildMakeTarget(vmbuild):
+    """
+    Gets the HotSpot make target (without VM suffix) that builds 'vmbuild'.
+    """
+    if vmbuild in _vmbuildVariants:
+        return _vmbuildVariants[vmbuild][0]
+    return vmbuild
+
+def _vmbuildVariantCflags(vmbuild, vm):
+    if vmbuild in _vmbuildVariants:
+        return _vmbuildVariants[vmbuild][1](vm)
+    return []
 
 """ The VM build that will be run by the 'vm' command.
     This can be set via the global '--vmbuild' option.
@@ -82,6 +137,9 @@ _installed_jdks = None
 """ Prefix for running the VM. """
 _vm_prefix = None
 
+""" The file to which the resources used by each VM launch are appended as JSON lines. """
+_vm_accounting = None
+
 _make_eclipse_launch = False
 
 _minVersion = mx.VersionSpec('1.8')
@@ -173,13 +231,21 @@ class HotSpotVMJDKDeployedDist(JDKDeployedDist):
             _lib_dbg('jsig') : relativeVmLibDirInJdk(),
         }
         dist = self.dist()
-        with tarfile.open(dist.path, 'r') as tar:
-            for m in tar.getmembers():
-                if m.name in _hs_deploy_map:
-                    targetDir = join(jdkDir, _hs_deploy_map[m.name])
-                    mx.logv('Deploying {} from {} to {}'.format(m.name, dist.name, targetDir))
-                    tar.extract(m, targetDir)
-        updateJvmCfg(jdkDir, get_vm())
+        with mx_jvmci_jdklock.writing(jdkDir):
+            with tarfile.open(dist.path, 'r') as tar:
+                for m in tar.getmembers():
+                    if m.name in _hs_deploy_map:
+                        targetDir = join(jdkDir, _hs_deploy_map[m.name])
+                        mx.logv('Deploying {} from {} to {}'.format(m.name, dist.name, targetDir))
+                        # Extract next to the target and rename it into place so that a
+                        # running VM never sees a partially written library
+                        staging = tempfile.mkdtemp(prefix='.deploy', dir=mx.ensure_dir_exists(targetDir))
+                        try:
+                            tar.extract(m, staging)
+                            os.rename(join(staging, m.name), join(targetDir, m.name))
+                        finally:
+                            shutil.rmtree(staging)
+            updateJvmCfg(jdkDir, get_vm())
 
 """
 List of distributions that are deployed into a JDK by mx.
@@ -338,6 +404,20 @@ def export(args):
             print >> f, json.dumps(d)
         return jsonFileName
 
+    def _writeArchive(tarName, suffix, properties, names):
+        """
+        Creates 'tarName' containing the files in 'names', preceded by the export
+        metadata which includes a manifest of these files. Having the metadata first
+        allows it to be read without decompressing the whole archive.
+        """
+        properties = properties.copy()
+        properties['files'] = [_export_manifest_entry(name) for name in names]
+        with tarfile.open(tarName, 'w:gz') as tar:
+            n = _writeJson(suffix, properties)
+            tar.add(n, n)
+            for name in names:
+                tar.add(name, name)
+
 
     def _genFileName(archivetype, middle):
         idPrefix = infos['revision'] + '_'
@@ -358,20 +438,16 @@ def export(args):
         tarName = _genFileArchPlatformName('basejdk', vmBuild)
         mx.logv("creating basejdk " + tarName)
         vmSet = set()
-        with tarfile.open(tarName, 'w:gz') as tar:
-            for root, _, files in os.walk(jdkDir):
-                if basename(root) in _vmChoices.keys():
-                    # TODO: add some assert to check path assumption
-                    vmSet.add(root)
-                    continue
-
-                for f in files:
-                    name = join(root, f)
-                    # print name
-                    tar.add(name, name)
+        names = []
+        for root, _, files in os.walk(jdkDir):
+            if basename(root) in _vmChoices.keys():
+                # TODO: add some assert to check path assumption
+                vmSet.add(root)
+                continue
 
-            n = _writeJson("basejdk-" + vmBuild, {'vmbuild' : vmBuild})
-            tar.add(n, n)
+            for f in files:
+                names.append(join(root, f))
+        _writeArchive(tarName, "basejdk-" + vmBuild, {'vmbuild' : vmBuild}, names)
 
         # create a separate archive for each VM
         for vm in vmSet:
@@ -380,44 +456,112 @@ def export(args):
             mx.logv("creating vm " + vmTarName)
 
             debugFiles = set()
-            with tarfile.open(vmTarName, 'w:gz') as tar:
-                for root, _, files in os.walk(vm):
-                    for f in files:
-                        # TODO: mac, windows, solaris?
-                        if any(map(f.endswith, [".debuginfo"])):
-                            debugFiles.add(f)
-                        else:
-                            name = join(root, f)
-                            # print name
-                            tar.add(name, name)
-
-                n = _writeJson("vm-" + vmBuild + "-" + bVm, {'vmbuild' : vmBuild, 'vm' : bVm})
-                tar.add(n, n)
+            names = []
+            for root, _, files in os.walk(vm):
+                for f in files:
+                    # TODO: mac, windows, solaris?
+                    if any(map(f.endswith, [".debuginfo"])):
+                        debugFiles.add(f)
+                    else:
+                        names.append(join(root, f))
+            _writeArchive(vmTarName, "vm-" + vmBuild + "-" + bVm, {'vmbuild' : vmBuild, 'vm' : bVm}, names)
 
             if len(debugFiles) > 0:
                 debugTarName = _genFileArchPlatformName('debugfilesvm', vmBuild + '_' + bVm)
                 mx.logv("creating debugfilesvm " + debugTarName)
-                with tarfile.open(debugTarName, 'w:gz') as tar:
-                    for f in debugFiles:
-                        name = join(root, f)
-                        # print name
-                        tar.add(name, name)
-
-                    n = _writeJson("debugfilesvm-" + vmBuild + "-" + bVm, {'vmbuild' : vmBuild, 'vm' : bVm})
-                    tar.add(n, n)
+                names = [join(root, f) for f in debugFiles]
+                _writeArchive(debugTarName, "debugfilesvm-" + vmBuild + "-" + bVm, {'vmbuild' : vmBuild, 'vm' : bVm}, names)
 
     # jvmci directory
     jvmciDirTarName = _genFileName('classfiles', 'javac')
     mx.logv("creating jvmci " + jvmciDirTarName)
-    with tarfile.open(jvmciDirTarName, 'w:gz') as tar:
-        for root, _, files in os.walk("jvmci"):
-            for f in [f for f in files if not f.endswith('.java')]:
-                name = join(root, f)
-                # print name
-                tar.add(name, name)
+    names = []
+    for root, _, files in os.walk("jvmci"):
+        for f in [f for f in files if not f.endswith('.java')]:
+            names.append(join(root, f))
+    _writeArchive(jvmciDirTarName, "jvmci", {'javacompiler' : 'javac'}, names)
+
+def _export_manifest_entry(name):
+    """
+    Gets the path (as stored in a tar file), size, mode and SHA1 digest of the file 'name'.
+    """
+    st = os.stat(name)
+    digest = hashlib.sha1()
+    with open(name, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), ''):
+            digest.update(chunk)
+    return {'path' : name.replace(os.sep, '/').lstrip('/'), 'size' : st.st_size, 'mode' : stat.S_IMODE(st.st_mode), 'sha1' : digest.hexdigest()}
+
+def _read_export_metadata(path):
+    """
+    Reads the metadata of an export from 'path', which is either an archive created by
+    'mx export' or the export-*.json file extracted from one.
+    """
+    if path.endswith('.json'):
+        with open(path) as fp:
+            return json.load(fp)
+    with tarfile.open(path, 'r:*') as tar:
+        for m in tar:
+            if m.isfile() and basename(m.name).startswith('export-') and m.name.endswith('.json'):
+                return json.load(tar.extractfile(m))
+    mx.abort('No export metadata found in ' + path)
+
+def exportdiff(args):
+    """create an archive with the files that changed between two exports
+
+    Compares the file manifest of an earlier export (an archive created by
+    'mx export' or the export-*.json file extracted from one) with that of a
+    newer export archive. The files that were added or whose contents or mode
+    changed are copied from the newer archive into a delta archive, together
+    with an export-delta.json file describing the delta, including the files
+    that must be removed. The earlier contents updated with the delta equal
+    the contents of the newer archive."""
+
+    parser = ArgumentParser(prog='mx exportdiff')
+    parser.add_argument('-o', '--output', help='the delta archive to create (default: <new archive name>.delta.tar.gz)', metavar='<path>')
+    parser.add_argument('old', help='the earlier export archive or its metadata file', metavar='<old>')
+    parser.add_argument('new', help='the newer export archive', metavar='<new>')
+    args = parser.parse_args(args)
 
-        n = _writeJson("jvmci", {'javacompiler' : 'javac'})
-        tar.add(n, n)
+    old = _read_export_metadata(args.old)
+    new = _read_export_metadata(args.new)
+    if 'files' not in old or 'files' not in new:
+        mx.abort('Both exports must have been created with a file manifest')
+
+    oldFiles = dict(((e['path'], e) for e in old['files']))
+    newFiles = dict(((e['path'], e) for e in new['files']))
+    changed = sorted([p for p, e in newFiles.iteritems() if p not in oldFiles or (oldFiles[p]['sha1'], oldFiles[p]['mode']) != (e['sha1'], e['mode'])])
+    removed = sorted([p for p in oldFiles.iterkeys() if p not in newFiles])
+
+    output = args.output
+    if not output:
+        output = args.new[:-len('.tar.gz')] if args.new.endswith('.tar.gz') else args.new
+        output += '.delta.tar.gz'
+    delta = {
+        'base' : old.get('revision'),
+        'revision' : new.get('revision'),
+        'changed' : changed,
+        'removed' : removed,
+        'files' : new['files'],
+    }
+    tmpDir = tempfile.mkdtemp(prefix='exportdiff')
+    try:
+        deltaJson = join(tmpDir, 'export-delta.json')
+        with open(deltaJson, 'w') as fp:
+            print >> fp, json.dumps(delta)
+        wanted = set(changed)
+        with tarfile.open(output, 'w:gz') as dst:
+            dst.add(deltaJson, 'export-delta.json')
+            with tarfile.open(args.new, 'r:*') as src:
+                for m in src:
+                    if m.name in wanted:
+                        dst.addfile(m, src.extractfile(m))
+    finally:
+        shutil.rmtree(tmpDir)
+
+    changedBytes = sum([newFiles[p]['size'] for p in changed])
+    totalBytes = sum([e['size'] for e in new['files']])
+    mx.log('{}: {} changed and {} removed of {} files ({} of {} bytes)'.format(output, len(changed), len(removed), len(new['files']), changedBytes, totalBytes))
 
 def relativeVmLibDirInJdk():
     mxos = mx.get_os()
@@ -454,6 +598,101 @@ def getVmCfgInJdk(jdkDir, jvmCfgFile='jvm.cfg'):
         return join(jdkDir, 'jre', 'lib', mx.get_arch(), jvmCfgFile)
     return join(vmLibDirInJdk(jdkDir), jvmCfgFile)
 
+class JvmCfg:
+    """
+    A parsed jvm.cfg file. Each line starting with '-' declares a VM, e.g.
+    '-server KNOWN' or '-hotspot ALIASED_TO -client'. The first known VM is the
+    default VM of the java launcher. All other lines (e.g. comments) are kept
+    as they are when the file is rewritten.
+    """
+    def __init__(self, path, lines):
+        self.path = path
+        self.lines = lines
+        self.entries = OrderedDict()
+        for line in lines:
+            if line.startswith('-'):
+                parts = line.split()
+                vm = parts[0][1:]
+                if vm not in self.entries:
+                    self.entries[vm] = (parts[1] if len(parts) > 1 else None, parts[2][1:] if len(parts) > 2 else None)
+
+    def known(self):
+        return [vm for vm, (kind, _) in self.entries.iteritems() if kind == 'KNOWN']
+
+    def is_known(self, vm):
+        return self.entries.get(vm, (None, None))[0] == 'KNOWN'
+
+    def aliases(self):
+        return dict(((vm, target) for vm, (kind, target) in self.entries.iteritems() if kind == 'ALIASED_TO'))
+
+    def default_vm(self):
+        known = self.known()
+        return known[0] if known else None
+
+    def with_default_vm(self, vm, aliases):
+        """
+        Gets the lines of a jvm.cfg in which 'vm' is the first known VM, followed by
+        the declarations of 'aliases' for it, replacing any other declaration of these.
+        """
+        declared = ['-' + name + ' ' for name in [vm] + aliases]
+        lines = []
+        written = False
+        for line in self.lines:
+            if line.startswith('#'):
+                lines.append(line)
+                continue
+            if not written:
+                lines.append('-' + vm + ' KNOWN\n')
+                lines += ['-' + alias + ' ALIASED_TO -' + vm + '\n' for alias in aliases]
+                written = True
+            if not any([line.startswith(d) for d in declared]):
+                lines.append(line)
+        if not written:
+            lines.append('-' + vm + ' KNOWN\n')
+            lines += ['-' + alias + ' ALIASED_TO -' + vm + '\n' for alias in aliases]
+        return lines
+
+    def without_vm(self, vm):
+        """Gets the lines of a jvm.cfg without the declarations of 'vm' and of the aliases for it."""
+        declared = ['-' + name + ' ' for name in [vm] + [a for a, target in self.aliases().iteritems() if target == vm]]
+        return [line for line in self.lines if not any([line.startswith(d) for d in declared])]
+
+"""
+The parsed jvm.cfg files indexed by path, each with the (modification time, size,
+inode) of the file it was parsed from.
+"""
+_jvmCfgs = {}
+
+def _jvmCfgKey(path):
+    st = os.stat(path)
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+def getJvmCfg(jdkDir):
+    """
+    Gets the parsed jvm.cfg of 'jdkDir'. The file is only parsed again if it
+    changed since it was last parsed.
+    """
+    jvmCfg = getVmCfgInJdk(jdkDir)
+    if not exists(jvmCfg):
+        mx.abort(jvmCfg + ' does not exist')
+    key = _jvmCfgKey(jvmCfg)
+    cached = _jvmCfgs.get(jvmCfg)
+    if cached and cached[0] == key:
+        return cached[1]
+    with open(jvmCfg) as f:
+        cfg = JvmCfg(jvmCfg, f.readlines())
+    _jvmCfgs[jvmCfg] = (key, cfg)
+    return cfg
+
+def _writeJvmCfg(jdkDir, lines):
+    """
+    Replaces the jvm.cfg of 'jdkDir' with 'lines' in a single atomic rewrite. The
+    caller must hold the exclusive lock on 'jdkDir'.
+    """
+    jvmCfg = getVmCfgInJdk(jdkDir)
+    _writeJdkFile(jvmCfg, ''.join(lines))
+    _jvmCfgs[jvmCfg] = (_jvmCfgKey(jvmCfg), JvmCfg(jvmCfg, lines))
+
 def _jdksDir():
     return os.path.abspath(join(_installed_jdks if _installed_jdks else _suite.dir, 'jdk' + str(get_jvmci_bootstrap_jdk().version)))
 
@@ -471,14 +710,7 @@ def _handle_missing_VM(bld, vm=None):
 def check_VM_exists(vm, jdkDir, build=None):
     if not build:
         build = _vmbuild
-    jvmCfg = getVmCfgInJdk(jdkDir)
-    found = False
-    with open(jvmCfg) as f:
-        for line in f:
-            if line.strip() == '-' + vm + ' KNOWN':
-                found = True
-                break
-    if not found:
+    if not getJvmCfg(jdkDir).is_known(vm):
         _handle_missing_VM(build, vm)
 
 def get_jvmci_jdk_dir(build=None, vmToCheck=None, create=False, deployDists=True):
@@ -491,51 +723,11 @@ def get_jvmci_jdk_dir(build=None, vmToCheck=None, create=False, deployDists=True
     if not build:
         build = _vmbuild
     jdkDir = join(_jdksDir(), build)
-    if create:
-        srcJdk = get_jvmci_bootstrap_jdk().home
-        if not exists(jdkDir):
-            mx.log('Creating ' + jdkDir + ' from ' + srcJdk)
-            shutil.copytree(srcJdk, jdkDir)
-
-            # Make a copy of the default VM so that this JDK can be
-            # reliably used as the bootstrap for a HotSpot build.
-            jvmCfg = getVmCfgInJdk(jdkDir)
-            if not exists(jvmCfg):
-                mx.abort(jvmCfg + ' does not exist')
-
-            defaultVM = None
-            jvmCfgLines = []
-            with open(jvmCfg) as f:
-                for line in f:
-                    if line.startswith('-') and defaultVM is None:
-                        parts = line.split()
-                        if len(parts) == 2:
-                            assert parts[1] == 'KNOWN', parts[1]
-                            defaultVM = parts[0][1:]
-                            jvmCfgLines += ['# default VM is a copy of the unmodified ' + defaultVM + ' VM\n']
-                            jvmCfgLines += ['-original KNOWN\n']
-                        else:
-                            # skip lines which we cannot parse (e.g. '-hotspot ALIASED_TO -client')
-                            mx.log("WARNING: skipping not parsable line \"" + line + "\"")
-                    else:
-                        jvmCfgLines += [line]
-
-            assert defaultVM is not None, 'Could not find default VM in ' + jvmCfg
-            chmodRecursive(jdkDir, JDK_UNIX_PERMISSIONS_DIR)
-            shutil.move(join(vmLibDirInJdk(jdkDir), defaultVM), join(vmLibDirInJdk(jdkDir), 'original'))
-
-            if mx.get_os() != 'windows':
-                os.chmod(jvmCfg, JDK_UNIX_PERMISSIONS_FILE)
-            with open(jvmCfg, 'w') as fp:
-                for line in jvmCfgLines:
-                    fp.write(line)
-
-            # Install a copy of the disassembler library
-            try:
-                hsdis([], copyToDir=vmLibDirInJdk(jdkDir))
-            except SystemExit:
-                pass
-    else:
+    if create and not exists(jdkDir):
+        with mx_jvmci_jdklock.writing(jdkDir):
+            if not exists(jdkDir):
+                _createJdk(jdkDir)
+    elif not create:
         if not exists(jdkDir):
             if _installed_jdks:
                 mx.log("The selected JDK directory does not (yet) exist: " + jdkDir)
@@ -546,63 +738,154 @@ def get_jvmci_jdk_dir(build=None, vmToCheck=None, create=False, deployDists=True
             dist = jdkDist.dist()
             if exists(dist.path):
                 _installDistInJdks(jdkDist)
-
-        # patch 'release' file (append jvmci revision)
-        releaseFile = join(jdkDir, 'release')
-        if exists(releaseFile):
-            releaseFileLines = []
-            with open(releaseFile) as f:
-                for line in f:
-                    releaseFileLines.append(line)
-
-            if mx.get_os() != 'windows':
-                os.chmod(releaseFile, JDK_UNIX_PERMISSIONS_FILE)
-            with open(releaseFile, 'w') as fp:
-                for line in releaseFileLines:
-                    timmedLine = line.strip()
-                    if timmedLine.startswith('SOURCE="') and timmedLine.endswith('"'):
-                        try:
-                            versions = OrderedDict()
-                            for p in timmedLine[len('SOURCE="'):-len('"')].split(' '):
-                                if p:
-                                    idx = p.index(':')
-                                    versions[p[:idx]] = p[idx+1:]
-                            if _suite.vc:
-                                versions['jvmci'] = _suite.vc.parent(_suite.dir)[:12]
-                            else:
-                                versions['jvmci'] = "unknown"
-                            if 'hotspot' in versions:
-                                del versions['hotspot']
-                            fp.write('SOURCE=" ' + ' '.join((k + ":" + v for k, v in versions.iteritems())) + '"' + os.linesep)
-                            mx.logv("Updating " + releaseFile)
-                        except:
-                            mx.warn("Exception while updaing release file")
-                            fp.write(line)
-                    else:
-                        fp.write(line)
+        _updateReleaseFile(jdkDir)
 
     if vmToCheck is not None:
-        jvmCfg = getVmCfgInJdk(jdkDir)
-        found = False
-        with open(jvmCfg) as f:
-            for line in f:
-                if line.strip() == '-' + vmToCheck + ' KNOWN':
-                    found = True
-                    break
-        if not found:
-            _handle_missing_VM(build, vmToCheck)
+        check_VM_exists(vmToCheck, jdkDir, build)
 
     return jdkDir
 
+def _createJdk(jdkDir):
+    """
+    Creates the JVMCI JDK 'jdkDir' from the bootstrap JDK or, if configured, by cloning
+    a template from the JDK pool. The JDK is assembled in a staging directory that is
+    renamed to 'jdkDir' once it is complete.
+    """
+    srcJdk = get_jvmci_bootstrap_jdk().home
+    mx.log('Creating ' + jdkDir + ' from ' + srcJdk)
+    stagingDir = jdkDir + '.staging.' + str(os.getpid())
+    if exists(stagingDir):
+        shutil.rmtree(stagingDir)
+    try:
+        if not mx_jvmci_jdkpool.claim(basename(jdkDir), stagingDir):
+            _populateJdk(srcJdk, stagingDir)
+        os.rename(stagingDir, jdkDir)
+    finally:
+        if exists(stagingDir):
+            shutil.rmtree(stagingDir)
+
+def _populateJdk(srcJdk, jdkDir):
+    shutil.copytree(srcJdk, jdkDir)
+
+    # Make a copy of the default VM so that this JDK can be
+    # reliably used as the bootstrap for a HotSpot build.
+    cfg = getJvmCfg(jdkDir)
+    defaultVM = None
+    jvmCfgLines = []
+    for line in cfg.lines:
+        if line.startswith('-') and defaultVM is None:
+            parts = line.split()
+            if len(parts) == 2:
+                assert parts[1] == 'KNOWN', parts[1]
+                defaultVM = parts[0][1:]
+                jvmCfgLines += ['# default VM is a copy of the unmodified ' + defaultVM + ' VM\n']
+                jvmCfgLines += ['-original KNOWN\n']
+            else:
+                # skip lines which we cannot parse (e.g. '-hotspot ALIASED_TO -client')
+                mx.log("WARNING: skipping not parsable line \"" + line + "\"")
+        else:
+            jvmCfgLines += [line]
+
+    assert defaultVM is not None, 'Could not find default VM in ' + cfg.path
+    chmodRecursive(jdkDir, JDK_UNIX_PERMISSIONS_DIR)
+    shutil.move(join(vmLibDirInJdk(jdkDir), defaultVM), join(vmLibDirInJdk(jdkDir), 'original'))
+    _writeJvmCfg(jdkDir, jvmCfgLines)
+
+    # Install a copy of the disassembler library
+    try:
+        hsdis([], copyToDir=vmLibDirInJdk(jdkDir))
+    except SystemExit:
+        mx.warn('The disassembler library was not installed in ' + jdkDir + ' (see "mx artifactstore")')
+
+"""
+The jvmci revision recorded in the 'release' file of the JVMCI JDKs, computed at
+most once per process (see _jvmciRevision).
+"""
+_jvmci_revision = None
+
+def _jvmciRevision():
+    """
+    Gets the abbreviated revision of the JVMCI suite.
+    """
+    global _jvmci_revision
+    if _jvmci_revision is None:
+        revision = _suite.vc.parent(_suite.dir) if _suite.vc else None
+        _jvmci_revision = revision[:12] if revision else "unknown"
+    return _jvmci_revision
+
+def _updateReleaseFile(jdkDir):
+    """
+    Patches the 'release' file of 'jdkDir' (appends the jvmci revision). The file
+    is only rewritten if its content changes.
+    """
+    releaseFile = join(jdkDir, 'release')
+    if not exists(releaseFile):
+        return
+    with open(releaseFile) as f:
+        oldContent = f.read()
+    releaseFileLines = []
+    for line in oldContent.splitlines(True):
+        timmedLine = line.strip()
+        if timmedLine.startswith('SOURCE="') and timmedLine.endswith('"'):
+            try:
+                versions = OrderedDict()
+                for p in timmedLine[len('SOURCE="'):-len('"')].split(' '):
+                    if p:
+                        idx = p.index(':')
+                        versions[p[:idx]] = p[idx+1:]
+                versions['jvmci'] = _jvmciRevision()
+                if 'hotspot' in versions:
+                    del versions['hotspot']
+                newLine = 'SOURCE=" ' + ' '.join((k + ":" + v for k, v in versions.iteritems())) + '"'
+                if newLine != line.rstrip('\r\n'):
+                    line = newLine + os.linesep
+            except:
+                mx.warn("Exception while updaing release file")
+        releaseFileLines.append(line)
+    newContent = ''.join(releaseFileLines)
+    if newContent != oldContent:
+        mx.logv("Updating " + releaseFile)
+        with mx_jvmci_jdklock.writing(jdkDir):
+            _writeJdkFile(releaseFile, newContent)
+
+def _writeJdkFile(path, content, permissions=JDK_UNIX_PERMISSIONS_FILE):
+    """
+    Replaces the content of the file 'path' in a JVMCI JDK by writing a temporary
+    file next to it and renaming that over 'path', so that concurrent readers
+    (e.g. VMs being launched) see either the old or the new content.
+    """
+    fd, tmp = tempfile.mkstemp(prefix='.' + basename(path), dir=mx.ensure_dir_exists(dirname(path)))
+    try:
+        with os.fdopen(fd, 'w') as fp:
+            fp.write(content)
+        if mx.get_os() != 'windows':
+            os.chmod(tmp, permissions)
+        elif exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+    finally:
+        if exists(tmp):
+            os.remove(tmp)
+
 def _updateInstalledJVMCIOptionsFile(jdkDir):
     jvmciOptions = join(_suite.dir, 'jvmci.options')
-    jreLibDir = join(jdkDir, 'jre', 'lib')
+    installed = join(jdkDir, 'jre', 'lib', 'jvmci', 'options')
+    content = None
     if exists(jvmciOptions):
-        shutil.copy(jvmciOptions, join(jreLibDir, 'jvmci', 'options'))
-    else:
-        toDelete = join(jreLibDir, 'jvmci', 'options')
-        if exists(toDelete):
-            os.unlink(toDelete)
+        with open(jvmciOptions) as fp:
+            content = fp.read()
+    current = None
+    if exists(installed):
+        with open(installed) as fp:
+            current = fp.read()
+    # This is done for every VM launch so only lock the JDK if there is something to do
+    if content == current:
+        return
+    with mx_jvmci_jdklock.writing(jdkDir):
+        if content is not None:
+            _writeJdkFile(installed, content)
+        elif exists(installed):
+            os.unlink(installed)
 
 def copyToJdk(src, dst, permissions=JDK_UNIX_PERMISSIONS_FILE):
     name = os.path.basename(src)
@@ -644,15 +927,7 @@ def _extractJVMCIFiles(jdkJars, jvmciJars, servicesDir, obsoleteCheck):
                                     providers.append(line)
     for service, providers in jvmciServices.iteritems():
         if not obsoleteCheck:
-            fd, tmp = tempfile.mkstemp(prefix=service)
-            f = os.fdopen(fd, 'w+')
-            for provider in providers:
-                f.write(provider + os.linesep)
-            target = join(servicesDir, service)
-            f.close()
-            shutil.move(tmp, target)
-            if mx.get_os() != 'windows':
-                os.chmod(target, JDK_UNIX_PERMISSIONS_FILE)
+            _writeJdkFile(join(servicesDir, service), ''.join([provider + os.linesep for provider in providers]))
         if oldServices and service in oldServices:
             oldServices.remove(service)
 
@@ -672,12 +947,10 @@ def _updateJVMCIFiles(jdkDir, obsoleteCheck=False):
 def _updateJVMCIProperties(jdkDir, compilers):
     jvmciProperties = join(jdkDir, 'jre', 'lib', 'jvmci', 'jvmci.properties')
     def createFile(lines):
-        with open(jvmciProperties, 'w') as fp:
-            header = "# the last definition of a property wins (i.e., it overwrites any earlier definitions)"
-            if header not in lines:
-                print >> fp, header
-            for line in lines:
-                print >> fp, line
+        header = "# the last definition of a property wins (i.e., it overwrites any earlier definitions)"
+        if header not in lines:
+            lines = [header] + lines
+        _writeJdkFile(jvmciProperties, ''.join([line + '\n' for line in lines]))
 
     lines = []
     if exists(jvmciProperties):
@@ -693,14 +966,22 @@ def _updateJVMCIProperties(jdkDir, compilers):
         lines.append("jvmci.compiler=" + compiler)
     createFile(lines)
 
+def _jdkDirs():
+    """
+    Gets the existing JVMCI JDKs.
+    """
+    jdks = _jdksDir()
+    if not exists(jdks):
+        return []
+    # Ignore the lock files and staging directories next to the JDKs
+    return [join(jdks, e) for e in sorted(os.listdir(jdks)) if e in _vmbuildChoices and os.path.isdir(join(jdks, e))]
+
 def _installDistInJdks(deployableDist):
     """
     Installs the jar(s) for a given Distribution into all existing JVMCI JDKs
     """
-    jdks = _jdksDir()
-    if exists(jdks):
-        for e in os.listdir(jdks):
-            jdkDir = join(jdks, e)
+    for jdkDir in _jdkDirs():
+        with mx_jvmci_jdklock.writing(jdkDir):
             deployableDist.deploy(jdkDir)
 
 def _vmbuildFromJdkDir(jdkDir):
@@ -714,11 +995,8 @@ def _vmbuildFromJdkDir(jdkDir):
     return vmbuild
 
 def _check_for_obsolete_jvmci_files():
-    jdks = _jdksDir()
-    if exists(jdks):
-        for e in os.listdir(jdks):
-            jdkDir = join(jdks, e)
-            _updateJVMCIFiles(jdkDir, obsoleteCheck=True)
+    for jdkDir in _jdkDirs():
+        _updateJVMCIFiles(jdkDir, obsoleteCheck=True)
 
 def _getJdkDeployedJars(jdkDir):
     """
@@ -835,10 +1113,14 @@ def _hotspotReplaceResultsVar(m):
         if get_vm().endswith('nojvmci'):
             return '-nojvmci'
         return ''
+    if var == 'variant':
+        if _vmbuild in _vmbuildVariants:
+            return '-' + _vmbuild
+        return ''
     if var == 'buildname':
         return _hotspotGetVariant()
     if var == 'vmbuild':
-        return _vmbuild
+        return _vmbuildMakeTarget(_vmbuild)
     return mx._replaceResultsVar(m)
 
 class HotSpotProject(mx.NativeProject):
@@ -885,6 +1167,9 @@ class HotSpotBuildTask(mx.NativeBuildTask):
             assert self.vm == 'jvmci', self.vm
             buildSuffix = 'jvmci'
 
+        if isWindows and self.vmbuild in _vmbuildVariants:
+            mx.abort('The ' + self.vmbuild + ' VM build is not supported on Windows')
+
         if isWindows:
             t_compilelogfile = mx._cygpathU2W(os.path.join(_suite.dir, "jvmciCompile.log"))
             mksHome = mx.get_env('MKS_HOME', 'C:\\cygwin\\bin')
@@ -922,24 +1207,57 @@ class HotSpotBuildTask(mx.NativeBuildTask):
                 """
                 runCmd.append(name + '=' + (env.get(name, default) if env else default))
 
+            userVars = {}
             if self.args.D:
                 for nv in self.args.D:
                     name, value = nv.split('=', 1)
                     setMakeVar(name.strip(), value)
+                    userVars[name.strip()] = value
 
             setMakeVar('ARCH_DATA_MODEL', '64', env=env)
             setMakeVar('HOTSPOT_BUILD_JOBS', str(cpus), env=env)
             setMakeVar('ALT_BOOTDIR', get_jvmci_bootstrap_jdk().home, env=env)
             # setMakeVar("EXPORT_PATH", jdk)
+            useClang = (mx.get_os() == 'darwin' and platform.mac_ver()[0] != '') or userVars.get('USE_CLANG', env.get('USE_CLANG')) == 'true'
+            variantCflags = _vmbuildVariantCflags(self.vmbuild, self.vm)
+            if self.vmbuild in _vmbuildVariants and self._cflagsChanged(variantCflags):
+                # make does not notice changed flags so compile everything again
+                mx.log('The compiler flags of the ' + self.vmbuild + ' build changed, removing its objects')
+                _cleanHotSpot([self.vm], [self.vmbuild])
+            extraCflags = list(variantCflags)
+            if self.vmbuild == 'product-lto':
+                # Run the link-time optimization in as many parallel jobs as make uses.
+                # -flto=<n> only sets this number and is therefore not recorded above.
+                extraCflags.append('-flto=' + str(cpus))
+            useCcache = mx_jvmci_ccache.enabled()
+            if useCcache:
+                mx_jvmci_ccache.update_env(env)
+                for name, value in mx_jvmci_ccache.make_vars(userVars.get('CC', 'clang' if useClang else 'gcc'), userVars.get('CXX', 'clang++' if useClang else 'g++')).iteritems():
+                    setMakeVar(name, value)
+                if useClang:
+                    # ccache only caches compilations using a Clang precompiled header built without timestamps
+                    setMakeVar('USE_PRECOMPILED_HEADER', '0')
+                extraCflags += mx_jvmci_ccache.cflags(useClang)
             if mx.get_os() == 'linux' and platform.processor() == 'sparc64':
                 # SPARC/Linux
                 setMakeVar("DEBUG_BINARIES", "true", env=env)
-                setMakeVar("EXTRA_CFLAGS", "-Wno-conversion-null -Wno-int-to-pointer-cast -Wno-unused-function -fno-tree-loop-distribute-patterns -fno-schedule-insns", env=env)
+                extraCflags = ["-Wno-conversion-null -Wno-int-to-pointer-cast -Wno-unused-function -fno-tree-loop-distribute-patterns -fno-schedule-insns"] + extraCflags
+            if extraCflags:
+                # The flags of the user come last so that they take precedence. The makefiles
+                # also pass EXTRA_CFLAGS to the linker of libjvm.
+                if env.get('EXTRA_CFLAGS'):
+                    extraCflags.append(env['EXTRA_CFLAGS'])
+                env['EXTRA_CFLAGS'] = ' '.join(extraCflags)
+                setMakeVar("EXTRA_CFLAGS", env['EXTRA_CFLAGS'], env=env)
 
             setMakeVar('MAKE_VERBOSE', 'y' if mx._opts.verbose else '')
+            if self.vmbuild in _vmbuildVariants:
+                # Derived from the ALT_OUTPUTDIR of the user, if any (see _hotspotOutputDir)
+                setMakeVar('ALT_OUTPUTDIR', _hotspotOutputDir(self.vm, self.vmbuild))
+            elif self.vm.endswith('nojvmci'):
+                setMakeVar('ALT_OUTPUTDIR', _hotspotOutputDir(self.vm), env=env)
             if self.vm.endswith('nojvmci'):
                 setMakeVar('INCLUDE_JVMCI', 'false')
-                setMakeVar('ALT_OUTPUTDIR', join(_suite.dir, 'build-nojvmci', _hotspotOs(mx.get_os())), env=env)
             else:
                 version = _suite.release_version()
                 setMakeVar('USER_RELEASE_SUFFIX', 'jvmci-' + version)
@@ -977,21 +1295,48 @@ class HotSpotBuildTask(mx.NativeBuildTask):
             if len(envPrefix):
                 mx.log('env ' + envPrefix + ' \\')
 
-            runCmd.append(self.vmbuild + buildSuffix)
+            runCmd.append(_vmbuildMakeTarget(self.vmbuild) + buildSuffix)
             runCmd.append("docs")
             # runCmd.append("export_" + build)
 
             if not mx._opts.verbose:
                 mx.log(' '.join(runCmd))
                 mx.log('--------------------------------------------------------')
+            cacheStats = mx_jvmci_ccache.stats(env) if useCcache else None
             mx.run(runCmd, err=filterXusage, env=env)
+            if useCcache:
+                mx_jvmci_ccache.report('{}-{}'.format(self.vm, self.vmbuild), cacheStats, mx_jvmci_ccache.stats(env))
+            if self.vmbuild in _vmbuildVariants:
+                stamp = self._cflagsStamp()
+                if stamp:
+                    with open(stamp, 'w') as fp:
+                        fp.write(' '.join(variantCflags))
         self._newestOutput = None
 
+    def _cflagsStamp(self):
+        """
+        Gets the file recording the compiler flags with which the objects of a VM build
+        variant were compiled or None if they have not been built. The file is in the
+        directory of the objects (e.g. linux_amd64_compiler2/product) so that it is
+        removed with them by _cleanHotSpot.
+        """
+        dirs = glob.glob(join(_hotspotOutputDir(self.vm, self.vmbuild), '*_' + _hotspotGetVariant(self.vm), _vmbuildMakeTarget(self.vmbuild)))
+        return join(dirs[0], 'jvmci.cflags') if dirs else None
+
+    def _cflagsChanged(self, cflags):
+        stamp = self._cflagsStamp()
+        if not stamp or not exists(stamp):
+            return False
+        with open(stamp) as fp:
+            return fp.read() != ' '.join(cflags)
+
     def needsBuild(self, newestInput):
         # Skip super (NativeBuildTask) because it always returns true
         (superNeeds, superReason) = mx.ProjectBuildTask.needsBuild(self, newestInput)
         if superNeeds:
             return (superNeeds, superReason)
+        if self.vmbuild in _vmbuildVariants and self._cflagsChanged(_vmbuildVariantCflags(self.vmbuild, self.vm)):
+            return (True, 'the compiler flags of the {} build changed'.format(self.vmbuild))
         newestOutput = self.newestOutput()
         for d in ['src', 'make', join('jvmci', 'jdk.vm.ci.hotspot', 'src_gen', 'hotspot')]:  # TODO should this be replaced by a dependency to the project?
             for root, dirnames, files in os.walk(join(_suite.dir, d)):
@@ -1022,6 +1367,10 @@ class HotSpotBuildTask(mx.NativeBuildTask):
     def clean(self, forBuild=False):
         if forBuild:  # Let make handle incremental builds
             return
+        if mx.get_os() not in ['windows', 'cygwin']:
+            _cleanHotSpot()
+            self._newestOutput = None
+            return
         def handleRemoveReadonly(func, path, exc):
             excvalue = exc[1]
             if mx.get_os() == 'windows' and func in (os.rmdir, os.remove) and excvalue.errno == errno.EACCES:
@@ -1048,6 +1397,87 @@ class HotSpotBuildTask(mx.NativeBuildTask):
         rmIfExists(_jdksDir())
         self._newestOutput = None
 
+def _hotspotOutputDir(vm, vmbuild=None):
+    """
+    Gets the directory in which the HotSpot makefiles build 'vm'. The VM build
+    variants (see _vmbuildVariants) are built in directories of their own.
+    """
+    name = 'build'
+    if vm.endswith('nojvmci'):
+        name += '-nojvmci'
+    if vmbuild in _vmbuildVariants:
+        name += '-' + vmbuild
+        userOutputDir = os.environ.get('ALT_OUTPUTDIR')
+        if userOutputDir:
+            # The variants are built next to the directory given by the user as they
+            # use the make targets of the builds in it
+            return userOutputDir.rstrip(os.sep) + name[len('build'):]
+    elif not vm.endswith('nojvmci'):
+        return os.environ.get('ALT_OUTPUTDIR', join(_suite.dir, name, _hotspotOs(mx.get_os())))
+    return join(_suite.dir, name, _hotspotOs(mx.get_os()))
+
+def _removeFromJvmCfg(jdkDir, vm):
+    if not exists(getVmCfgInJdk(jdkDir)):
+        return
+    cfg = getJvmCfg(jdkDir)
+    if vm in cfg.entries:
+        _writeJvmCfg(jdkDir, cfg.without_vm(vm))
+
+def _cleanHotSpot(vms=None, builds=None, background=True):
+    """
+    Removes the HotSpot build output and the JVMCI JDKs. The directories are renamed
+    aside so that a new build can start immediately and are then deleted in parallel,
+    in a detached process if 'background' is True. If 'vms' or 'builds' is given,
+    only the build output of those VMs and builds and their libraries in the JVMCI
+    JDKs are removed.
+    """
+    moved = []
+    if vms is None and builds is None:
+        targets = [_hotspotOutputDir(vm, vmbuild) for vm in ['jvmci', 'server-nojvmci'] for vmbuild in [None] + sorted(_vmbuildVariants.iterkeys())] + [_jdksDir()]
+    else:
+        targets = []
+        for vm in vms or [v for v in _vmChoices.iterkeys() if v != 'original']:
+            if vm == 'original':
+                mx.abort('The original VM is a copy of the VM in the bootstrap JDK and cannot be cleaned separately')
+            variant = _hotspotGetVariant(vm)
+            for vmbuild in builds or _vmbuildChoices:
+                targets += glob.glob(join(_hotspotOutputDir(vm, vmbuild), '*_' + variant, _vmbuildMakeTarget(vmbuild)))
+                jdkDir = join(_jdksDir(), vmbuild)
+                if exists(jdkDir):
+                    with mx_jvmci_jdklock.writing(jdkDir):
+                        _removeFromJvmCfg(jdkDir, vm)
+                        # Renamed aside under the lock, deleted below
+                        moved.append(mx_jvmci_trash.move_aside(join(vmLibDirInJdk(jdkDir), vm)))
+
+    moved = [m for m in moved if m]
+    for target in targets:
+        moved += mx_jvmci_trash.leftovers(target)
+        trash = mx_jvmci_trash.move_aside(target)
+        if trash:
+            mx.logv('Removing ' + target)
+            moved.append(trash)
+    workers = max(8, 2 * mx.cpu_count())
+    if background:
+        mx_jvmci_trash.delete_in_background(moved, workers)
+    else:
+        errors = mx_jvmci_trash.delete_trees(moved, workers)
+        if errors:
+            mx.abort('Could not delete all files: ' + str(errors[0]))
+
+def hsclean(args):
+    """remove HotSpot build output and JVMCI JDKs quickly
+
+    Renames the output directories aside and deletes them in a background
+    process (unless --wait is given), so that a new build can start right
+    away. With --vm or --vmbuild, only the output of the given VMs and builds
+    is removed instead of all of it."""
+    parser = ArgumentParser(prog='mx hsclean')
+    parser.add_argument('--vm', action='append', dest='vms', choices=[v for v in _vmChoices.keys() if v != 'original'], help='only clean the VM <vm> (may be repeated)', metavar='<vm>')
+    parser.add_argument('--vmbuild', action='append', dest='builds', choices=_vmbuildChoices, help='only clean the VM build <build> (may be repeated)', metavar='<build>')
+    parser.add_argument('--wait', action='store_true', help='delete the output in the foreground')
+    args = parser.parse_args(args)
+    _cleanHotSpot(args.vms, args.builds, background=not args.wait)
+
 def build(args, vm=None):
     """build the VM binary
 
@@ -1078,41 +1508,11 @@ def build(args, vm=None):
 
 
 def updateJvmCfg(jdkDir, vm):
-    jvmCfg = getVmCfgInJdk(jdkDir)
-    if not exists(jvmCfg):
-        mx.abort(jvmCfg + ' does not exist')
-
-    prefix = '-' + vm + ' '
-    vmKnown = prefix + 'KNOWN\n'
-    lines = []
-    found = False
-    with open(jvmCfg) as f:
-        for line in f:
-            if line.strip() == vmKnown.strip():
-                found = True
-            lines.append(line)
-
-    if not found:
-        mx.log('Prepending "' + prefix + 'KNOWN" to ' + jvmCfg)
-        if mx.get_os() != 'windows':
-            os.chmod(jvmCfg, JDK_UNIX_PERMISSIONS_FILE)
-        with open(jvmCfg, 'w') as f:
-            written = False
-            for line in lines:
-                if line.startswith('#'):
-                    f.write(line)
-                    continue
-                if not written:
-                    f.write(vmKnown)
-                    for alias, aliased in _vmAliases.iteritems():
-                        if vm == aliased:
-                            f.write('-' + alias + ' ALIASED_TO -' + aliased + '\n')
-                    written = True
-                if line.startswith(prefix):
-                    line = vmKnown
-                    if written:
-                        continue
-                f.write(line)
+    with mx_jvmci_jdklock.writing(jdkDir):
+        cfg = getJvmCfg(jdkDir)
+        if not cfg.is_known(vm):
+            mx.log('Prepending "-' + vm + ' KNOWN" to ' + cfg.path)
+            _writeJvmCfg(jdkDir, cfg.with_default_vm(vm, sorted([alias for alias, aliased in _vmAliases.iteritems() if aliased == vm])))
 
 mx_gate.add_jacoco_includes(['jdk.vm.ci.*'])
 
@@ -1152,17 +1552,140 @@ def _unittest_vm_launcher(vmArgs, mainClass, mainClassArgs):
 mx_unittest.add_config_participant(_unittest_config_participant)
 mx_unittest.set_vm_launcher('JVMCI VM launcher', _unittest_vm_launcher)
 
+def _changed_files(since):
+    """
+    Gets the paths (relative to the suite directory) of the files that differ between
+    the git revision 'since' and the working directory, including untracked files.
+    """
+    try:
+        changed = subprocess.check_output(['git', 'diff', '--name-only', '--relative', since], cwd=_suite.dir)
+        changed += subprocess.check_output(['git', 'ls-files', '--others', '--exclude-standard'], cwd=_suite.dir)
+    except (OSError, subprocess.CalledProcessError) as e:
+        mx.abort('Could not determine the files changed since ' + since + ' with git: ' + str(e))
+    return sorted(frozenset((f for f in changed.splitlines() if f)))
+
+def _affected_test_classes(changedFiles, coverage):
+    """
+    Determines the test classes affected by 'changedFiles'. A Java project is affected if it
+    contains a changed file or (transitively) depends on a project that does. The test classes
+    of an affected project are selected unless 'coverage' records which source files a test
+    class covers, in which case it is only selected if one of those files or its own source
+    file changed.
+
+    Returns None if a change cannot be attributed to a Java project (e.g. a change to suite.py
+    or to the HotSpot sources), meaning that the selection must not be narrowed.
+    """
+    projects = [p for p in _suite.projects if p.isJavaProject()]
+    projectDirs = [(os.path.relpath(p.dir, _suite.dir) + os.sep, p) for p in projects]
+    changedProjects = set()
+    for f in changedFiles:
+        owners = [p for d, p in projectDirs if f.startswith(d)]
+        if not owners:
+            mx.log('Change to ' + f + ' cannot be mapped to a Java project')
+            return None
+        changedProjects.update(owners)
+
+    affected = []
+    for p in projects:
+        deps = set()
+        mx.walk_deps(roots=[p], visit=lambda dep, edge: deps.add(dep), ignoredEdges=[mx.DEP_EXCLUDED])
+        if deps & changedProjects:
+            affected.append(p)
+    mx.logv('Projects affected by the change: ' + ', '.join((p.name for p in affected)))
+
+    changed = frozenset(changedFiles)
+    selected = []
+    for p in affected:
+        for testClass, source in p.find_classes_with_annotations(None, ['@Test'], includeInnerClasses=True).iteritems():
+            covered = coverage.get(testClass)
+            if covered is not None and os.path.relpath(source, _suite.dir) not in changed and not changed.intersection(covered):
+                mx.logv('Skipping ' + testClass + ' as it does not cover any changed file')
+                continue
+            selected.append(testClass)
+    return sorted(selected)
+
 def shortunittest(args):
-    """alias for 'unittest --whitelist test/whitelist_shortunittest.txt'"""
+    """alias for 'unittest --whitelist test/whitelist_shortunittest.txt'
+
+    With --changed, the fixed whitelist is replaced by the test classes in the
+    projects affected by the files changed since a git revision (default: HEAD)
+    according to the project dependencies in suite.py. If a per-test coverage
+    file exists (a JSON object mapping a test class name to the suite relative
+    paths of the source files it covers), it is used to further narrow the
+    selection."""
+
+    parser = ArgumentParser(prog='mx shortunittest', add_help=False)
+    parser.add_argument('--changed', action='store_true', help='only run the tests affected by changed files')
+    parser.add_argument('--since', action='store', default='HEAD', help='git revision the changes are relative to (default: HEAD)', metavar='<rev>')
+    parser.add_argument('--coverage', action='store', help='per-test coverage file (default: <output root>/shortunittest-coverage.json)', metavar='<path>')
+    selection, args = parser.parse_known_args(args)
+
+    whitelist = 'test/whitelist_shortunittest.txt'
+    if selection.changed:
+        coverageFile = selection.coverage or join(_suite.get_output_root(), 'shortunittest-coverage.json')
+        coverage = {}
+        if exists(coverageFile):
+            try:
+                with open(coverageFile) as fp:
+                    coverage = json.load(fp)
+            except ValueError as e:
+                mx.abort('Error parsing {0}:\n{1}'.format(coverageFile, e))
+        elif selection.coverage:
+            mx.abort('Coverage file does not exist: ' + coverageFile)
 
-    args = ['--whitelist', 'test/whitelist_shortunittest.txt'] + args
+        changedFiles = _changed_files(selection.since)
+        if not changedFiles:
+            mx.log('No files changed since ' + selection.since + ' - no tests to run')
+            return
+        testClasses = _affected_test_classes(changedFiles, coverage)
+        if testClasses is None:
+            mx.log('Falling back to ' + whitelist)
+        elif not testClasses:
+            mx.log('No tests are affected by the ' + str(len(changedFiles)) + ' changed file(s)')
+            return
+        else:
+            mx.log('Running ' + str(len(testClasses)) + ' test class(es) affected by the ' + str(len(changedFiles)) + ' changed file(s)')
+            whitelist = join(_suite.get_output_root(), 'shortunittest-changed.txt')
+            mx.ensure_dir_exists(dirname(whitelist))
+            with open(whitelist, 'w') as fp:
+                for testClass in testClasses:
+                    print >> fp, testClass
+
+    args = ['--whitelist', whitelist] + args
     mx_unittest.unittest(args)
 
+def pyunittest(args):
+    """run the unit tests of the Python code in mx.jvmci
+
+    The tests are the test_*.py modules in mx.jvmci/tests. If filters are
+    given, only the tests whose name contains one of them are run."""
+
+    parser = ArgumentParser(prog='mx pyunittest')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the name of each test')
+    parser.add_argument('filters', nargs='*', help='substrings of the names of the tests to run', metavar='<filter>')
+    args = parser.parse_args(args)
+
+    testsDir = join(_suite.mxDir, 'tests')
+    def _tests(suite):
+        for t in suite:
+            if isinstance(t, pyunit.TestSuite):
+                for tt in _tests(t):
+                    yield tt
+            else:
+                yield t
+    tests = [t for t in _tests(pyunit.defaultTestLoader.discover(testsDir, pattern='test_*.py', top_level_dir=testsDir))
+             if not args.filters or any(f in t.id() for f in args.filters)]
+    if not tests:
+        mx.abort('No tests matched ' + ' '.join(args.filters))
+    result = pyunit.TextTestRunner(verbosity=2 if args.verbose else 1).run(pyunit.TestSuite(tests))
+    if not result.wasSuccessful():
+        mx.abort('{} of {} Python unit tests failed'.format(len(result.failures) + len(result.errors), result.testsRun))
+
 def buildvms(args):
     """build one or more VMs in various configurations"""
 
     vmsDefault = ','.join(_vmChoices.keys())
-    vmbuildsDefault = ','.join(_vmbuildChoices)
+    vmbuildsDefault = ','.join([b for b in _vmbuildChoices if b not in _vmbuildVariants])
 
     parser = ArgumentParser(prog='mx buildvms')
     parser.add_argument('--vms', help='a comma separated list of VMs to build (default: ' + vmsDefault + ')', metavar='<args>', default=vmsDefault)
@@ -1208,55 +1731,264 @@ def buildvms(args):
 
 
 def _jvmci_gate_runner(args, tasks):
+    # Tasks building or running a VM hold VM_RESOURCE and are therefore run one at a
+    # time, leaving two CPUs of the budget for the tasks that can run alongside them
+    scheduler = mx_jvmci_gateschedule.GateScheduler(tasks, args.cpuBudget, mx_jvmci_gateschedule.history_file())
+    buildCpus = max(1, args.cpuBudget - 2)
+    VM_RESOURCE = mx_jvmci_gateschedule.VM_RESOURCE
+    JACOCO_RESOURCE = mx_jvmci_gateschedule.JACOCO_RESOURCE
+
     if mx.get_arch() != 'sparcv9':
-        with Task('Check jvmci.make in sync with suite.py', tasks) as t:
-            if t:
-                jvmciMake = join(_suite.dir, 'make', 'jvmci.make')
-                if mx_jvmci_makefile.build_makefile(['-o', jvmciMake]) != 0:
-                    t.abort('Rerun "mx makefile -o ' + jvmciMake + ' and check-in the modified ' + jvmciMake)
+        def _checkMakefile(t):
+            jvmciMake = join(_suite.dir, 'make', 'jvmci.make')
+            if mx_jvmci_makefile.is_up_to_date(jvmciMake):
+                mx.log('Inputs of ' + jvmciMake + ' unchanged since it was last generated')
+            elif mx_jvmci_makefile.build_makefile(['-o', jvmciMake]) != 0:
+                t.abort('Rerun "mx makefile -o ' + jvmciMake + ' and check-in the modified ' + jvmciMake)
+        # Generating the makefile resolves the JDK (mx.get_jdk), which depends on the VM
+        # selected by the tasks changing it (see VM)
+        scheduler.add('Check jvmci.make in sync with suite.py', _checkMakefile, resources=[VM_RESOURCE])
+
+    scheduler.add('Python UnitTests', lambda t: pyunittest([]))
+
+    # The inputs of the HotSpot builds and JVMCI unit tests for the gate task cache
+    hsInputs = [join(_suite.dir, d) for d in ['src', 'make', 'jvmci', 'agent']] + [join(_suite.mxDir, f) for f in os.listdir(_suite.mxDir) if f.endswith('.py')]
+    hsExcludes = [join(_suite.dir, 'src', 'share', 'tools')]
+    def _runCached(t, action, values, paths=hsInputs, excludes=hsExcludes):
+        # The builds and tests also depend on the JDK the JVMCI JDKs are created from
+        bootstrapJdk = get_jvmci_bootstrap_jdk()
+        values = values + [bootstrapJdk.home, str(bootstrapJdk.version)]
+        mx_jvmci_gatecache.run_cached(t, action, args, paths=paths, excludes=excludes, values=values)
+
+    def _builtVMs(vms, builds):
+        """
+        Gets the libjvm files built for 'vms' and 'builds' such that a cached build
+        task is re-run if its results have been removed.
+        """
+        return [join(vmLibDirInJdk(join(_jdksDir(), b)), vm, mx.add_lib_suffix(mx.add_lib_prefix('jvm'))) for vm in vms for b in builds]
 
     # Build server-hosted-jvmci now so we can run the unit tests
-    with Task('BuildHotSpotJVMCIHosted: product', tasks) as t:
-        if t: buildvms(['--vms', 'server', '--builds', 'product'])
+    def _buildHosted(t):
+        _runCached(t, lambda: buildvms(['--vms', 'server', '--builds', 'product']), ['server', 'product'], paths=hsInputs + _builtVMs(['server'], ['product']))
+    scheduler.add('BuildHotSpotJVMCIHosted: product', _buildHosted, cpus=buildCpus, resources=[VM_RESOURCE])
 
     # Run unit tests on server-hosted-jvmci
-    with VM('server', 'product'):
-        with Task('JVMCI UnitTests: hosted-product', tasks) as t:
-            if t: unittest(['--suite', 'jvmci', '--enable-timing', '--verbose', '--fail-fast'])
+    def _unittests(t):
+        unittestArgs = ['--suite', 'jvmci', '--enable-timing', '--verbose', '--fail-fast']
+        with VM('server', 'product'):
+            _runCached(t, lambda: unittest(unittestArgs), ['server', 'product'] + unittestArgs)
+    scheduler.add('JVMCI UnitTests: hosted-product', _unittests, deps=['BuildHotSpotJVMCIHosted: product'], resources=[VM_RESOURCE, JACOCO_RESOURCE])
 
     # Build the other VM flavors
-    with Task('BuildHotSpotJVMCIOthers: fastdebug,product', tasks) as t:
-        if t: buildvms(['--vms', 'jvmci,server', '--builds', 'fastdebug,product'])
-
-    with Task('CleanAndBuildIdealGraphVisualizer', tasks, disableJacoco=True) as t:
-        if t and platform.processor() != 'sparc':
-            buildxml = mx._cygpathU2W(join(_suite.dir, 'src', 'share', 'tools', 'IdealGraphVisualizer', 'build.xml'))
-            mx.run(['ant', '-f', buildxml, '-q', 'clean', 'build'], env=_igvBuildEnv())
+    def _buildOthers(t):
+        _runCached(t, lambda: buildvms(['--vms', 'jvmci,server', '--builds', 'fastdebug,product']), ['jvmci,server', 'fastdebug,product'],
+                   paths=hsInputs + _builtVMs(['jvmci', 'server'], ['fastdebug', 'product']))
+    scheduler.add('BuildHotSpotJVMCIOthers: fastdebug,product', _buildOthers, cpus=buildCpus, resources=[VM_RESOURCE])
+
+    def _buildIGV(t):
+        if platform.processor() != 'sparc':
+            igvDir = join(_suite.dir, 'src', 'share', 'tools', 'IdealGraphVisualizer')
+            buildxml = mx._cygpathU2W(join(igvDir, 'build.xml'))
+            # The IGV build output is excluded from the inputs of the task
+            igvExcludes = [join(root, d) for root, dirnames, _ in os.walk(igvDir) for d in dirnames if d in ['build', 'dist']]
+            _runCached(t, lambda: mx.run(['ant', '-f', buildxml, '-q', 'clean', 'build'], env=_igvBuildEnv()), [], paths=[igvDir], excludes=igvExcludes)
+    scheduler.add('CleanAndBuildIdealGraphVisualizer', _buildIGV, resources=[JACOCO_RESOURCE], disableJacoco=True)
 
     # Prevent JVMCI modifications from breaking the standard builds
     if args.buildNonJVMCI:
-        with Task('BuildHotSpotVarieties', tasks, disableJacoco=True) as t:
-            if t:
+        def _buildVarieties(t):
+            def _build():
                 buildvms(['--vms', 'client,server', '--builds', 'fastdebug,product'])
                 if mx.get_os() not in ['windows', 'cygwin']:
                     buildvms(['--vms', 'server-nojvmci', '--builds', 'product,optimized'])
+            builtVMs = _builtVMs(['client', 'server'], ['fastdebug', 'product'])
+            if mx.get_os() not in ['windows', 'cygwin']:
+                builtVMs += _builtVMs(['server-nojvmci'], ['product', 'optimized'])
+            _runCached(t, _build, [mx.get_os()], paths=hsInputs + builtVMs)
+        scheduler.add('BuildHotSpotVarieties', _buildVarieties, cpus=buildCpus, resources=[VM_RESOURCE, JACOCO_RESOURCE], disableJacoco=True)
+
+    scheduler.run()
 
 mx_gate.add_gate_runner(_suite, _jvmci_gate_runner)
 mx_gate.add_gate_argument('-g', '--only-build-jvmci', action='store_false', dest='buildNonJVMCI', help='only build the JVMCI VM')
+mx_gate.add_gate_argument('--no-task-cache', action='store_false', dest='taskCache', help='run all tasks, including those that passed before with the same inputs')
+mx_gate.add_gate_argument('--cpu-budget', type=int, dest='cpuBudget', default=mx.cpu_count(), help='number of CPUs shared by the JVMCI gate tasks running at once; 1 runs them one after the other (default: ' + str(mx.cpu_count()) + ')', metavar='<n>')
+
+""" The flags from which 'mx stress --random-flags' picks one alternative per group. """
+_stressFlagGroups = [
+    ['-XX:+UseSerialGC', '-XX:+UseParallelGC', '-XX:+UseG1GC'],
+    ['-XX:+UseCompressedOops', '-XX:-UseCompressedOops'],
+    ['-XX:+BackgroundCompilation', '-XX:-BackgroundCompilation'],
+]
+
+""" Like _stressFlagGroups but only for the VMs including C2 and VM builds that include develop flags. """
+_stressDevelopFlagGroups = [
+    ['-XX:-StressLCM', '-XX:+StressLCM'],
+    ['-XX:-StressGCM', '-XX:+StressGCM'],
+]
+
+_deoptalotArgs = ['-XX:-TieredCompilation', '-XX:+DeoptimizeALot', '-XX:+VerifyOops']
+
+def _stress_run_memory(vmArgs):
+    """
+    Estimates the memory (in MB) used by a VM started with 'vmArgs'. This is the
+    maximum heap size (1 GB if not specified) plus an allowance for metaspace,
+    code cache and native memory.
+    """
+    heap = 1024
+    for arg in vmArgs:
+        m = re.match(r'^-Xmx(\d+)([kKmMgG]?)$', arg)
+        if m:
+            unit = m.group(2).lower()
+            heap = int(m.group(1)) * {'k' : 1.0 / 1024, 'm' : 1, 'g' : 1024, '' : 1.0 / (1024 * 1024)}[unit]
+    return int(heap) + 256
+
+def _run_stress(runs, jobs, memory=None, keepGoing=False):
+    """
+    Runs the bootstraps described by 'runs', a list of (vm, vmbuild, vmArgs) tuples,
+    with at most 'jobs' of them at once and the estimated memory of the running VMs
+    not exceeding 'memory' MB. Each call has its own directory under
+    <output root>/stress, so that concurrent calls do not interfere, with a directory
+    per run holding its output and any hs_err files. The directories of successful
+    runs are deleted. Unless 'keepGoing' is True, no further runs are started after the
+    first failure.
+
+    Returns the list of (vm, vmbuild, command, runDir) tuples describing the failed runs.
+    """
+    # Initialize the JDKs up front as this may need user interaction
+    for vm, vmbuild in frozenset(((vm, vmbuild) for vm, vmbuild, _ in runs)):
+        jdk = get_jvmci_jdk(vmbuild)
+        check_VM_exists(vm, jdk.home, vmbuild)
+
+    if memory:
+        perRun = max((_stress_run_memory(vmArgs) for _, _, vmArgs in runs))
+        if memory < perRun:
+            mx.abort('A memory budget of {} MB is too small for a VM needing {} MB'.format(memory, perRun))
+        jobs = min(jobs, memory / perRun)
+    jobs = max(1, min(jobs, len(runs)))
+
+    stressDir = tempfile.mkdtemp(prefix=time.strftime('%Y%m%d-%H%M%S-'), dir=mx.ensure_dir_exists(join(_suite.get_output_root(), 'stress')))
+    pending = Queue.Queue()
+    for i, run in enumerate(runs):
+        pending.put((i, ) + run)
+    failures = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def _worker():
+        while not stop.is_set():
+            try:
+                i, vm, vmbuild, vmArgs = pending.get_nowait()
+            except Queue.Empty:
+                return
+            runDir = mx.ensure_dir_exists(join(stressDir, '{}-{}-{}'.format(vm, vmbuild, i)))
+            args = ['-XX:ErrorFile=' + join(runDir, 'hs_err_pid%p.log')] + vmArgs + ['-version']
+            command = ' '.join(['mx', '--vm', vm, '--vmbuild', vmbuild, 'vm'] + args)
+            with open(join(runDir, 'output.log'), 'w') as log:
+                def _out(line):
+                    with lock:
+                        log.write(line if line.endswith('\n') else line + '\n')
+                start = time.time()
+                try:
+                    exitCode = run_vm(args, vm=vm, vmbuild=vmbuild, nonZeroIsFatal=False, out=_out, err=_out, cwd=runDir if _vm_cwd is None else None)
+                except (SystemExit, Exception) as e:
+                    # mx.abort raises SystemExit, which would otherwise silently end this thread
+                    _out('Could not run the VM: ' + str(e))
+                    exitCode = -1
+            duration = datetime.timedelta(seconds=time.time() - start)
+            with lock:
+                if exitCode == 0:
+                    mx.log('PASSED: ' + command + '\t[' + str(duration) + ']')
+                    shutil.rmtree(runDir)
+                else:
+                    mx.log('FAILED: ' + command + '\t[' + str(duration) + ']')
+                    with open(join(runDir, 'command.txt'), 'w') as fp:
+                        print >> fp, command
+                    failures.append((vm, vmbuild, command, runDir))
+                    if not keepGoing:
+                        stop.set()
+
+    mx.log('Running {} bootstrap(s) with {} job(s)'.format(len(runs), jobs))
+    workers = [threading.Thread(target=_worker) for _ in range(jobs)]
+    for w in workers:
+        w.daemon = True
+        w.start()
+    for w in workers:
+        # Join with a timeout so that the main thread remains responsive to Ctrl-C
+        while w.is_alive():
+            w.join(1)
+    if not failures and not os.listdir(stressDir):
+        os.rmdir(stressDir)
+    return failures
+
+def stress(args):
+    """bootstrap VMs concurrently with DeoptimizeALot and VerifyOops on
+
+    Runs the bootstraps for every combination of the selected VMs and VM
+    builds in parallel within the given CPU and memory budget. The output
+    and hs_err files of failed runs are kept in a directory per invocation
+    under <output root>/stress."""
+
+    parser = ArgumentParser(prog='mx stress')
+    parser.add_argument('-n', '--count', type=int, default=1, help='number of bootstraps per VM and VM build (default: 1)', metavar='<n>')
+    parser.add_argument('--vms', help='a comma separated list of VMs to run (default: the selected VM)', metavar='<args>')
+    parser.add_argument('--builds', help='a comma separated list of VM builds to run (default: the selected VM build)', metavar='<args>')
+    parser.add_argument('-j', '--jobs', type=int, default=mx.cpu_count(), help='maximum number of VMs running at once (default: ' + str(mx.cpu_count()) + ')', metavar='<n>')
+    parser.add_argument('--memory', type=int, help='memory in MB available to the running VMs (default: unlimited)', metavar='<MB>')
+    parser.add_argument('--random-flags', action='store_true', help='add a random combination of GC, compressed oops and compiler stress flags to each run')
+    parser.add_argument('--seed', type=long, help='seed for choosing random flags (default: current time)', metavar='<n>')
+    parser.add_argument('-k', '--keep-going', action='store_true', help='do not stop after the first failure')
+    parser.add_argument('vmArgs', nargs=REMAINDER, metavar='VM options...')
+    args = parser.parse_args(args)
+    vmArgs = args.vmArgs[1:] if args.vmArgs[:1] == ['--'] else args.vmArgs
+
+    vms = args.vms.split(',') if args.vms else [get_vm()]
+    builds = args.builds.split(',') if args.builds else [_vmbuild]
+    seed = args.seed if args.seed is not None else long(time.time() * 1000)
+    if args.random_flags:
+        mx.log('Random flags seed: ' + str(seed))
+    rand = random.Random(seed)
+
+    runs = []
+    for vm in vms:
+        if not isVMSupported(vm):
+            mx.log('The ' + vm + ' VM is not supported on this platform - skipping')
+            continue
+        for vmbuild in builds:
+            for _ in range(args.count):
+                flags = []
+                if args.random_flags:
+                    groups = _stressFlagGroups
+                    # The jvmci VM is built without C2
+                    if vmbuild in ('fastdebug', 'debug') and _vmAliases.get(vm, vm) in ('server', 'server-nojvmci'):
+                        groups = groups + _stressDevelopFlagGroups
+                    flags = [rand.choice(group) for group in groups]
+                runs.append((vm, vmbuild, _deoptalotArgs + flags + vmArgs))
+    if not runs:
+        return
+
+    failures = _run_stress(runs, args.jobs, memory=args.memory, keepGoing=args.keep_going)
+    if failures:
+        for _, _, command, runDir in failures:
+            mx.log('Failed: ' + command)
+            mx.log('    output: ' + join(runDir, 'output.log'))
+            for f in sorted(os.listdir(runDir)):
+                if f.startswith('hs_err'):
+                    mx.log('    hs_err: ' + join(runDir, f))
+        mx.abort(str(len(failures)) + ' of ' + str(len(runs)) + ' bootstraps failed')
 
 def deoptalot(args):
     """bootstrap a VM with DeoptimizeALot and VerifyOops on
 
     If the first argument is a number, the process will be repeated
-    this number of times. All other arguments are passed to the VM."""
+    this number of times (concurrently, see 'mx stress'). All other
+    arguments are passed to the VM."""
     count = 1
     if len(args) > 0 and args[0].isdigit():
         count = int(args[0])
         del args[0]
 
-    for _ in range(count):
-        if not run_vm(['-XX:-TieredCompilation', '-XX:+DeoptimizeALot', '-XX:+VerifyOops'] + args + ['-version']) == 0:
-            mx.abort("Failed")
+    stress(['--count', str(count), '--'] + args)
 
 def longtests(args):
 
@@ -1314,7 +2046,7 @@ def igv(args):
 
         env = _igvBuildEnv()
         # make the jar for Batik 1.7 available.
-        env['IGV_BATIK_JAR'] = mx.library('BATIK').get_path(True)
+        env['IGV_BATIK_JAR'] = mx_jvmci_artifacts.library_path('BATIK')
         if mx.run(['ant', '-f', mx._cygpathU2W(join(_suite.dir, 'src', 'share', 'tools', 'IdealGraphVisualizer', 'build.xml')), '-l', mx._cygpathU2W(fp.name), 'run'], env=env, nonZeroIsFatal=False):
             mx.abort("IGV ant build & launch failed. Check '" + logFile + "'. You can also try to delete 'src/share/tools/IdealGraphVisualizer/nbplatform'.")
 
@@ -1331,7 +2063,7 @@ def c1visualizer(args):
         mx.log('Updating C1Visualizer')
         shutil.rmtree(join(extractPath, 'c1visualizer'))
 
-    archive = mx.library('C1VISUALIZER_DIST').get_path(resolve=True)
+    archive = mx_jvmci_artifacts.library_path('C1VISUALIZER_DIST')
 
     if not exists(executable):
         zf = zipfile.ZipFile(archive, 'r')
@@ -1572,6 +2304,17 @@ def jmh(args):
                 javaArgs.append(str(v))
         mx.run_java(javaArgs + regex, addDefaultArgs=False, cwd=jmhPath)
 
+""" The sha1 of each flavor of the hsdis library. """
+hsdisSha1s = {
+    'att/hsdis-amd64.dll' : 'bcbd535a9568b5075ab41e96205e26a2bac64f72',
+    'att/hsdis-amd64.so' : '58919ba085d4ef7a513f25bae75e7e54ee73c049',
+    'intel/hsdis-amd64.dll' : '6a388372cdd5fe905c1a26ced614334e405d1f30',
+    'intel/hsdis-amd64.so' : '844ed9ffed64fe9599638f29a8450c50140e3192',
+    'intel/hsdis-amd64.dylib' : 'fdb13ef0d7d23d93dacaae9c98837bea0d4fc5a2',
+    'sparcv9/hsdis-solaris-sparcv9.so': '970640a9af0bd63641f9063c11275b371a59ee60',
+    'sparcv9/hsdis-linux-sparcv9.so': '0c375986d727651dee1819308fbbc0de4927d5d9',
+}
+
 def hsdis(args, copyToDir=None):
     """download the hsdis library
 
@@ -1588,25 +2331,13 @@ def hsdis(args, copyToDir=None):
     lib = mx.add_lib_suffix('hsdis-' + osSuffix + mx.get_arch())
     path = join(_suite.get_output_root(), lib)
 
-    sha1s = {
-        'att/hsdis-amd64.dll' : 'bcbd535a9568b5075ab41e96205e26a2bac64f72',
-        'att/hsdis-amd64.so' : '58919ba085d4ef7a513f25bae75e7e54ee73c049',
-        'intel/hsdis-amd64.dll' : '6a388372cdd5fe905c1a26ced614334e405d1f30',
-        'intel/hsdis-amd64.so' : '844ed9ffed64fe9599638f29a8450c50140e3192',
-        'intel/hsdis-amd64.dylib' : 'fdb13ef0d7d23d93dacaae9c98837bea0d4fc5a2',
-        'sparcv9/hsdis-solaris-sparcv9.so': '970640a9af0bd63641f9063c11275b371a59ee60',
-        'sparcv9/hsdis-linux-sparcv9.so': '0c375986d727651dee1819308fbbc0de4927d5d9',
-    }
-
     flavoredLib = flavor + "/" + lib
-    if flavoredLib not in sha1s:
+    if flavoredLib not in hsdisSha1s:
         mx.logv("hsdis not supported on this plattform or architecture")
         return
 
     if not exists(path):
-        sha1 = sha1s[flavoredLib]
-        sha1path = path + '.sha1'
-        mx.download_file_with_sha1('hsdis', path, ['https://lafo.ssw.uni-linz.ac.at/pub/hsdis/' + flavoredLib], sha1, sha1path, True, True, sources=False)
+        mx_jvmci_artifacts.fetch('hsdis', path, hsdisSha1s[flavoredLib], ['https://lafo.ssw.uni-linz.ac.at/pub/hsdis/' + flavoredLib])
     if copyToDir is not None and exists(copyToDir):
         destFileName = mx.add_lib_suffix('hsdis-' + mx.get_arch())
         shutil.copy(path, copyToDir + os.sep + destFileName)
@@ -1623,7 +2354,7 @@ def hcfdis(args):
 
     args = parser.parse_args(args)
 
-    path = mx.library('HCFDIS').get_path(resolve=True)
+    path = mx_jvmci_artifacts.library_path('HCFDIS')
     mx.run_java(['-cp', path, 'com.oracle.max.hcfdis.HexCodeFileDis'] + args.files)
 
     if args.map is not None:
@@ -1661,37 +2392,36 @@ def hcfdis(args):
 def isJVMCIEnabled(vm):
     return vm != 'original' and not vm.endswith('nojvmci')
 
-def jol(args):
-    """Java Object Layout"""
-    joljar = mx.library('JOL_INTERNALS').get_path(resolve=True)
-    candidates = mx.findclass(args, logToConsole=False, matcher=lambda s, classname: s == classname or classname.endswith('.' + s) or classname.endswith('$' + s))
-
-    if len(candidates) > 0:
-        candidates = mx.select_items(sorted(candidates))
-    else:
-        # mx.findclass can be mistaken, don't give up yet
-        candidates = args
-
-    run_vm(['-javaagent:' + joljar, '-cp', os.pathsep.join([mx.classpath(), joljar]), "org.openjdk.jol.MainObjectInternals"] + candidates)
-
 mx.update_commands(_suite, {
+    'artifactstore' : [mx_jvmci_artifacts.artifactstore, 'seed|list|verify [--all] [<dir|tarball>...]'],
     'build': [build, ''],
     'buildjmh': [buildjmh, '[-options]'],
     'buildvars': [buildvars, ''],
     'buildvms': [buildvms, '[-options]'],
     'c1visualizer' : [c1visualizer, ''],
+    'ccache' : [mx_jvmci_ccache.ccache, '[ccache options]'],
+    'cfgstats' : [mx_jvmci_cfgstats.cfgstats, '[-options] <file>...'],
+    'compilestats' : [mx_jvmci_compilestats.compilestats, '[-options] [VM options] class [args...]'],
     'export': [export, '[-options] [zipfile]'],
+    'exportdiff': [exportdiff, '[-options] <old> <new>'],
+    'hsclean': [hsclean, '[--vm <vm>] [--vmbuild <build>] [--wait]'],
     'hsdis': [hsdis, '[att]'],
     'hcfdis': [hcfdis, ''],
     'igv' : [igv, ''],
+    'igvstats' : [mx_jvmci_igvstats.igvstats, '[-options] <file>...'],
     'jdkhome': [print_jdkhome, ''],
+    'jdkpool': [mx_jvmci_jdkpool.jdkpool, 'fill|claim|status|clear [--vmbuild <build>] [--count <n>]'],
     'jmh': [jmh, '[VM options] [filters|JMH-args-as-json...]'],
     'makejmhdeps' : [makejmhdeps, ''],
-    'shortunittest' : [shortunittest, '[unittest options] [--] [VM options] [filters...]', mx_unittest.unittestHelpSuffix],
+    'pgo' : [mx_jvmci_pgo.pgo, '[--workload <args>] [--jmh <filter>] [--reuse-profile]'],
+    'pyunittest' : [pyunittest, '[-v] [filters...]'],
+    'shortunittest' : [shortunittest, '[--changed [--since <rev>] [--coverage <path>]] [unittest options] [--] [VM options] [filters...]', mx_unittest.unittestHelpSuffix],
+    'startupbench' : [mx_jvmci_startupbench.startupbench, '[-options]'],
     'vm': [run_vm, '[-options] class [args...]'],
     'deoptalot' : [deoptalot, '[n]'],
+    'stress' : [stress, '[-options] [VM options]'],
     'longtests' : [longtests, ''],
-    'jol' : [jol, ''],
+    'jol' : [mx_jvmci_jol.jol, '[-options] [VM options] classes|packages...'],
     'makefile' : [mx_jvmci_makefile.build_makefile, 'build makefiles for JDK build', None, {'keepUnsatisfiedDependencies': True}],
 })
 
@@ -1702,6 +2432,13 @@ mx.add_argument('--installed-jdks', help='the base directory in which the JDKs c
 
 mx.add_argument('--vm', action='store', dest='vm', choices=_vmChoices.keys() + _vmAliases.keys(), help='the VM type to build/run')
 mx.add_argument('--vmbuild', action='store', dest='vmbuild', choices=_vmbuildChoices, help='the VM build to build/run (default: ' + _vmbuildChoices[0] + ')')
+mx.add_argument('--vm-accounting', action='store', dest='vm_accounting', help='append the CPU time, peak RSS, wall time, page faults and context switches of each VM launch as a JSON line to <path>', metavar='<path>')
+mx.add_argument('--reproducible', action='store_true', help='normalize the order, modification times (taken from $SOURCE_DATE_EPOCH if set) and permissions of the entries in built jar and tar distributions so that identical inputs produce identical files')
+mx.add_argument('--artifact-store', dest='artifact_store', help='the directory of the sha1-verified store of tool artifacts (hsdis, HCFDIS, C1Visualizer, JOL, Batik) shared by the suite checkouts on this host (default: $JVMCI_ARTIFACT_STORE or ~/.mx/jvmci-artifacts)', default=None, metavar='<path>')
+mx.add_argument('--offline-artifacts', action='store_true', help='only resolve tool artifacts from the artifact store, never download them')
+mx.add_argument('--jdk-pool', dest='jdk_pool', help='create missing JVMCI JDKs by cloning a template from the JDK pool in <path> (default: $JVMCI_JDK_POOL, see "mx jdkpool")', default=None, metavar='<path>')
+mx.add_argument('--ccache', action='store_true', help='compile the HotSpot sources with a compiler cache shared by all VMs, VM builds and checkouts, using the ccache compatible command $JVMCI_CCACHE (default: ccache). The cache is also used if $JVMCI_CCACHE is set')
+mx.add_argument('--ccache-dir', dest='ccache_dir', help='the directory of the compiler cache (default: $JVMCI_CCACHE_DIR or ~/.mx/jvmci-ccache)', default=None, metavar='<path>')
 mx.add_argument('--ecl', action='store_true', dest='make_eclipse_launch', help='create launch configuration for running VM execution(s) in Eclipse')
 mx.add_argument('--vmprefix', action='store', dest='vm_prefix', help='prefix for running the VM (e.g. "/usr/bin/gdb --args")', metavar='<prefix>')
 mx.add_argument('--gdb', action='store_const', const='/usr/bin/gdb --args', dest='vm_prefix', help='alias for --vmprefix "/usr/bin/gdb --args"')
@@ -1742,10 +2479,68 @@ class JVMCIArchiveParticipant:
         return False
 
     def __closing__(self):
-        for service, providers in self.jvmciServices.iteritems():
+        for service in sorted(self.jvmciServices.iterkeys()):
             arcname = 'META-INF/jvmci.services/' + service
-            # Convert providers to a set before printing to remove duplicates
-            self.arc.zf.writestr(arcname, '\n'.join(frozenset(providers))+ '\n')
+            # Convert providers to a sorted set before printing to remove duplicates
+            # and make the contents independent of the order in which they were added
+            providers = sorted(frozenset([p for p in self.jvmciServices[service] if p]))
+            self.arc.zf.writestr(arcname, '\n'.join(providers) + '\n')
+
+"""
+Earliest time representable in a zip file (1980-01-01 00:00:00 UTC).
+"""
+_zipEpoch = 315532800
+
+def _reproducible_timestamp():
+    """
+    Gets the modification time given to all entries of archives normalized by
+    _normalize_archive. This is $SOURCE_DATE_EPOCH if set (see
+    https://reproducible-builds.org/specs/source-date-epoch/) and 1980-01-01 otherwise.
+    """
+    return max(_zipEpoch, int(os.environ.get('SOURCE_DATE_EPOCH', _zipEpoch)))
+
+def _normalize_archive(path):
+    """
+    Rewrites the jar or tar file 'path' such that its contents only depend on the
+    contents of the archived files: entries are sorted by name (with the manifest
+    first in a jar), have the same modification time and their permissions are
+    0755 for directories and executables and 0644 otherwise. The owner of tar
+    entries is set to root. Other archive types are left untouched.
+    """
+    timestamp = _reproducible_timestamp()
+    tmp = path + '.tmp'
+    if path.endswith('.jar') or path.endswith('.zip'):
+        dateTime = time.gmtime(timestamp)[:6]
+        def _order(info):
+            name = info.filename
+            if name == 'META-INF/':
+                return (0, name)
+            if name.upper() == 'META-INF/MANIFEST.MF':
+                return (1, name)
+            return (2, name)
+        with zipfile.ZipFile(path) as src:
+            with zipfile.ZipFile(tmp, 'w') as dst:
+                for info in sorted(src.infolist(), key=_order):
+                    normalized = zipfile.ZipInfo(info.filename, dateTime)
+                    normalized.compress_type = info.compress_type
+                    normalized.create_system = 3 # Unix
+                    if info.filename.endswith('/'):
+                        normalized.external_attr = ((stat.S_IFDIR | 0755) << 16) | 0x10 # MS-DOS directory flag
+                    else:
+                        normalized.external_attr = (stat.S_IFREG | 0644) << 16
+                    dst.writestr(normalized, src.read(info.filename))
+    elif path.endswith('.tar'):
+        with tarfile.open(path, 'r') as src:
+            with tarfile.open(tmp, 'w', format=src.format) as dst:
+                for member in sorted(src.getmembers(), key=lambda m: m.name):
+                    member.mtime = timestamp
+                    member.uid = member.gid = 0
+                    member.uname = member.gname = ''
+                    member.mode = 0755 if member.isdir() or member.mode & 0111 else 0644
+                    dst.addfile(member, src.extractfile(member) if member.isreg() else None)
+    else:
+        return
+    os.rename(tmp, path)
 
 _jvmci_bootstrap_jdk = None
 
@@ -1827,16 +2622,73 @@ class JVMCIJDKConfig(mx.JDKConfig):
         elif _vm_cwd is not None and _vm_cwd != cwd:
             mx.abort("conflicting working directories: do not set --vmcwd for this command")
 
-        _updateInstalledJVMCIOptionsFile(self.home)
-
-        args = self.parseVmArgs(args, addDefaultArgs=addDefaultArgs)
+        # Keeps deployments into this JDK out only while the launch reads the JDK. The
+        # VM runs without the lock: the files of the JDK are replaced by renaming new
+        # files over them, so a running VM keeps using the ones it opened.
+        with mx_jvmci_jdklock.reading(self.home):
+            _updateInstalledJVMCIOptionsFile(self.home)
+            args = self.parseVmArgs(args, addDefaultArgs=addDefaultArgs)
         if _make_eclipse_launch:
             mx.make_eclipse_launch(_suite, args, _suite.name + '-' + build, name=None, deps=mx.dependencies())
 
         pfx = _vm_prefix.split() if _vm_prefix is not None else []
         cmd = pfx + [self.java] + ['-' + vm] + args
+        if _vm_accounting and mx.get_os() not in ['windows', 'cygwin']:
+            return _run_accounted(cmd, vm, self.vmbuild, args, nonZeroIsFatal=nonZeroIsFatal, out=out, err=err, cwd=cwd, timeout=timeout)
         return mx.run(cmd, nonZeroIsFatal=nonZeroIsFatal, out=out, err=err, cwd=cwd, timeout=timeout)
 
+_vm_accounting_lock = threading.Lock()
+
+def _vm_main(args):
+    """
+    Gets the main class, jar or informational option (e.g. '-version') from the VM arguments 'args'.
+    """
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ['-cp', '-classpath']:
+            i += 2
+            continue
+        if arg == '-jar':
+            return ' '.join(args[i:i + 2])
+        if arg in ['-version', '-fullversion', '-help', '-X'] or not arg.startswith('-'):
+            return arg
+        i += 1
+    return None
+
+def _run_accounted(cmd, vm, vmbuild, args, nonZeroIsFatal=True, out=None, err=None, cwd=None, timeout=None):
+    """
+    Runs 'cmd' under mx_jvmci_rusage.py and appends the resources used by it,
+    tagged with 'vm', 'vmbuild' and the main class in 'args', to the --vm-accounting file.
+    """
+    fd, resultFile = tempfile.mkstemp(prefix='mx-vm-rusage', suffix='.json')
+    os.close(fd)
+    try:
+        wrapper = join(_suite.mxDir, 'mx_jvmci_rusage.py')
+        retcode = mx.run([sys.executable, wrapper, resultFile] + cmd, nonZeroIsFatal=False, out=out, err=err, cwd=cwd, timeout=timeout)
+        try:
+            with open(resultFile) as fp:
+                record = json.load(fp)
+        except ValueError:
+            record = None
+    finally:
+        os.remove(resultFile)
+
+    if record is None:
+        mx.warn('No resource usage recorded for: ' + ' '.join(cmd))
+    else:
+        record['timestamp'] = time.time()
+        record['vm'] = vm
+        record['vmbuild'] = vmbuild
+        record['main'] = _vm_main(args)
+        record['command'] = cmd
+        with _vm_accounting_lock:
+            with open(_vm_accounting, 'a') as fp:
+                print >> fp, json.dumps(record, sort_keys=True)
+    if nonZeroIsFatal and retcode != 0:
+        mx.abort(retcode)
+    return retcode
+
 """
 The dict of JVMCI JDKs indexed by vmbuild names.
 """
@@ -1891,9 +2743,25 @@ def mx_post_parse_cmd_line(opts):
     _installed_jdks = opts.installed_jdks
     global _vm_prefix
     _vm_prefix = opts.vm_prefix
+    global _vm_accounting
+    _vm_accounting = os.path.abspath(opts.vm_accounting) if opts.vm_accounting else None
+    mx_jvmci_jdkpool.configure(opts.jdk_pool or os.environ.get('JVMCI_JDK_POOL'))
+    mx_jvmci_ccache.configure(os.environ.get('JVMCI_CCACHE', 'ccache') if opts.ccache else os.environ.get('JVMCI_CCACHE'), opts.ccache_dir or mx_jvmci_ccache.default_dir())
+    mx_jvmci_artifacts.configure(opts.artifact_store or mx_jvmci_artifacts.default_store(), not opts.offline_artifacts)
 
     mx.instantiateDistribution('JVM_<vmbuild>_<vm>', dict(vmbuild=_vmbuild, vm=get_vm()))
 
+    if opts.reproducible:
+        # Registered first so that the archives are normalized before they are deployed
+        def _normalize(dist):
+            _normalize_archive(dist.path)
+        dists = list(_suite.dists)
+        for dist in [jdkDist.dist() for jdkDist in jdkDeployedDists]:
+            if dist not in dists:
+                dists.append(dist)
+        for dist in dists:
+            dist.add_update_listener(_normalize)
+
     for jdkDist in jdkDeployedDists:
         def _close(jdkDeployable):
             def _install(dist):
@@ -0,0 +1,234 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, shutil, tarfile, hashlib, urllib, tempfile
+from os.path import join, exists
+from argparse import ArgumentParser
+
+"""
+The libraries of the JVMCI suite that are tools (as opposed to build
+dependencies) and that are resolved through the artifact store.
+"""
+toolLibraries = ['HCFDIS', 'C1VISUALIZER_DIST', 'JOL_INTERNALS', 'BATIK']
+
+""" The directory of the artifact store shared by all suite checkouts on a host. """
+_store = None
+
+""" Specifies whether artifacts missing from the store may be downloaded. """
+_download = True
+
+def configure(store, download):
+    global _store, _download
+    _store = os.path.abspath(os.path.expanduser(store)) if store else None
+    _download = download
+
+def default_store():
+    return os.environ.get('JVMCI_ARTIFACT_STORE', join(os.path.expanduser('~'), '.mx', 'jvmci-artifacts'))
+
+def _digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), ''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _entry(sha1):
+    return join(_store, sha1[:2], sha1)
+
+def known_artifacts():
+    """Gets a map from the sha1 of each artifact that can be stored to its name."""
+    known = {}
+    for name in toolLibraries:
+        lib = mx.library(name, fatalIfMissing=False)
+        if lib and lib.sha1:
+            known[lib.sha1] = name
+    for flavoredLib, sha1 in mx_jvmci.hsdisSha1s.iteritems():
+        known[sha1] = 'hsdis/' + flavoredLib
+    return known
+
+def get(sha1):
+    """
+    Gets the path of the artifact with the given sha1 in the store or None if it is
+    not in the store. An entry whose content does not match its sha1 is removed.
+    """
+    if not _store or not sha1:
+        return None
+    path = _entry(sha1)
+    if not exists(path):
+        return None
+    if _digest(path) != sha1:
+        mx.warn('Removing corrupt artifact ' + path)
+        os.remove(path)
+        return None
+    return path
+
+def _add(source, sha1):
+    """Moves the file 'source' into the store as the entry for 'sha1'."""
+    path = _entry(sha1)
+    mx.ensure_dir_exists(os.path.dirname(path))
+    os.chmod(source, 0644)
+    # Entries are published with an atomic rename as several checkouts may seed the store concurrently
+    os.rename(source, path)
+    return path
+
+def put(path, sha1):
+    """Adds the file 'path' to the store if it is not already there and its content matches 'sha1'."""
+    if not _store or not sha1 or exists(_entry(sha1)):
+        return
+    if _digest(path) != sha1:
+        mx.warn('Not adding ' + path + ' to the artifact store: its sha1 is not ' + sha1)
+        return
+    try:
+        mx.ensure_dir_exists(os.path.dirname(_entry(sha1)))
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(_entry(sha1)))
+        os.close(fd)
+        shutil.copyfile(path, tmp)
+        _add(tmp, sha1)
+    except (IOError, OSError) as e:
+        mx.logv('Could not add ' + path + ' to the artifact store: ' + str(e))
+
+def _missing(name, sha1):
+    mx.abort(name + ' (sha1 ' + sha1 + ') is not in the artifact store ' + str(_store) + ' and downloading is disabled by --offline-artifacts. Seed the store with "mx artifactstore seed".')
+
+def fetch(name, path, sha1, urls):
+    """
+    Makes the artifact 'name' with the given sha1 available at 'path', copying it from
+    the store if possible and downloading it from 'urls' otherwise. A downloaded
+    artifact is added to the store.
+    """
+    stored = get(sha1)
+    if stored:
+        mx.ensure_dir_exists(os.path.dirname(path))
+        tmp = path + '.tmp'
+        shutil.copyfile(stored, tmp)
+        os.rename(tmp, path)
+        with open(path + '.sha1', 'w') as fp:
+            fp.write(sha1)
+        return
+    if not _download:
+        _missing(name, sha1)
+    mx.download_file_with_sha1(name, path, urls, sha1, path + '.sha1', True, True, sources=False)
+    put(path, sha1)
+
+def library_path(name):
+    """
+    Gets the path of the library 'name' (one of 'toolLibraries'), resolving it from
+    the store before the URLs in suite.py.
+    """
+    lib = mx.library(name)
+    if not exists(lib.get_path(resolve=False)):
+        stored = get(lib.sha1)
+        if stored:
+            # mx verifies the sha1 of the "downloaded" file
+            lib.urls = ['file:' + urllib.pathname2url(stored)] + list(lib.urls)
+        elif not _download:
+            _missing(name, lib.sha1)
+    path = lib.get_path(resolve=True)
+    put(path, lib.sha1)
+    return path
+
+def _seed_from_directory(directory, known, storeAll):
+    added = 0
+    for root, _, files in os.walk(directory):
+        for f in files:
+            path = join(root, f)
+            sha1 = _digest(path)
+            if (storeAll or sha1 in known) and not exists(_entry(sha1)):
+                put(path, sha1)
+                mx.log('Added ' + known.get(sha1, path) + ' (' + sha1 + ')')
+                added += 1
+    return added
+
+def _seed_from_tarball(tarball, known, storeAll):
+    added = 0
+    mx.ensure_dir_exists(_store)
+    with tarfile.open(tarball) as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            fd, tmp = tempfile.mkstemp(dir=_store)
+            try:
+                digest = hashlib.sha1()
+                with os.fdopen(fd, 'wb') as out:
+                    src = tf.extractfile(member)
+                    for chunk in iter(lambda: src.read(1 << 16), ''):
+                        digest.update(chunk)
+                        out.write(chunk)
+                sha1 = digest.hexdigest()
+                if (storeAll or sha1 in known) and not exists(_entry(sha1)):
+                    _add(tmp, sha1)
+                    mx.log('Added ' + known.get(sha1, member.name) + ' (' + sha1 + ')')
+                    added += 1
+            finally:
+                if exists(tmp):
+                    os.remove(tmp)
+    return added
+
+def artifactstore(args):
+    """manage the artifact store shared by the suite checkouts on a host
+
+    The store holds the tool artifacts (hsdis, HCFDIS, C1VISUALIZER_DIST,
+    JOL_INTERNALS and BATIK) keyed and verified by their sha1. They are
+    resolved from the store before they are downloaded and are added to it
+    after a download. The store is in $JVMCI_ARTIFACT_STORE or
+    ~/.mx/jvmci-artifacts unless --artifact-store is given.
+
+    'seed' adds the known artifacts found in directories or tarballs (e.g.
+    copied from a host with network access), 'list' shows which known
+    artifacts are in the store and 'verify' removes corrupt entries."""
+
+    parser = ArgumentParser(prog='mx artifactstore')
+    parser.add_argument('action', choices=['seed', 'list', 'verify'])
+    parser.add_argument('--all', action='store_true', help='seed all files, not only known artifacts')
+    parser.add_argument('sources', nargs='*', metavar='<dir|tarball>')
+    args = parser.parse_args(args)
+
+    if not _store:
+        mx.abort('No artifact store is configured')
+    known = known_artifacts()
+    if args.action == 'seed':
+        if not args.sources:
+            mx.abort('Specify the directories or tarballs to seed the store from')
+        added = 0
+        for source in args.sources:
+            if os.path.isdir(source):
+                added += _seed_from_directory(source, known, args.all)
+            elif tarfile.is_tarfile(source):
+                added += _seed_from_tarball(source, known, args.all)
+            else:
+                mx.abort('Not a directory or tarball: ' + source)
+        mx.log('Added {} artifacts to {}'.format(added, _store))
+    elif args.action == 'list':
+        for sha1, name in sorted(known.iteritems(), key=lambda e: e[1]):
+            mx.log('{:<7} {} {}'.format('present' if exists(_entry(sha1)) else 'missing', sha1, name))
+    else:
+        removed = 0
+        if exists(_store):
+            for root, _, files in os.walk(_store):
+                for f in files:
+                    if len(f) == 40 and get(f) is None:
+                        removed += 1
+        mx.log('Removed {} corrupt artifacts from {}'.format(removed, _store))
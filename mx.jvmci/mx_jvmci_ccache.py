@@ -0,0 +1,136 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, re, subprocess
+from os.path import join
+
+"""
+The compiler cache command (ccache or a compatible wrapper) with which the HotSpot
+sources are compiled (see --ccache and $JVMCI_CCACHE) or None if no compiler cache
+is used.
+"""
+_wrapper = None
+
+"""
+The cache directory, shared by all VMs, VM builds and suite checkouts on this host.
+"""
+_cacheDir = None
+
+def configure(wrapper, cacheDir):
+    global _wrapper, _cacheDir
+    _wrapper = wrapper
+    _cacheDir = os.path.abspath(os.path.expanduser(cacheDir))
+
+def default_dir():
+    return os.environ.get('JVMCI_CCACHE_DIR', join(os.path.expanduser('~'), '.mx', 'jvmci-ccache'))
+
+def enabled():
+    if not _wrapper:
+        return False
+    if mx.get_os() not in ['linux', 'darwin']:
+        mx.warn('The compiler cache is only supported for GCC and Clang builds, ignoring --ccache')
+        return False
+    return True
+
+def update_env(env):
+    """
+    Configures the compiler cache in the environment 'env' of a HotSpot build.
+    """
+    env['CCACHE_DIR'] = mx.ensure_dir_exists(_cacheDir)
+    # Paths below the suite are hashed relative to it and the working directory is
+    # not hashed so that the objects are shared between checkouts. The debug info of
+    # an object from the cache may therefore name the build directory of another checkout.
+    env['CCACHE_BASEDIR'] = mx_jvmci._suite.dir
+    env['CCACHE_NOHASHDIR'] = 'true'
+    # The precompiled header and the __DATE__/__TIME__ macros would otherwise disable caching
+    env['CCACHE_SLOPPINESS'] = 'pch_defines,time_macros'
+
+def make_vars(cc, cxx):
+    return {'CC' : _wrapper + ' ' + cc, 'CXX' : _wrapper + ' ' + cxx}
+
+def cflags(useClang):
+    if useClang:
+        return []
+    # Required by ccache for sources including a precompiled header
+    return ['-fpch-preprocess']
+
+# Counters printed by "ccache --print-stats" (ccache 4) and "ccache -s" (ccache 3)
+_statKeys = {
+    'direct_cache_hit' : 'hits',
+    'preprocessed_cache_hit' : 'hits',
+    'cache_miss' : 'misses',
+    'cache hit (direct)' : 'hits',
+    'cache hit (preprocessed)' : 'hits',
+    'cache miss' : 'misses',
+}
+_statRE = re.compile(r'^(?P<key>[a-z_ ()]+?)\s+(?P<value>\d+)\s*$')
+
+def stats(env):
+    """
+    Gets the numbers of cache hits and misses recorded in the cache directory so
+    far or None if the wrapper does not report them.
+    """
+    for option in ['--print-stats', '-s']:
+        try:
+            output = subprocess.check_output(_wrapper.split() + [option], env=env, stderr=subprocess.STDOUT)
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        result = {'hits' : 0, 'misses' : 0}
+        found = False
+        for line in output.splitlines():
+            m = _statRE.match(line.strip())
+            if m and m.group('key') in _statKeys:
+                result[_statKeys[m.group('key')]] += int(m.group('value'))
+                found = True
+        if found:
+            return result
+    return None
+
+def report(title, before, after):
+    """
+    Reports the hit rate of the compiler cache during a build. Concurrent builds
+    sharing the cache directory are included in the numbers.
+    """
+    if before is None or after is None:
+        mx.logv('The compiler cache did not report statistics for ' + title)
+        return
+    hits = after['hits'] - before['hits']
+    misses = after['misses'] - before['misses']
+    total = hits + misses
+    if total == 0:
+        mx.log('Compiler cache for ' + title + ': no compilations')
+        return
+    mx.log('Compiler cache for {}: {} of {} compilations were cache hits ({:.1f}%)'.format(title, hits, total, hits * 100.0 / total))
+
+def ccache(args):
+    """run the compiler cache command on the shared cache directory
+
+    Runs the compiler cache command given by $JVMCI_CCACHE (default: ccache)
+    with the given arguments (default: -s, i.e. print the statistics) and
+    CCACHE_DIR set to the cache directory shared by the HotSpot builds."""
+    env = os.environ.copy()
+    update_env(env)
+    mx.run((_wrapper or 'ccache').split() + (args or ['-s']), env=env)
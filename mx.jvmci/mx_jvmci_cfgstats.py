@@ -0,0 +1,235 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, os, re, gzip, json, multiprocessing
+from argparse import ArgumentParser
+
+# A property line of a section, e.g.:
+#     name "After Generation of HIR"
+_propertyRE = re.compile(r'^(?P<key>\w+) "(?P<value>.*)"$')
+
+# An interval printed by Interval::print (C1) or the JVMCI compiler's CFG printer, e.g.:
+#     45 int "stack:2" 12 -1 [20, 34[ 20 M  "store at definition"
+_intervalRE = re.compile(r'^(?P<reg>\S+) (?P<type>\S+) (?:"(?P<opr>[^"]*)" )?(?P<parent>\S+) (?P<hint>\S+) (?P<rest>.*?)\s*(?:"(?P<spillState>[^"]*)")?$')
+
+# Terminator of an instruction in the HIR and LIR sections
+_instructionEnd = '<|@'
+
+def _is_spilled(opr):
+    return opr is not None and 'stack' in opr
+
+class CFGDumpParser:
+    """
+    Parses the begin_<section>/end_<section> structure of a C1Visualizer dump (as
+    written by -XX:+PrintCFGToFile or the JVMCI compiler's CFG printer) line by
+    line. Only the counts of the current section are retained.
+
+    For each compilation a dict with the method name and a list of phases is
+    passed to 'sink'. A 'cfg' phase has the number of blocks, HIR instructions
+    and LIR operations, an 'intervals' phase has the number of register
+    allocation intervals, the number of intervals that are split children and
+    the number of intervals assigned to a stack slot.
+    """
+    def __init__(self, sink):
+        self.sink = sink
+        self.compilation = None
+
+    def _flush(self):
+        if self.compilation:
+            self.sink(self.compilation)
+        self.compilation = None
+
+    def parse(self, fp):
+        sections = []
+        phase = None
+        for line in fp:
+            line = line.strip()
+            if line.startswith('begin_'):
+                section = line[len('begin_'):]
+                sections.append(section)
+                if section == 'compilation':
+                    self._flush()
+                    self.compilation = {'method' : None, 'phases' : []}
+                elif section == 'cfg':
+                    phase = {'kind' : 'cfg', 'phase' : None, 'blocks' : 0, 'hir' : 0, 'lir' : 0}
+                elif section == 'intervals':
+                    phase = {'kind' : 'intervals', 'phase' : None, 'intervals' : 0, 'splits' : 0, 'spilled' : 0}
+                elif section == 'block' and phase:
+                    phase['blocks'] += 1
+                continue
+            if line.startswith('end_'):
+                section = line[len('end_'):]
+                if sections and sections[-1] == section:
+                    sections.pop()
+                if section in ('cfg', 'intervals') and phase:
+                    if self.compilation is None:
+                        self.compilation = {'method' : None, 'phases' : []}
+                    self.compilation['phases'].append(phase)
+                    phase = None
+                continue
+            if not sections:
+                continue
+            current = sections[-1]
+            if current in ('HIR', 'LIR'):
+                if phase and _instructionEnd in line:
+                    phase[current.lower()] += line.count(_instructionEnd)
+            elif current == 'intervals':
+                m = _propertyRE.match(line) if phase['phase'] is None else None
+                if m and m.group('key') == 'name':
+                    phase['phase'] = m.group('value')
+                    continue
+                m = _intervalRE.match(line)
+                if m:
+                    phase['intervals'] += 1
+                    if m.group('parent') != m.group('reg'):
+                        phase['splits'] += 1
+                    if _is_spilled(m.group('opr')):
+                        phase['spilled'] += 1
+            elif current in ('compilation', 'cfg'):
+                m = _propertyRE.match(line)
+                if not m or m.group('key') != 'name':
+                    continue
+                if current == 'compilation' and self.compilation and self.compilation['method'] is None:
+                    self.compilation['method'] = m.group('value').strip()
+                elif current == 'cfg' and phase and phase['phase'] is None:
+                    phase['phase'] = m.group('value')
+        self._flush()
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def _summarize_file(path):
+    """Parses the dump in 'path', returning its compilations and an error message (or None)."""
+    compilations = []
+    try:
+        with _open(path) as fp:
+            CFGDumpParser(compilations.append).parse(fp)
+    except (IOError, EOFError) as e:
+        return compilations, str(e)
+    for c in compilations:
+        c['method'] = c['method'] or '<unknown>'
+        for phase in c['phases']:
+            phase['phase'] = phase['phase'] or '<unnamed>'
+    return compilations, None
+
+def _print_compilation(source, compilation):
+    mx.log('{} ({})'.format(compilation['method'], source))
+    mx.log('  {:<50} {:>7} {:>7} {:>7} {:>9} {:>7} {:>7}'.format('phase', 'blocks', 'HIR', 'LIR', 'intervals', 'splits', 'spilled'))
+    for phase in compilation['phases']:
+        if phase['kind'] == 'cfg':
+            mx.log('  {:<50} {:>7} {:>7} {:>7}'.format(phase['phase'][:50], phase['blocks'], phase['hir'], phase['lir']))
+        else:
+            mx.log('  {:<50} {:>7} {:>7} {:>7} {:>9} {:>7} {:>7}'.format(phase['phase'][:50], '', '', '', phase['intervals'], phase['splits'], phase['spilled']))
+
+def cfgstats(args):
+    """summarize C1Visualizer dumps without a GUI
+
+    Parses the given .cfg files (optionally gzip compressed) line by line, in
+    parallel, and reports for each compiled method and phase the number of
+    blocks, HIR instructions and LIR operations and, for the register
+    allocation phases, the number of intervals, split intervals and spilled
+    intervals. By default only the methods with the most LIR operations and
+    spilled intervals and per-phase totals are printed; use --methods for the
+    table of every method and --json for all data as JSON lines."""
+
+    parser = ArgumentParser(prog='mx cfgstats')
+    parser.add_argument('--json', help='write the statistics of each compiled method as JSON lines to <path>', metavar='<path>')
+    parser.add_argument('--methods', action='store_true', help='print the phase table of every compiled method')
+    parser.add_argument('--top', type=int, default=20, help='number of methods in the summary (default: 20)', metavar='<n>')
+    parser.add_argument('-j', '--jobs', type=int, default=mx.cpu_count(), help='number of files parsed in parallel (default: number of CPUs)', metavar='<n>')
+    parser.add_argument('dumps', nargs='+', metavar='<file>')
+    args = parser.parse_args(args)
+
+    for dump in args.dumps:
+        if not os.path.isfile(dump):
+            mx.abort('No such file: ' + dump)
+
+    top = max(1, args.top)
+    largest = []
+    spilled = []
+    phaseTotals = {}
+    compilations = 0
+    jobs = max(1, min(args.jobs, len(args.dumps)))
+    pool = multiprocessing.Pool(jobs) if jobs > 1 else None
+    jsonFile = open(args.json, 'w') if args.json else None
+    try:
+        # Results are consumed in file order so that the output does not depend on the number of jobs
+        results = pool.imap(_summarize_file, args.dumps) if pool else (_summarize_file(d) for d in args.dumps)
+        for dump, (fileCompilations, error) in zip(args.dumps, results):
+            if error:
+                mx.warn('{}: {} (statistics up to this point are reported)'.format(dump, error))
+            source = os.path.basename(dump)
+            for compilation in fileCompilations:
+                compilations += 1
+                if jsonFile:
+                    print >> jsonFile, json.dumps(dict(compilation, file=dump), sort_keys=True)
+                if args.methods:
+                    _print_compilation(source, compilation)
+                phases = compilation['phases']
+                cfgs = [p for p in phases if p['kind'] == 'cfg']
+                if cfgs:
+                    peak = max(cfgs, key=lambda p: p['lir'])
+                    largest.append((peak['lir'], compilation['method'], peak['phase'], source))
+                allocations = [p for p in phases if p['kind'] == 'intervals']
+                if allocations:
+                    peak = max(allocations, key=lambda p: p['spilled'])
+                    spilled.append((peak['spilled'], peak['intervals'], compilation['method'], peak['phase'], source))
+                for phase in phases:
+                    totals = phaseTotals.setdefault((phase['kind'], phase['phase']), {})
+                    for key, value in phase.iteritems():
+                        if isinstance(value, int):
+                            totals[key] = totals.get(key, 0) + value
+                    totals['count'] = totals.get('count', 0) + 1
+            largest.sort(key=lambda e: -e[0])
+            del largest[top:]
+            spilled.sort(key=lambda e: (-e[0], -e[1]))
+            del spilled[top:]
+    finally:
+        if pool:
+            pool.terminate()
+        if jsonFile:
+            jsonFile.close()
+
+    mx.log('{} compilations in {} files'.format(compilations, len(args.dumps)))
+    if largest:
+        mx.log('Methods with the most LIR operations:')
+        for lir, method, phase, source in largest:
+            mx.log('  {:>8} {} in {} ({})'.format(lir, method, phase, source))
+    if spilled:
+        mx.log('Methods with the most spilled intervals:')
+        for n, intervals, method, phase, source in spilled:
+            mx.log('  {:>8} of {:>6} intervals {} in {} ({})'.format(n, intervals, method, phase, source))
+    if phaseTotals:
+        mx.log('Per phase (averages):')
+        mx.log('  {:<50} {:>7} {:>8} {:>8} {:>8} {:>9} {:>7} {:>7}'.format('phase', 'count', 'blocks', 'HIR', 'LIR', 'intervals', 'splits', 'spilled'))
+        for (kind, name), totals in sorted(phaseTotals.iteritems(), key=lambda e: (e[0][0], -e[1]['count'], e[0][1])):
+            n = float(totals['count'])
+            if kind == 'cfg':
+                mx.log('  {:<50} {:>7} {:>8.1f} {:>8.1f} {:>8.1f}'.format(name[:50], totals['count'], totals['blocks'] / n, totals['hir'] / n, totals['lir'] / n))
+            else:
+                mx.log('  {:<50} {:>7} {:>8} {:>8} {:>8} {:>9.1f} {:>7.1f} {:>7.1f}'.format(name[:50], totals['count'], '', '', '', totals['intervals'] / n, totals['splits'] / n, totals['spilled'] / n))
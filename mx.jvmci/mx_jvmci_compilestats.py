@@ -0,0 +1,243 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, sys, re, json
+from argparse import ArgumentParser, REMAINDER
+
+# Line printed by CompileTask::print_compilation_impl when a compilation starts
+# or an nmethod changes state, e.g.:
+#     123   45 %     4       java.lang.String::indexOf @ 12 (70 bytes)   made not entrant
+_compilationRE = re.compile(r'^\s*(?P<timestamp>\d+)\s+(?:(?P<compiler>[^\s:]+):)?\s*(?P<id>\d+) (?P<attrs>[% ][s ][! ][b ][n ]) (?:(?P<tier>\d|-) )?\s*(?P<method>\S+)(?: @ (?P<bci>\d+))? \((?:(?P<bytes>\d+) bytes|native)\)(?:\s+(?P<msg>.*))?$')
+
+# Line printed by CompileBroker::invoke_compiler_on_method when a compilation
+# finishes and PrintCompilation2 is enabled, e.g.:
+#     130   45 % size: 1024(512) time: 7 inlined: 30 bytes
+_compilationDoneRE = re.compile(r'^\s*(?P<timestamp>\d+)\s+(?P<id>\d+) [% ] (?:size: (?P<size>\d+)\((?P<instsSize>\d+)\) )?time: (?P<time>\d+) inlined: (?P<inlined>\d+) bytes$')
+
+""" The VM options needed to get the output parsed by CompilationEventParser. """
+compilationEventVmArgs = ['-XX:+PrintCompilation', '-XX:+UnlockDiagnosticVMOptions', '-XX:+PrintCompilation2']
+
+class CompilationEventParser:
+    """
+    An 'out' callback for mx.run that turns the output of -XX:+PrintCompilation and
+    -XX:+PrintCompilation2 into 'compilation', 'deopt' and 'failure' events. All other
+    lines are passed on to 'delegate' (if not None). Each event is a dict that is passed
+    to 'sink' and retained for summarize().
+    """
+    def __init__(self, vm, delegate=None, sink=None):
+        self.vm = vm
+        self.delegate = delegate
+        self.sink = sink
+        self.events = []
+        self._active = {}
+        self._busy = {}
+
+    def _compiler(self, tier, compiler):
+        if compiler:
+            return compiler
+        if tier is None or tier == '-':
+            # Non-tiered VM
+            return {'jvmci' : 'JVMCI', 'client' : 'C1', 'client-nojvmci' : 'C1'}.get(self.vm, 'C2')
+        tier = int(tier)
+        if tier == 0:
+            return 'interpreter'
+        if tier < 4:
+            return 'C1'
+        return 'JVMCI' if self.vm == 'jvmci' else 'C2'
+
+    def _emit(self, event):
+        self.events.append(event)
+        if self.sink:
+            self.sink(event)
+
+    def __call__(self, line):
+        if not self.parse(line.rstrip('\r\n')) and self.delegate:
+            self.delegate(line)
+
+    def parse(self, line):
+        """
+        Parses a single line of VM output, returning True if it was part of the
+        compilation output.
+        """
+        m = _compilationDoneRE.match(line)
+        if m:
+            compileId = int(m.group('id'))
+            event = self._active.pop(compileId, None)
+            if event is None:
+                return True
+            self._busy[event['compiler']] -= 1
+            event['time'] = int(m.group('time'))
+            event['inlinedBytes'] = int(m.group('inlined'))
+            if m.group('size'):
+                event['codeSize'] = int(m.group('size'))
+                event['instsSize'] = int(m.group('instsSize'))
+            self._emit(event)
+            return True
+
+        m = _compilationRE.match(line)
+        if not m:
+            return False
+        compileId = int(m.group('id'))
+        tier = m.group('tier')
+        event = {
+            'timestamp' : int(m.group('timestamp')),
+            'id' : compileId,
+            'method' : m.group('method'),
+            'tier' : int(tier) if tier and tier != '-' else None,
+            'compiler' : self._compiler(tier, m.group('compiler')),
+            'osr' : m.group('attrs')[0] == '%',
+            'bytes' : int(m.group('bytes')) if m.group('bytes') else 0,
+        }
+        if m.group('bci'):
+            event['bci'] = int(m.group('bci'))
+        msg = m.group('msg')
+        if not msg:
+            event['event'] = 'compilation'
+            busy = self._busy.get(event['compiler'], 0) + 1
+            self._busy[event['compiler']] = busy
+            event['busy'] = busy
+            self._active[compileId] = event
+        elif msg.startswith('made '):
+            event['event'] = 'deopt'
+            event['state'] = msg[len('made '):]
+            self._emit(event)
+        elif msg.startswith('COMPILE SKIPPED'):
+            active = self._active.pop(compileId, None)
+            if active:
+                self._busy[active['compiler']] -= 1
+            event['event'] = 'failure'
+            event['reason'] = msg
+            self._emit(event)
+        return True
+
+    def finish(self):
+        """
+        Emits the compilations for which no completion was seen (e.g. because the VM exited).
+        """
+        for compileId in sorted(self._active.keys()):
+            event = self._active[compileId]
+            event['time'] = None
+            self._emit(event)
+        self._active = {}
+
+def _percentile(sortedValues, p):
+    if not sortedValues:
+        return None
+    index = max(0, int(round(p / 100.0 * len(sortedValues) + 0.5)) - 1)
+    return sortedValues[min(index, len(sortedValues) - 1)]
+
+def summarize(events):
+    """
+    Computes per-compiler statistics from the events produced by a CompilationEventParser.
+    """
+    summary = {}
+    for event in events:
+        s = summary.setdefault(event['compiler'], {'compilations' : 0, 'osr' : 0, 'bytes' : 0, 'time' : 0, 'times' : [], 'deopts' : 0, 'failures' : 0, 'busy' : []})
+        kind = event['event']
+        if kind == 'compilation':
+            s['compilations'] += 1
+            if event['osr']:
+                s['osr'] += 1
+            s['busy'].append(event['busy'])
+            if event['time'] is not None:
+                s['bytes'] += event['bytes']
+                s['time'] += event['time']
+                s['times'].append(event['time'])
+        elif kind == 'deopt':
+            s['deopts'] += 1
+        elif kind == 'failure':
+            s['failures'] += 1
+    for s in summary.itervalues():
+        times = sorted(s.pop('times'))
+        busy = s.pop('busy')
+        s['bytesPerSecond'] = s['bytes'] * 1000 / s['time'] if s['time'] else None
+        for p in [50, 90, 99]:
+            s['p' + str(p)] = _percentile(times, p)
+        s['max'] = times[-1] if times else None
+        s['maxBusy'] = max(busy) if busy else 0
+        s['meanBusy'] = float(sum(busy)) / len(busy) if busy else 0.0
+    return summary
+
+def print_summary(summary):
+    mx.log('{:<12} {:>8} {:>6} {:>10} {:>9} {:>10} {:>6} {:>6} {:>6} {:>7} {:>7} {:>8} {:>9}'.format(
+        'compiler', 'methods', 'osr', 'bytes', 'time(ms)', 'bytes/s', 'p50', 'p90', 'p99', 'max', 'deopts', 'failures', 'busy max/mean'))
+    def _fmt(v):
+        return '-' if v is None else str(v)
+    for compiler in sorted(summary.iterkeys()):
+        s = summary[compiler]
+        mx.log('{:<12} {:>8} {:>6} {:>10} {:>9} {:>10} {:>6} {:>6} {:>6} {:>7} {:>7} {:>8} {:>5}/{:.1f}'.format(
+            compiler, s['compilations'], s['osr'], s['bytes'], s['time'], _fmt(s['bytesPerSecond']), _fmt(s['p50']), _fmt(s['p90']), _fmt(s['p99']), _fmt(s['max']),
+            s['deopts'], s['failures'], s['maxBusy'], s['meanBusy']))
+
+def compilestats(args):
+    """run the VM and summarize its compilation events
+
+    Runs the selected VM with -XX:+PrintCompilation and -XX:+PrintCompilation2
+    and turns the compilation output into a stream of structured events
+    (method, tier, compiler, bytecode size, compile time, deoptimizations and
+    failures). At exit, per-compiler throughput, compile time percentiles and
+    the number of busy compiler threads are printed. Busy threads are the
+    compilations in progress when a new one starts and therefore a lower bound
+    on the length of the compile queue.
+
+    With --log, an existing PrintCompilation output file is summarized
+    instead of running the VM."""
+
+    parser = ArgumentParser(prog='mx compilestats')
+    parser.add_argument('--events', help='write the events as JSON lines to <path>', metavar='<path>')
+    parser.add_argument('--json', help='write the summary as JSON to <path>', metavar='<path>')
+    parser.add_argument('--log', help='summarize an existing output file of a VM run with ' + ' '.join(compilationEventVmArgs), metavar='<path>')
+    parser.add_argument('-q', '--quiet', action='store_true', help='suppress the non-compilation output of the VM')
+    parser.add_argument('vmArgs', nargs=REMAINDER, metavar='VM options...')
+    args = parser.parse_args(args)
+
+    retcode = 0
+    eventsFile = open(args.events, 'w') if args.events else None
+    try:
+        def _sink(event):
+            print >> eventsFile, json.dumps(event, sort_keys=True)
+        delegate = None if args.quiet else sys.stdout.write
+        eventParser = CompilationEventParser(mx_jvmci.get_vm(), delegate=delegate, sink=_sink if eventsFile else None)
+        if args.log:
+            with open(args.log) as fp:
+                for line in fp:
+                    eventParser(line)
+        else:
+            if not args.vmArgs:
+                mx.abort('Missing VM options and main class')
+            retcode = mx_jvmci.run_vm(compilationEventVmArgs + args.vmArgs, out=eventParser, nonZeroIsFatal=False)
+        eventParser.finish()
+    finally:
+        if eventsFile:
+            eventsFile.close()
+
+    summary = summarize(eventParser.events)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w') as fp:
+            json.dump(summary, fp, indent=2, sort_keys=True)
+    if retcode != 0:
+        mx.abort(retcode)
@@ -0,0 +1,140 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, json, hashlib, time, threading
+from os.path import join, exists
+
+class GateTaskCache:
+    """
+    Records the gate tasks that passed, keyed on a digest of their inputs, in a JSON
+    file. Input files are digested by content. The size, modification time and digest
+    of each file are remembered as well so that only files changed since the last
+    gate run need to be read again.
+    """
+    def __init__(self, path, maxResults=200):
+        self.path = path
+        self.maxResults = maxResults
+        self.files = {}
+        self.results = {}
+        if exists(path):
+            try:
+                with open(path) as fp:
+                    data = json.load(fp)
+                self.files = data.get('files', {})
+                self.results = data.get('results', {})
+            except ValueError:
+                mx.warn('Ignoring corrupt gate task cache ' + path)
+
+    def save(self):
+        # Only keep the most recent results
+        keys = sorted(self.results.iterkeys(), key=lambda k: self.results[k]['time'])
+        for key in keys[:-self.maxResults]:
+            del self.results[key]
+        self.files = dict(((p, v) for p, v in self.files.iteritems() if exists(p)))
+        mx.ensure_dir_exists(os.path.dirname(self.path))
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({'files' : self.files, 'results' : self.results}, fp)
+        os.rename(tmp, self.path)
+
+    def _file_digest(self, path):
+        st = os.stat(path)
+        cached = self.files.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime:
+            return cached[2]
+        digest = hashlib.sha1()
+        with open(path, 'rb') as fp:
+            for chunk in iter(lambda: fp.read(1 << 16), ''):
+                digest.update(chunk)
+        self.files[path] = [st.st_size, st.st_mtime, digest.hexdigest()]
+        return self.files[path][2]
+
+    def key(self, title, paths=None, excludes=None, values=None):
+        """
+        Computes the key of the gate task named 'title' from the contents of the files
+        in 'paths' (files or directories, excluding the directories in 'excludes') and
+        the strings in 'values' (e.g. the VM flavor and the arguments of the task).
+        """
+        digest = hashlib.sha1()
+        def _add(s):
+            digest.update(s)
+            digest.update('\0')
+        _add(title)
+        for v in values or []:
+            _add(str(v))
+        excludes = set([os.path.abspath(e) for e in excludes or []])
+        for path in sorted([os.path.abspath(p) for p in paths or []]):
+            if os.path.isdir(path):
+                for root, dirnames, files in os.walk(path):
+                    dirnames[:] = sorted([d for d in dirnames if not d.startswith('.') and join(root, d) not in excludes])
+                    for f in sorted(files):
+                        name = join(root, f)
+                        if not f.startswith('.') and os.path.isfile(name):
+                            _add(name)
+                            _add(self._file_digest(name))
+            elif exists(path):
+                _add(path)
+                _add(self._file_digest(path))
+            else:
+                _add(path + ' (missing)')
+        return digest.hexdigest()
+
+    def passed(self, key):
+        return key in self.results
+
+    def record(self, key, title):
+        self.results[key] = {'title' : title, 'time' : time.time()}
+        self.save()
+
+_cache = None
+_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = GateTaskCache(join(mx_jvmci._suite.get_output_root(), 'gate-task-cache.json'))
+    return _cache
+
+def run_cached(task, action, args, paths=None, excludes=None, values=None):
+    """
+    Runs 'action' for the gate task 'task' unless the task passed before with the
+    same inputs (see GateTaskCache.key). The result is recorded if 'action' returns
+    without raising an exception. Caching is disabled by the --no-task-cache gate option.
+    """
+    if not getattr(args, 'taskCache', True):
+        action()
+        return
+    # Gate tasks may run concurrently (see mx_jvmci_gateschedule)
+    with _lock:
+        cache = get_cache()
+        key = cache.key(task.title, paths=paths, excludes=excludes, values=values)
+        cached = cache.passed(key)
+    if cached:
+        mx.log('Skipping ' + task.title + ': passed before with the same inputs (cached, see --no-task-cache)')
+        return
+    action()
+    with _lock:
+        cache.record(key, task.title)
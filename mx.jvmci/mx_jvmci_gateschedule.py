@@ -0,0 +1,214 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, sys, json, time, threading
+from os.path import join, exists
+from mx_gate import Task
+
+"""
+Resource held by the gate tasks that build or run a VM or otherwise depend on
+the global VM selection (see mx_jvmci.VM), e.g. by resolving the JDK, or on
+mx's build state. These tasks never run concurrently.
+"""
+VM_RESOURCE = 'vm'
+
+"""
+Resource held by the gate tasks that run Java code under JaCoCo or that
+disable it. Disabling JaCoCo for a task changes a global setting.
+"""
+JACOCO_RESOURCE = 'jacoco'
+
+"""
+Serializes the creation, entry and exit of mx_gate.Task objects, which update the
+module state of mx_gate (the start-at filter, the JaCoCo setting and the list of
+finished tasks) and are therefore not thread-safe.
+"""
+_taskLock = threading.Lock()
+
+class GateTask:
+    """
+    A gate task with the titles of the tasks it depends on, the number of CPUs it
+    uses and the resources it needs exclusive access to. 'action' is called with
+    the mx_gate.Task unless the task is filtered out.
+    """
+    def __init__(self, title, action, deps=None, cpus=1, resources=None, disableJacoco=False):
+        self.title = title
+        self.action = action
+        self.deps = deps or []
+        self.cpus = cpus
+        self.resources = set(resources or [])
+        self.disableJacoco = disableJacoco
+        self.start = None
+        self.end = None
+
+    def duration(self):
+        return self.end - self.start if self.end is not None else None
+
+class GateScheduler:
+    """
+    Runs gate tasks as soon as the tasks they depend on are done, as many at once
+    as the CPU budget and the exclusive resources of the tasks allow. When several
+    tasks are ready, the one with the longest (estimated) path of dependent tasks
+    is started first. Task durations are recorded in 'historyFile' and used as
+    estimates by later runs.
+    """
+    def __init__(self, tasks, budget, historyFile):
+        self.tasks = tasks
+        self.budget = max(1, budget)
+        self.gateTasks = []
+        self.historyFile = historyFile
+        self.history = {}
+        if exists(historyFile):
+            try:
+                with open(historyFile) as fp:
+                    self.history = json.load(fp)
+            except ValueError:
+                pass
+
+    def add(self, title, action, deps=None, cpus=1, resources=None, disableJacoco=False):
+        titles = [t.title for t in self.gateTasks]
+        for dep in deps or []:
+            assert dep in titles, 'gate task "' + title + '" depends on unknown task "' + dep + '"'
+        self.gateTasks.append(GateTask(title, action, deps, min(cpus, self.budget), resources, disableJacoco))
+
+    def _estimate(self, task):
+        return self.history.get(task.title, 60.0)
+
+    def _path_lengths(self, duration):
+        """
+        Computes for each task the length of the longest path of dependent tasks
+        starting with it, using 'duration' for the length of a task.
+        """
+        lengths = {}
+        for task in reversed(self.gateTasks):
+            dependents = [t for t in self.gateTasks if task.title in t.deps]
+            lengths[task.title] = duration(task) + max([lengths[t.title] for t in dependents] or [0])
+        return lengths
+
+    def _run_task(self, task, lock, done, failures):
+        try:
+            with _taskLock:
+                gateTask = Task(task.title, self.tasks, disableJacoco=task.disableJacoco)
+                t = gateTask.__enter__()
+            excInfo = (None, None, None)
+            try:
+                if t:
+                    task.action(t)
+            except BaseException:
+                excInfo = sys.exc_info()
+                raise
+            finally:
+                with _taskLock:
+                    gateTask.__exit__(*excInfo)
+        except BaseException as e:
+            with lock:
+                failures.append((task, e, sys.exc_info()))
+        finally:
+            with lock:
+                task.end = time.time()
+                done.add(task.title)
+                lock.notify_all()
+
+    def run(self):
+        priority = self._path_lengths(self._estimate)
+        lock = threading.Condition()
+        done = set()
+        failures = []
+        pending = list(self.gateTasks)
+        running = []
+        self.startTime = time.time()
+        with lock:
+            while pending or running:
+                running = [t for t in running if t.title not in done]
+                if not failures:
+                    ready = [t for t in pending if all([d in done for d in t.deps])]
+                    ready.sort(key=lambda t: -priority[t.title])
+                    for task in ready:
+                        used = sum([t.cpus for t in running])
+                        busy = set().union(*[t.resources for t in running]) if running else set()
+                        if task.resources & busy:
+                            continue
+                        if running and used + task.cpus > self.budget:
+                            continue
+                        pending.remove(task)
+                        running.append(task)
+                        task.start = time.time()
+                        thread = threading.Thread(target=self._run_task, args=(task, lock, done, failures), name='gate: ' + task.title)
+                        thread.daemon = True
+                        thread.start()
+                elif not running:
+                    break
+                if running:
+                    # Wait with a timeout so that KeyboardInterrupt is delivered
+                    lock.wait(1)
+                    running = [t for t in running if t.title not in done]
+        self.endTime = time.time()
+        self._record_history()
+        self.report()
+        if failures:
+            _, e, excInfo = failures[0]
+            raise excInfo[0], excInfo[1], excInfo[2]
+
+    def _record_history(self):
+        for task in self.gateTasks:
+            if task.end is not None and task.title in [t.title for t in self.tasks]:
+                self.history[task.title] = task.duration()
+        mx.ensure_dir_exists(os.path.dirname(self.historyFile))
+        with open(self.historyFile, 'w') as fp:
+            json.dump(self.history, fp, indent=2, sort_keys=True)
+
+    def critical_path(self):
+        """
+        Gets the chain of tasks that determined the wall time of the gate: starting with
+        the task that finished last, each task is preceded by the task that finished last
+        before it started (i.e. the dependency or the holder of a resource or of CPUs it
+        waited for).
+        """
+        finished = [t for t in self.gateTasks if t.end is not None]
+        path = []
+        task = max(finished, key=lambda t: t.end) if finished else None
+        while task:
+            path.insert(0, task)
+            # Allow for the delay between a task finishing and the next one being started
+            blockers = [t for t in finished if t not in path and t.end <= task.start + 0.05]
+            task = max(blockers, key=lambda t: t.end) if blockers else None
+        return path
+
+    def report(self):
+        wall = self.endTime - self.startTime
+        mx.log('Gate task timing (CPU budget {}):'.format(self.budget))
+        mx.log('  {:<50} {:>9} {:>9} {:>9}'.format('task', 'start', 'duration', 'end'))
+        for task in sorted([t for t in self.gateTasks if t.start is not None], key=lambda t: t.start):
+            mx.log('  {:<50} {:>8.1f}s {:>8.1f}s {:>8.1f}s'.format(task.title, task.start - self.startTime, task.duration() or 0.0, (task.end or self.endTime) - self.startTime))
+        total = sum([t.duration() or 0.0 for t in self.gateTasks])
+        path = self.critical_path()
+        pathLength = sum([t.duration() or 0.0 for t in path])
+        mx.log('Critical path ({:.1f}s of {:.1f}s wall time, {:.1f}s of tasks in total):'.format(pathLength, wall, total))
+        for task in path:
+            mx.log('  {:<50} {:>8.1f}s (waited {:.1f}s)'.format(task.title, task.duration() or 0.0, task.start - (path[path.index(task) - 1].end if path.index(task) > 0 else self.startTime)))
+
+def history_file():
+    return join(mx_jvmci._suite.get_output_root(), 'gate-task-times.json')
@@ -0,0 +1,213 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, os, gzip, json
+from argparse import ArgumentParser
+try:
+    import xml.etree.cElementTree as etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+
+class IGVDumpParser:
+    """
+    Streams an Ideal Graph Visualizer XML dump (as written by -XX:PrintIdealGraphFile
+    or the Graal graph printer) with an incremental parser. The elements of a graph
+    are discarded as soon as they have been counted so the memory used is bounded
+    by the size of the largest graph rather than by the size of the dump.
+
+    The graphs of a group with the attribute difference="1" (or "true") are
+    written as differences: each graph starts with the nodes of the previous
+    graph of the group, <node> elements add nodes and <removeNode> elements
+    remove them. Otherwise (e.g. the dumps of C2) each graph lists all of its
+    nodes. Blocks are those of the <controlFlow> of the graph.
+
+    For each group (i.e. compilation) a dict with the method name and a list of
+    phases, each with its node and block counts, is passed to 'sink'.
+    """
+    def __init__(self, sink):
+        self.sink = sink
+
+    def parse(self, fp):
+        self._groups = []
+        try:
+            self._parse(fp)
+        except SyntaxError:
+            # Report the compilations of a truncated dump (e.g. of a VM that crashed)
+            for group in reversed(self._groups):
+                self._emit(group)
+            raise
+
+    def _emit(self, group):
+        self.sink({'method' : group['method'] or '<unknown>', 'phases' : group['phases']})
+
+    def _parse(self, fp):
+        path = []
+        groups = self._groups
+        graph = None
+        root = None
+        for event, elem in etree.iterparse(fp, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if root is None:
+                    root = elem
+                path.append(tag)
+                if tag == 'group':
+                    groups.append({'method' : None, 'phases' : [], 'nodes' : set(), 'difference' : elem.get('difference') in ('1', 'true')})
+                elif tag == 'graph' and groups:
+                    group = groups[-1]
+                    graph = {'phase' : elem.get('name'), 'nodes' : set(group['nodes']) if group['difference'] else set(), 'blocks' : 0}
+                continue
+
+            path.pop()
+            parent = path[-1] if path else None
+            if tag == 'node' and graph and parent == 'nodes' and path[-2] == 'graph':
+                graph['nodes'].add(elem.get('id'))
+                elem.clear()
+            elif tag == 'removeNode' and graph and parent == 'nodes' and path[-2] == 'graph':
+                graph['nodes'].discard(elem.get('id'))
+            elif tag == 'block' and graph and parent == 'controlFlow':
+                graph['blocks'] += 1
+                elem.clear()
+            elif tag == 'p' and parent == 'properties' and elem.get('name') == 'name':
+                owner = path[-2] if len(path) > 1 else None
+                if owner == 'group' and groups and groups[-1]['method'] is None:
+                    groups[-1]['method'] = (elem.text or '').strip()
+                elif owner == 'graph' and graph and graph['phase'] is None:
+                    graph['phase'] = (elem.text or '').strip()
+            elif tag == 'method' and parent == 'group' and groups and groups[-1]['method'] is None:
+                groups[-1]['method'] = elem.get('name')
+            elif tag == 'graph' and graph:
+                group = groups[-1]
+                group['phases'].append({'phase' : graph['phase'] or str(len(group['phases'])), 'nodes' : len(graph['nodes']), 'blocks' : graph['blocks']})
+                group['nodes'] = graph['nodes']
+                graph = None
+                elem.clear()
+            elif tag == 'group':
+                self._emit(groups.pop())
+                elem.clear()
+                if not groups and root is not None:
+                    # Drop the (cleared) groups retained by the document element
+                    root.clear()
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def _growth(phases):
+    """Adds the change in the number of nodes and blocks since the previous phase to each of 'phases'."""
+    previous = None
+    for phase in phases:
+        phase['nodeGrowth'] = phase['nodes'] - previous['nodes'] if previous else 0
+        phase['blockGrowth'] = phase['blocks'] - previous['blocks'] if previous else 0
+        previous = phase
+
+def _print_compilation(source, compilation):
+    mx.log('{} ({})'.format(compilation['method'], source))
+    mx.log('  {:<50} {:>8} {:>8} {:>8} {:>8}'.format('phase', 'nodes', 'growth', 'blocks', 'growth'))
+    for phase in compilation['phases']:
+        mx.log('  {:<50} {:>8} {:>+8} {:>8} {:>+8}'.format(phase['phase'][:50], phase['nodes'], phase['nodeGrowth'], phase['blocks'], phase['blockGrowth']))
+
+def _keep_top(entries, entry, top):
+    entries.append(entry)
+    if len(entries) > top * 4:
+        entries.sort(key=lambda e: -e[0])
+        del entries[top:]
+
+def igvstats(args):
+    """summarize Ideal Graph Visualizer dumps without a GUI
+
+    Streams the given IGV XML dumps (optionally gzip compressed) in bounded
+    memory and reports, for each compiled method, the number of nodes and
+    blocks after each phase and their growth since the previous phase. By
+    default only the methods with the most nodes, the phases with the largest
+    growth and per-phase totals are printed; use --methods for the table of
+    every method and --json for all data as JSON lines."""
+
+    parser = ArgumentParser(prog='mx igvstats')
+    parser.add_argument('--json', help='write the statistics of each compiled method as JSON lines to <path>', metavar='<path>')
+    parser.add_argument('--methods', action='store_true', help='print the phase table of every compiled method')
+    parser.add_argument('--top', type=int, default=20, help='number of methods and phases in the summary (default: 20)', metavar='<n>')
+    parser.add_argument('dumps', nargs='+', metavar='<file>')
+    args = parser.parse_args(args)
+
+    top = max(1, args.top)
+    largest = []
+    growths = []
+    phaseTotals = {}
+    counts = {'compilations' : 0, 'graphs' : 0}
+    jsonFile = open(args.json, 'w') if args.json else None
+    try:
+        for dump in args.dumps:
+            if not os.path.isfile(dump):
+                mx.abort('No such file: ' + dump)
+            source = os.path.basename(dump)
+            def _sink(compilation):
+                phases = compilation['phases']
+                _growth(phases)
+                counts['compilations'] += 1
+                counts['graphs'] += len(phases)
+                if jsonFile:
+                    print >> jsonFile, json.dumps(dict(compilation, file=dump), sort_keys=True)
+                if args.methods:
+                    _print_compilation(source, compilation)
+                if not phases:
+                    return
+                peak = max(phases, key=lambda p: p['nodes'])
+                _keep_top(largest, (peak['nodes'], compilation['method'], peak['phase'], source), top)
+                for phase in phases:
+                    if phase['nodeGrowth'] > 0:
+                        _keep_top(growths, (phase['nodeGrowth'], compilation['method'], phase['phase'], source), top)
+                    totals = phaseTotals.setdefault(phase['phase'], [0, 0, 0, 0])
+                    totals[0] += 1
+                    totals[1] += phase['nodes']
+                    totals[2] += phase['blocks']
+                    totals[3] += phase['nodeGrowth']
+            with _open(dump) as fp:
+                try:
+                    IGVDumpParser(_sink).parse(fp)
+                except SyntaxError as e:
+                    # A dump of a VM that did not exit normally lacks the closing tags
+                    mx.warn('{}: {} (statistics up to this point are reported)'.format(dump, e))
+    finally:
+        if jsonFile:
+            jsonFile.close()
+
+    mx.log('{} compilations, {} graphs'.format(counts['compilations'], counts['graphs']))
+    if not counts['graphs']:
+        return
+    largest.sort(key=lambda e: -e[0])
+    mx.log('Methods with the most nodes:')
+    for nodes, method, phase, source in largest[:top]:
+        mx.log('  {:>8} {} after {} ({})'.format(nodes, method, phase, source))
+    growths.sort(key=lambda e: -e[0])
+    mx.log('Largest node growth in a phase:')
+    for growth, method, phase, source in growths[:top]:
+        mx.log('  {:>+8} {} in {} ({})'.format(growth, method, phase, source))
+    mx.log('Per phase:')
+    mx.log('  {:<50} {:>8} {:>10} {:>10} {:>10}'.format('phase', 'graphs', 'avg nodes', 'avg blocks', 'avg growth'))
+    for phase, (n, nodes, blocks, growth) in sorted(phaseTotals.iteritems(), key=lambda e: -e[1][1]):
+        mx.log('  {:<50} {:>8} {:>10.1f} {:>10.1f} {:>+10.1f}'.format(phase[:50], n, float(nodes) / n, float(blocks) / n, float(growth) / n))
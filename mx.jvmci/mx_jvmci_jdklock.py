@@ -0,0 +1,245 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, os, errno, time, threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class _Held:
+    """
+    The state of the lock on a JDK in this process. Threads of the process take the
+    JDK as readers or as the writer under 'cond' and hold it until they release it.
+    The lock file is locked underneath on behalf of all of them: shared while there
+    are only readers and exclusive while there is a writer.
+    """
+    def __init__(self):
+        self.cond = threading.Condition(threading.Lock())
+        self.fp = None
+        self.exclusive = False
+        # thread -> number of (reentrant) shared acquisitions
+        self.readers = {}
+        self.writer = None
+        self.writerCount = 0
+        # the reader waiting to become the writer while keeping its shared lock
+        self.upgrading = None
+        self.waitingWriters = 0
+
+    def others_active(self, me):
+        return (self.writer is not None and self.writer is not me) or any(t is not me for t in self.readers)
+
+_held = {}
+
+""" Guards '_held' only and is never held while waiting for a lock. """
+_heldLock = threading.Lock()
+
+def _lock_file(jdkDir):
+    return os.path.abspath(jdkDir) + '.lock'
+
+def _entry(path):
+    with _heldLock:
+        held = _held.get(path)
+        if held is None:
+            held = _Held()
+            _held[path] = held
+        return held
+
+def _flock(held, path, exclusive):
+    if fcntl:
+        # POSIX record locks are used rather than flock since they convert a lock held
+        # by the process atomically: while waiting for an upgrade the shared lock is kept
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.lockf(held.fp, mode | fcntl.LOCK_NB)
+            return
+        except IOError as e:
+            if e.errno not in (errno.EACCES, errno.EAGAIN):
+                raise
+        mx.log('Waiting for {} lock on {}'.format('an exclusive' if exclusive else 'a shared', path))
+        while True:
+            try:
+                fcntl.lockf(held.fp, mode)
+                return
+            except IOError as e:
+                if e.errno != errno.EDEADLK:
+                    raise
+            # Another process holding the lock shared waits to upgrade it as well. Give
+            # up the shared lock of this process so that one of the upgrades succeeds.
+            mx.logv('Releasing the shared lock on ' + path + ' to resolve an upgrade deadlock')
+            fcntl.lockf(held.fp, fcntl.LOCK_UN)
+    elif exclusive:
+        while True:
+            try:
+                msvcrt.locking(held.fp.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except IOError:
+                time.sleep(1)
+
+def _funlock(held):
+    if fcntl:
+        fcntl.lockf(held.fp, fcntl.LOCK_UN)
+    elif held.exclusive:
+        held.fp.seek(0)
+        msvcrt.locking(held.fp.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _lock_file_for(held, path, exclusive):
+    """
+    Locks the lock file shared or exclusively, called with 'held.cond' held. Only
+    the calling thread uses the JDK in this process while it waits.
+    """
+    if held.fp is None:
+        mx.ensure_dir_exists(os.path.dirname(path))
+        held.fp = open(path, 'a+')
+        try:
+            _flock(held, path, exclusive)
+        except:
+            held.fp.close()
+            held.fp = None
+            raise
+    elif exclusive and not held.exclusive:
+        _flock(held, path, True)
+    held.exclusive = exclusive or held.exclusive
+
+def _sync_file_lock(held):
+    """
+    Downgrades or unlocks the lock file after a release, called with 'held.cond' held.
+    """
+    if held.writer is None and held.exclusive:
+        if held.readers:
+            # Downgrade to the shared lock of the remaining readers
+            if fcntl:
+                fcntl.lockf(held.fp, fcntl.LOCK_SH)
+            else:
+                _funlock(held)
+            held.exclusive = False
+    if held.writer is None and not held.readers and held.fp is not None:
+        _funlock(held)
+        # Closing the file also drops any POSIX record lock of the process on it
+        held.fp.close()
+        held.fp = None
+        held.exclusive = False
+
+def acquire(jdkDir, exclusive):
+    """
+    Acquires a shared or exclusive lock on 'jdkDir' for the calling thread. Locks are
+    reentrant within a thread and a thread holding a shared lock can acquire it
+    exclusively. Waiting writers keep new readers out. Threads only wait for each
+    other when they use the same JDK. On Windows, other processes are only locked out
+    by exclusive locks (i.e. VM launches do not block deployments).
+    """
+    path = _lock_file(jdkDir)
+    held = _entry(path)
+    me = threading.current_thread()
+    with held.cond:
+        if not exclusive:
+            if held.writer is me or me in held.readers:
+                held.readers[me] = held.readers.get(me, 0) + 1
+                return
+            while held.writer is not None or held.waitingWriters:
+                held.cond.wait()
+            _lock_file_for(held, path, False)
+            held.readers[me] = 1
+            return
+
+        if held.writer is me:
+            held.writerCount += 1
+            return
+        reads = held.readers.get(me, 0)
+        if reads and held.upgrading is not None:
+            # Another reader waits for the others to leave: keeping the shared lock
+            # would deadlock, so this thread gives it up until it is the writer
+            del held.readers[me]
+            _sync_file_lock(held)
+            held.cond.notify_all()
+        elif reads:
+            held.upgrading = me
+        held.waitingWriters += 1
+        try:
+            while held.others_active(me):
+                held.cond.wait()
+            _lock_file_for(held, path, True)
+        except:
+            if reads and me not in held.readers:
+                held.readers[me] = reads
+            _sync_file_lock(held)
+            raise
+        finally:
+            held.waitingWriters -= 1
+            if held.upgrading is me:
+                held.upgrading = None
+            held.cond.notify_all()
+        held.writer = me
+        held.writerCount = 1
+        if reads:
+            held.readers[me] = reads
+
+def release(jdkDir, exclusive):
+    path = _lock_file(jdkDir)
+    held = _entry(path)
+    me = threading.current_thread()
+    with held.cond:
+        if exclusive:
+            assert held.writer is me, 'exclusive lock on ' + jdkDir + ' not held by ' + me.name
+            held.writerCount -= 1
+            if held.writerCount == 0:
+                held.writer = None
+        else:
+            reads = held.readers.get(me, 0)
+            assert reads, 'shared lock on ' + jdkDir + ' not held by ' + me.name
+            if reads == 1:
+                del held.readers[me]
+            else:
+                held.readers[me] = reads - 1
+        _sync_file_lock(held)
+        held.cond.notify_all()
+
+class JDKLock:
+    """
+    A reader/writer lock on a JVMCI JDK directory, backed by the file <jdk dir>.lock
+    across processes (e.g. sharing --installed-jdks) and held by the acquiring thread
+    until it is released. VM launches hold the lock shared while they read the JDK,
+    so they run in parallel with each other. Modifications of the JDK (creating it,
+    deploying distributions and rewriting its configuration files) hold the lock
+    exclusively and should be brief.
+    """
+    def __init__(self, jdkDir, exclusive):
+        self.jdkDir = jdkDir
+        self.exclusive = exclusive
+
+    def __enter__(self):
+        acquire(self.jdkDir, self.exclusive)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        release(self.jdkDir, self.exclusive)
+
+def reading(jdkDir):
+    return JDKLock(jdkDir, False)
+
+def writing(jdkDir):
+    return JDKLock(jdkDir, True)
@@ -0,0 +1,200 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, sys, shutil, hashlib, subprocess, time
+from os.path import join, exists, dirname, basename
+from argparse import ArgumentParser
+
+"""
+The directory of the JDK pool from which missing JVMCI JDKs are cloned (see
+--jdk-pool) or None if JVMCI JDKs are created from the bootstrap JDK.
+"""
+_pool = None
+
+def configure(pool):
+    global _pool
+    _pool = os.path.abspath(os.path.expanduser(pool)) if pool else None
+
+def pool_dir():
+    return _pool or join(os.path.expanduser('~'), '.mx', 'jvmci-jdk-pool')
+
+def _templates_dir(vmbuild):
+    """
+    Gets the directory of the templates for 'vmbuild' created from the current
+    bootstrap JDK. The templates of different bootstrap JDKs with the same version
+    are kept apart by a digest of the bootstrap JDK's location.
+    """
+    jdk = mx_jvmci.get_jvmci_bootstrap_jdk()
+    home = os.path.realpath(jdk.home)
+    return join(pool_dir(), 'jdk{}-{}'.format(jdk.version, hashlib.sha1(home).hexdigest()[:8]), vmbuild)
+
+def templates(vmbuild):
+    templatesDir = _templates_dir(vmbuild)
+    if not exists(templatesDir):
+        return []
+    # Templates that are being created are in '.staging.*' directories
+    return [join(templatesDir, e) for e in sorted(os.listdir(templatesDir)) if not e.startswith('.')]
+
+def create_template(vmbuild):
+    templatesDir = mx.ensure_dir_exists(_templates_dir(vmbuild))
+    staging = join(templatesDir, '.staging.' + str(os.getpid()))
+    if exists(staging):
+        shutil.rmtree(staging)
+    try:
+        mx_jvmci._populateJdk(mx_jvmci.get_jvmci_bootstrap_jdk().home, staging)
+        template = join(templatesDir, '{}-{}'.format(int(time.time() * 1000), os.getpid()))
+        os.rename(staging, template)
+    finally:
+        if exists(staging):
+            shutil.rmtree(staging)
+    return template
+
+def _hardlink_tree(src, dst):
+    os.mkdir(dst)
+    shutil.copystat(src, dst)
+    for name in os.listdir(src):
+        s = join(src, name)
+        d = join(dst, name)
+        if os.path.islink(s):
+            os.symlink(os.readlink(s), d)
+        elif os.path.isdir(s):
+            _hardlink_tree(s, d)
+        else:
+            os.link(s, d)
+
+def clone(template, dst):
+    """
+    Clones 'template' to 'dst', returning how it was cloned. A copy-on-write clone
+    (reflink) is tried first, then a tree of hard links and finally a plain copy.
+    Hard links are safe as mx only ever replaces files in a JVMCI JDK by renaming
+    a new file over them (see mx_jvmci._writeJdkFile).
+    """
+    if mx.get_os() in ['linux', 'darwin']:
+        cmd = ['cp', '-a', '--reflink=always', template, dst] if mx.get_os() == 'linux' else ['cp', '-Rpc', template, dst]
+        with open(os.devnull, 'w') as devnull:
+            if subprocess.call(cmd, stdout=devnull, stderr=devnull) == 0:
+                return 'reflink'
+        if exists(dst):
+            shutil.rmtree(dst)
+    if mx.get_os() not in ['windows', 'cygwin']:
+        try:
+            _hardlink_tree(template, dst)
+            return 'hardlink'
+        except OSError:
+            if exists(dst):
+                shutil.rmtree(dst)
+    shutil.copytree(template, dst, symlinks=True)
+    return 'copy'
+
+def claim(vmbuild, dst):
+    """
+    Clones a template for 'vmbuild' from the pool to 'dst' if a pool is configured
+    and has a template, returning whether it did. The pool is refilled in the
+    background if it has no template.
+    """
+    if not _pool:
+        return False
+    available = templates(vmbuild)
+    if not available:
+        mx.log('The JDK pool ' + _pool + ' has no ' + vmbuild + ' template yet - refilling it in the background')
+        refill_in_background([vmbuild])
+        return False
+    how = clone(available[-1], dst)
+    mx.log('Cloned {} from {} ({})'.format(dst, available[-1], how))
+    return True
+
+def fill(vmbuilds, count):
+    for vmbuild in vmbuilds:
+        existing = templates(vmbuild)
+        for _ in range(len(existing), count):
+            mx.log('Created ' + create_template(vmbuild))
+        # Remove surplus templates, keeping the newest ones
+        for template in existing[:max(0, len(existing) - count)]:
+            shutil.rmtree(template)
+            mx.log('Removed ' + template)
+
+def refill_in_background(vmbuilds, count=1):
+    """Starts a detached mx process that fills the pool with templates for 'vmbuilds'."""
+    cmd = [sys.executable, os.path.abspath(sys.argv[0]), '--jdk-pool', pool_dir(), 'jdkpool', 'fill', '--count', str(count)]
+    for vmbuild in vmbuilds:
+        cmd += ['--vmbuild', vmbuild]
+    kwargs = {}
+    if mx.get_os() == 'windows':
+        kwargs['creationflags'] = 0x00000008 # DETACHED_PROCESS
+    else:
+        kwargs['preexec_fn'] = os.setsid
+    logFile = join(mx.ensure_dir_exists(pool_dir()), 'refill.log')
+    with open(os.devnull, 'r') as devnull, open(logFile, 'a') as log:
+        subprocess.Popen(cmd, cwd=mx_jvmci._suite.dir, stdin=devnull, stdout=log, stderr=subprocess.STDOUT, **kwargs)
+
+def jdkpool(args):
+    """manage a pool of pre-built JVMCI JDK templates
+
+    A JVMCI JDK is created by copying the bootstrap JDK, making its default
+    VM the 'original' VM and installing hsdis. With --jdk-pool (or
+    $JVMCI_JDK_POOL), a missing JVMCI JDK is instead cloned from a template
+    in the pool, by reflink or hard links where the file system allows, and
+    the pool is refilled in the background when it is empty. Templates are
+    kept per bootstrap JDK and vmbuild.
+
+    'fill' creates templates up to --count per vmbuild, 'claim' clones a
+    template to the JVMCI JDK of the selected vmbuild (e.g. under
+    --installed-jdks), 'status' lists the templates and 'clear' removes
+    all of them."""
+
+    parser = ArgumentParser(prog='mx jdkpool')
+    parser.add_argument('action', choices=['fill', 'claim', 'status', 'clear'])
+    parser.add_argument('--vmbuild', action='append', dest='vmbuilds', choices=mx_jvmci._vmbuildChoices, help='the vmbuild(s) to fill or claim (default: the selected vmbuild)', metavar='<build>')
+    parser.add_argument('--count', type=int, default=1, help='number of templates per vmbuild to fill the pool with (default: 1)', metavar='<n>')
+    args = parser.parse_args(args)
+
+    vmbuilds = args.vmbuilds or [mx_jvmci._vmbuild]
+    if args.action == 'fill':
+        fill(vmbuilds, max(1, args.count))
+    elif args.action == 'claim':
+        for vmbuild in vmbuilds:
+            jdkDir = join(mx_jvmci._jdksDir(), vmbuild)
+            if exists(jdkDir):
+                mx.log(jdkDir + ' already exists')
+                continue
+            if not templates(vmbuild):
+                fill([vmbuild], 1)
+            configure(pool_dir())
+            mx_jvmci.get_jvmci_jdk_dir(build=vmbuild, create=True, deployDists=False)
+    elif args.action == 'status':
+        root = pool_dir()
+        if exists(root):
+            for key in sorted(os.listdir(root)):
+                if os.path.isdir(join(root, key)):
+                    for vmbuild in sorted(os.listdir(join(root, key))):
+                        entries = [e for e in os.listdir(join(root, key, vmbuild)) if not e.startswith('.')]
+                        mx.log('{} {}: {} template(s)'.format(key, vmbuild, len(entries)))
+    else:
+        root = pool_dir()
+        for key in os.listdir(root) if exists(root) else []:
+            if os.path.isdir(join(root, key)):
+                shutil.rmtree(join(root, key))
+                mx.log('Removed ' + join(root, key))
@@ -0,0 +1,232 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, mx_jvmci_artifacts, os, re, json, hashlib, struct
+from os.path import join, exists
+from argparse import ArgumentParser
+
+# Header of the layout printed by org.openjdk.jol.MainObjectInternals for each class
+_layoutHeaderRE = re.compile(r'^(?P<classname>\S+) object internals:$')
+_instanceSizeRE = re.compile(r'^Instance size: (?P<size>\d+) bytes')
+
+def _cache_file():
+    return join(mx_jvmci._suite.get_output_root(), 'jol', 'layouts.json')
+
+def _class_index():
+    """
+    Gets a map from the name of each class compiled by a Java project of the JVMCI
+    suite to its class file, obtained with a single scan of the project output
+    directories.
+    """
+    index = {}
+    for p in mx_jvmci._suite.projects:
+        if not p.isJavaProject():
+            continue
+        outputDir = p.output_dir()
+        for root, _, files in os.walk(outputDir):
+            for f in files:
+                if f.endswith('.class'):
+                    path = join(root, f)
+                    index[os.path.relpath(path, outputDir)[:-len('.class')].replace(os.sep, '.')] = path
+    return index
+
+def _resolve(names, index):
+    """
+    Resolves each of 'names' to the classes it denotes: a fully qualified class name,
+    a simple class name or a package name (denoting all classes in the package,
+    including nested classes).
+    """
+    classes = []
+    for name in names:
+        matches = [c for c in index.iterkeys() if c == name or c.endswith('.' + name) or c.endswith('$' + name)]
+        if not matches:
+            matches = [c for c in index.iterkeys() if c.rsplit('.', 1)[0] == name]
+        if not matches:
+            mx.warn('No class or package matches ' + name)
+        for c in sorted(matches):
+            if c not in classes:
+                classes.append(c)
+    return classes
+
+def _digest(path):
+    with open(path, 'rb') as fp:
+        return hashlib.sha1(fp.read()).hexdigest()
+
+def _superclass(path):
+    """
+    Reads the name of the superclass of the class in the class file 'path', returning
+    None for java.lang.Object.
+    """
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    count = struct.unpack_from('>H', data, 8)[0]
+    pos = 10
+    utf8 = {}
+    classes = {}
+    i = 1
+    while i < count:
+        tag = ord(data[pos])
+        if tag == 1:
+            length = struct.unpack_from('>H', data, pos + 1)[0]
+            utf8[i] = data[pos + 3:pos + 3 + length]
+            pos += 3 + length
+        elif tag == 7:
+            classes[i] = struct.unpack_from('>H', data, pos + 1)[0]
+            pos += 3
+        elif tag in (8, 16):
+            pos += 3
+        elif tag == 15:
+            pos += 4
+        elif tag in (3, 4, 9, 10, 11, 12, 18):
+            pos += 5
+        elif tag in (5, 6):
+            pos += 9
+            i += 1
+        else:
+            mx.abort('Unknown constant pool tag {} in {}'.format(tag, path))
+        i += 1
+    superIndex = struct.unpack_from('>H', data, pos + 4)[0]
+    if superIndex == 0:
+        return None
+    return utf8[classes[superIndex]].replace('/', '.')
+
+def _layout_digest(c, index):
+    """
+    Digests the class files of 'c' and of its superclasses in the suite, which all
+    contribute fields to the layout of 'c'.
+    """
+    digest = hashlib.sha1()
+    while c in index:
+        digest.update(c + ' ' + _digest(index[c]) + ' ')
+        c = _superclass(index[c])
+    return digest.hexdigest()
+
+def _parse_layouts(output):
+    """
+    Splits the output of org.openjdk.jol.MainObjectInternals into the layouts of the
+    individual classes, returning a map from class name to (layout, instance size).
+    """
+    layouts = {}
+    current = None
+    lines = []
+    def _finish():
+        if current:
+            text = '\n'.join(lines).rstrip() + '\n'
+            size = None
+            for line in lines:
+                m = _instanceSizeRE.match(line)
+                if m:
+                    size = int(m.group('size'))
+            layouts[current] = (text, size)
+    for line in output.splitlines():
+        m = _layoutHeaderRE.match(line)
+        if m:
+            _finish()
+            current = m.group('classname')
+            lines = []
+        if current:
+            lines.append(line)
+    _finish()
+    return layouts
+
+def _batch(names, vmArgs, joljar, useCache, top):
+    index = _class_index()
+    classes = _resolve(names, index)
+    if not classes:
+        mx.abort('No classes to analyze')
+
+    # The layout depends on the class and its superclasses, the VM and the VM flags (e.g. compressed oops and object alignment)
+    flagsKey = ' '.join([mx_jvmci.get_vm(), mx_jvmci._vmbuild, _digest(joljar)] + sorted(vmArgs))
+    cacheFile = _cache_file()
+    cache = {}
+    if useCache and exists(cacheFile):
+        with open(cacheFile) as fp:
+            try:
+                cache = json.load(fp)
+            except ValueError:
+                mx.warn('Ignoring corrupt layout cache ' + cacheFile)
+
+    keys = dict(((c, hashlib.sha1(_layout_digest(c, index) + ' ' + flagsKey).hexdigest()) for c in classes))
+    missing = [c for c in classes if keys[c] not in cache]
+    if missing:
+        mx.log('Computing the layouts of {} classes ({} cached)'.format(len(missing), len(classes) - len(missing)))
+        out = mx.OutputCapture()
+        mx_jvmci.run_vm(vmArgs + ['-javaagent:' + joljar, '-cp', os.pathsep.join([mx.classpath(), joljar]), 'org.openjdk.jol.MainObjectInternals'] + missing, out=out, err=out, nonZeroIsFatal=False)
+        layouts = _parse_layouts(out.data)
+        for c in missing:
+            if c in layouts:
+                text, size = layouts[c]
+                cache[keys[c]] = {'class' : c, 'layout' : text, 'size' : size}
+            else:
+                mx.warn('No layout printed for ' + c + ' (e.g. an interface or a class that cannot be loaded)')
+        if useCache:
+            mx.ensure_dir_exists(os.path.dirname(cacheFile))
+            with open(cacheFile, 'w') as fp:
+                json.dump(cache, fp)
+
+    sizes = []
+    for c in classes:
+        entry = cache.get(keys[c])
+        if entry:
+            mx.log(entry['layout'])
+            if entry['size'] is not None:
+                sizes.append((entry['size'], c))
+    sizes.sort(key=lambda e: (-e[0], e[1]))
+    mx.log('Classes by instance size:')
+    for size, c in sizes[:top] if top else sizes:
+        mx.log('{:>8} {}'.format(size, c))
+
+def jol(args):
+    """Java Object Layout
+
+    Prints the object layout of classes as computed by JOL. With --batch, the
+    arguments may also be packages (e.g. jdk.vm.ci.meta), all layouts are computed
+    in a single VM run and the classes are ranked by instance size. The layouts
+    are cached per class file (including its superclasses) and VM flags in
+    <output root>/jol/layouts.json.
+    VM options (e.g. -XX:-UseCompressedOops) can precede the class names."""
+
+    parser = ArgumentParser(prog='mx jol')
+    parser.add_argument('--batch', action='store_true', help='analyze all given classes and packages in one VM run and rank them by instance size')
+    parser.add_argument('--no-cache', action='store_false', dest='cache', help='do not use or update the layout cache (batch mode only)')
+    parser.add_argument('--top', type=int, default=0, help='only rank the <n> largest classes (batch mode only)', metavar='<n>')
+    parser.add_argument('classes', nargs='*', metavar='class or package')
+    args, vmArgs = parser.parse_known_args(args)
+
+    joljar = mx_jvmci_artifacts.library_path('JOL_INTERNALS')
+    if args.batch:
+        _batch(args.classes, vmArgs, joljar, args.cache, args.top)
+        return
+
+    candidates = mx.findclass(args.classes, logToConsole=False, matcher=lambda s, classname: s == classname or classname.endswith('.' + s) or classname.endswith('$' + s))
+
+    if len(candidates) > 0:
+        candidates = mx.select_items(sorted(candidates))
+    else:
+        # mx.findclass can be mistaken, don't give up yet
+        candidates = args.classes
+
+    mx_jvmci.run_vm(vmArgs + ['-javaagent:' + joljar, '-cp', os.pathsep.join([mx.classpath(), joljar]), "org.openjdk.jol.MainObjectInternals"] + candidates)
@@ -24,7 +24,8 @@
 #
 # ----------------------------------------------------------------------------------------------------
 #
-import mx, mx_jvmci, os
+import mx, mx_jvmci, os, hashlib
+from os.path import join, exists
 from argparse import ArgumentParser, REMAINDER
 
 
@@ -43,6 +44,9 @@ class Makefile:
         return "\n\n".join(self.definitions + self.rules)
 
 
+def _default_dists():
+    return [d.dist() for d in mx_jvmci.jdkDeployedDists if isinstance(d, mx_jvmci.JarJDKDeployedDist) and d.partOfHotSpot]
+
 def build_makefile(args):
     """Creates a Makefile which is able to build distributions without mx
 
@@ -53,7 +57,7 @@ def build_makefile(args):
     opts = parser.parse_args(args)
 
     if not opts.selectedDists:
-        opts.selectedDists = [d.dist() for d in mx_jvmci.jdkDeployedDists if isinstance(d, mx_jvmci.JarJDKDeployedDist) and d.partOfHotSpot]
+        opts.selectedDists = _default_dists()
     else:
         opts.selectedDists = [mx.distribution(name) for name in opts.selectedDists]
     mf = Makefile()
@@ -62,10 +66,71 @@ def build_makefile(args):
         if opts.output == None:
             print contents
         else:
-            if mx.update_file(opts.output, contents, showDiff=True):
+            changed = mx.update_file(opts.output, contents, showDiff=True)
+            _record_fingerprint(opts.output, opts.selectedDists)
+            if changed:
                 return 1
     return 0
 
+def _fingerprint_path(makefile):
+    return makefile + '.fingerprint'
+
+def _inputs_fingerprint(makefile, selectedDists):
+    """
+    Computes a digest of the inputs determining the contents of 'makefile' as generated
+    for 'selectedDists': the suite definition, the generator itself, the files in the
+    source directories of the projects, the annotation processors they use and the
+    layout of the JDK. The JDK's boot class path is not computed as that requires
+    running the JDK; the names of the jars in its jre/lib directory are used instead.
+    The current contents of 'makefile' are included so that manual edits are detected.
+    """
+    digest = hashlib.sha1()
+    def _add(s):
+        digest.update(s)
+        digest.update('\0')
+    suite = mx_jvmci._suite
+    for f in [join(suite.mxDir, 'suite.py'), os.path.splitext(__file__)[0] + '.py', makefile]:
+        _add(f)
+        if exists(f):
+            with open(f) as fp:
+                _add(fp.read())
+    _add(' '.join([d.name for d in selectedDists]))
+
+    jdk = mx.get_jdk()
+    _add(str(jdk.javaCompliance))
+    libDir = join(jdk.home, 'jre', 'lib')
+    _add(' '.join(sorted([f for f in os.listdir(libDir) if f.endswith('.jar')])) if exists(libDir) else '')
+    _add(str(exists(join(jdk.home, 'jre', 'classes'))))
+
+    for p in sorted(suite.projects, key=lambda p: p.name):
+        if not p.isJavaProject():
+            continue
+        _add(p.name)
+        _add(' '.join(sorted([ap.name for ap in p.declaredAnnotationProcessors])))
+        for srcDir in p.srcDirs:
+            for root, dirs, files in os.walk(join(p.dir, srcDir)):
+                dirs.sort()
+                for f in sorted(files):
+                    _add(os.path.relpath(join(root, f), p.dir))
+    return digest.hexdigest()
+
+def _record_fingerprint(makefile, selectedDists):
+    with open(_fingerprint_path(makefile), 'w') as fp:
+        fp.write(_inputs_fingerprint(makefile, selectedDists) + '\n')
+
+def is_up_to_date(makefile):
+    """
+    Determines if 'makefile' was generated by 'mx makefile -o <makefile>' from the
+    same inputs as are currently present, in which case generating it again would
+    not change it.
+    """
+    fingerprintFile = _fingerprint_path(makefile)
+    if not exists(fingerprintFile) or not exists(makefile):
+        return False
+    with open(fingerprintFile) as fp:
+        recorded = fp.read().strip()
+    return recorded == _inputs_fingerprint(makefile, _default_dists())
+
 def get_jdk_deployed_dists():
     return [d.dist() for d in mx_jvmci.jdkDeployedDists]
 
@@ -81,61 +146,109 @@ def _get_dependency_check(p):
             jarFinders.append("$(shell find $(ABS_BOOTDIR)/ -name '%s'; echo $$?)" % jar)
     return "ifeq ({},'{}')".format("".join(jarFinders), "0" * len(jarFinders)) if len(jarFinders) > 0 else None
 
+def _project_variable_name(p):
+    return p.name.upper().replace('.', '_')
+
+def _project_deps(p):
+    """
+    Gets the Java projects 'p' transitively depends on.
+    """
+    deps = []
+    def _visit(dep):
+        for d in dep.deps:
+            if d.isJavaProject() and d not in deps:
+                _visit(d)
+                deps.append(d)
+    _visit(p)
+    return deps
+
+def _annotation_processor_projects(p):
+    """
+    Gets the Java projects making up the annotation processors used by 'p'.
+    """
+    projects = []
+    for apd in sorted(p.declaredAnnotationProcessors):
+        for ap in [d for d in apd.archived_deps() if d.isJavaProject()]:
+            for d in _project_deps(ap) + [ap]:
+                if d not in projects:
+                    projects.append(d)
+    return projects
+
+def _project_sources(p, projectDir):
+    """
+    Gets the files in the source directories of 'p'. The list is written into the
+    Makefile so that make does not have to search for them each time it runs.
+    """
+    sources = []
+    for srcDir in p.srcDirs:
+        for root, _, files in os.walk(os.path.join(p.dir, srcDir)):
+            sources.extend([os.path.join(projectDir, os.path.relpath(os.path.join(root, f), p.dir)) for f in files])
+    return sorted(sources)
+
+def make_project_rule(p, projectDir, mf):
+    """
+    Adds the rule compiling the Java project 'p' into its own class directory. The rule
+    depends on the class directories of the projects and annotation processors used by 'p'
+    such that independent projects can be compiled concurrently by make -jN. The class
+    directory is updated incrementally by the build helper.
+    """
+    name = _project_variable_name(p)
+    deps = _project_deps(p)
+    apProjects = _annotation_processor_projects(p)
+    resources = []
+    for src in [projectDir + '/' + d for d in p.srcDirs]:
+        metaInf = src + "/META-INF"
+        if os.path.exists(os.path.join(p.suite.dir, metaInf)):
+            resources.append(metaInf)
+    props = {
+           "name": name,
+           "projectName": p.name,
+           "sources": " \\\n    ".join([""] + _project_sources(p, projectDir)),
+           "prerequisites": " ".join(["$(" + _project_variable_name(d) + "_STAMP)" for d in deps + [ap for ap in apProjects if ap not in deps]]),
+           "processorPath": ":".join(["$(" + _project_variable_name(ap) + "_CLASSES)" for ap in apProjects]),
+           "classPath": ":".join(["$(" + _project_variable_name(d) + "_CLASSES)" for d in deps]),
+           "copyResources": " ".join(resources)
+           }
+    mf.add_definition("""{name}_SRC ={sources}
+
+{name}_CLASSES = $(TARGET)/classes/{projectName}
+
+{name}_STAMP = $(TARGET)/classes/{projectName}.stamp""".format(**props))
+    mf.add_rule("""$({name}_STAMP): $({name}_SRC) $(BUILD_HELPER) {prerequisites}
+\t$(call build_project,{processorPath},{classPath},{copyResources},$({name}_CLASSES),$({name}_STAMP))
+""".format(**props))
+
 def make_dist_rule(dist, mf):
     def path_dist_relative(p):
         return os.path.relpath(p, dist.suite.dir)
     jdkDeployedDists = get_jdk_deployed_dists()
     jarName = os.path.basename(dist.path)
-    sourcesVariableName = dist.name + "_SRC"
-    depJarVariableName = dist.name + "_DEP_JARS"
-    sources = []
-    resources = []
+    projectsVariableName = dist.name + "_PROJECTS"
     projects = [p for p in dist.archived_deps() if p.isJavaProject()]
     targetPathPrefix = "$(TARGET)/"
-    annotationProcessorDeps = set()
 
-    classPath = [targetPathPrefix + os.path.basename(e.path) for e in mx.classpath_entries(dist, includeSelf=False, preferProjects=False)]
     for p in projects:
-        projectDir = path_dist_relative(p.dir)
-        annotationProcessorDeps.update(p.declaredAnnotationProcessors)
         depCheck = _get_dependency_check(p)
         if depCheck:
-            sources.append(depCheck)
-        for src in [projectDir + '/' + d for d in p.srcDirs]:
-            sources.append(sourcesVariableName + " += $(shell find {} -type f 2> /dev/null)".format(src))
-            metaInf = src + "/META-INF"
-            if os.path.exists(os.path.join(dist.suite.dir, metaInf)):
-                resources.append(metaInf)
+            mf.add_definition(depCheck)
+            mf.add_rule(depCheck)
+        make_project_rule(p, path_dist_relative(p.dir), mf)
+        mf.add_definition(projectsVariableName + " += " + _project_variable_name(p))
         if depCheck:
-            sources.append("endif")
-
-    mf.add_definition("\n".join(sources))
+            mf.add_definition("endif")
+            mf.add_rule("endif")
 
-    apDistNames = []
-    apDistVariableNames = []
-    apDependencies = []
-    for apd in sorted(annotationProcessorDeps):
-        apDistNames.append(apd.name)
-        apDistVariableNames.append("$(" + apd.name + "_JAR)")
-        apDependencies.append("$(subst  $(space),:,$(" + apd.name + "_DEP_JARS))")
     shouldExport = dist in jdkDeployedDists
     props = {
            "name": dist.name,
            "jarName": targetPathPrefix + jarName,
-           "depJarsVariableAccess": "$(" + depJarVariableName + ")" if len(classPath) > 0 else "",
-           "depJarsVariable": depJarVariableName,
-           "sourcesVariableName": sourcesVariableName,
-           "annotationProcessors": " ".join(apDistVariableNames),
-           "cpAnnotationProcessors": ":".join(apDistVariableNames + apDependencies),
-           "jarDeps": " ".join(classPath),
-           "copyResources": " ".join(resources)
+           "projectsVariableName": projectsVariableName,
            }
 
     mf.add_definition("{name}_JAR = {jarName}".format(**props))
-    if len(classPath) > 0: mf.add_definition("{depJarsVariable} = {jarDeps}".format(**props))
     if shouldExport: mf.add_definition("EXPORTED_FILES += $({name}_JAR)".format(**props))
-    mf.add_rule("""$({name}_JAR): $({sourcesVariableName}) {annotationProcessors} {depJarsVariableAccess}
-\t$(call build_and_jar,{cpAnnotationProcessors},$(subst  $(space),:,{depJarsVariableAccess}),{copyResources},$({name}_JAR))
+    mf.add_rule("""$({name}_JAR): $(foreach p,$({projectsVariableName}),$($(p)_STAMP))
+\t$(call build_jar,$(foreach p,$({projectsVariableName}),$($(p)_CLASSES)),$({name}_JAR))
 """.format(**props))
     return
 
@@ -153,9 +266,17 @@ TARGET=.
 # Bootstrap JDK to be used (for javac and jar)
 ABS_BOOTDIR=
 
-JAVAC=$(ABS_BOOTDIR)/bin/javac -g -target """ + str(jdk.javaCompliance) + """
+JAVAC_FLAGS=-g -target """ + str(jdk.javaCompliance) + """
+JAVAC=$(ABS_BOOTDIR)/bin/javac $(JAVAC_FLAGS)
+JAVA=$(ABS_BOOTDIR)/bin/java
 JAR=$(ABS_BOOTDIR)/bin/jar
 
+# Helper used to compile projects incrementally and to package and export JAR files
+# (see JVMCIBuildHelper.java)
+BUILD_HELPER_SRC=$(HS_COMMON_SRC)/share/tools/JVMCIBuildHelper/JVMCIBuildHelper.java
+BUILD_HELPER_DIR=$(TARGET)/tools
+BUILD_HELPER=$(BUILD_HELPER_DIR)/JVMCIBuildHelper.class
+
 HS_COMMON_SRC=.
 
 # Directories, where the generated property-files reside within the JAR files
@@ -176,62 +297,37 @@ endif
 space :=
 space +=
 
-# Takes the provider files created by ServiceProviderProcessor (the processor
-# for the @ServiceProvider annotation) and merges them into a single file.
-# Arguments:
-#  1: directory with contents of the JAR file
-define process_providers
-    $(eval providers := $(1)/$(PROVIDERS_INF))
-    $(eval services := $(1)/$(SERVICES_INF))
-    $(QUIETLY) test -d $(services) || mkdir -p $(services)
-    $(QUIETLY) test ! -d $(providers) || (cd $(providers) && for i in $$(ls); do c=$$(cat $$i); echo $$i >> $(abspath $(services))/$$c; rm $$i; done)
-
-    @# Since all projects are built together with one javac call we cannot determine
-    @# which project contains HotSpotVMConfig.inline.hpp so we hardcode it.
-    $(eval vmconfig := $(1)/hotspot/HotSpotVMConfig.inline.hpp)
-    $(eval vmconfigDest := $(HS_COMMON_SRC)/../mxbuild/jvmci/jdk.vm.ci.hotspot/src_gen/hotspot)
-    $(QUIETLY) test ! -f $(vmconfig) || (mkdir -p $(vmconfigDest) && cp $(vmconfig) $(vmconfigDest))
-endef
-
-# Finds the *_OptionsDescriptors classes created by OptionProcessor (the processor for the @Option annotation)
-# and appends their names to services/jdk.vm.ci.options.OptionDescriptors.
-# Arguments:
-#  1: directory with contents of the JAR file
-define process_options
-    $(eval services := $(1)/META-INF/services)
-    $(QUIETLY) test -d $(services) || mkdir -p $(services)
-    $(eval optionDescriptors := $(1)/META-INF/services/jdk.vm.ci.options.OptionDescriptors)
-    $(QUIETLY) cd $(1) && for i in $$(find . -name '*_OptionDescriptors.class' 2>/dev/null); do echo $${i} | sed 's:\\./\\(.*\\)\\.class:\\1:g' | tr '/' '.' >> $(abspath $(optionDescriptors)); done
-endef
-
-# Extracts META-INF/jvmci.services from a JAR file into a given directory
-# Arguments:
-#  1: JAR file to extract
-#  2: target directory (which already exists)
-define extract
-    $(eval TMP := $(shell mktemp -d $(TARGET)/tmp_XXXXX))
-    $(QUIETLY) cd $(TMP) && $(JAR) xf $(abspath $(1)) && \\
-         (test ! -d .$(SERVICES_INF) || cp -r .$(SERVICES_INF) $(abspath $(2)));
-    $(QUIETLY) rm -r $(TMP);
-    $(QUIETLY) cp $(1) $(2)
-endef
-
-# Calls $(JAVAC) with the boot class path $(JDK_BOOTCLASSPATH) and sources taken from the automatic variable $^
+# Compiles the sources of a project taken from the automatic variable $^ into a class directory
+# with the boot class path $(JDK_BOOTCLASSPATH). The class directory is kept between builds and
+# $(BUILD_HELPER) only recompiles the sources that changed since the last compilation together
+# with the sources depending on classes that were recompiled, in this or in upstream projects.
 # Arguments:
 #  1: processorpath
 #  2: classpath
 #  3: resources to copy
-#  4: target JAR file
-define build_and_jar
-    $(info Building $(4))
-    $(eval TMP := $(shell mkdir -p $(TARGET) && mktemp -d $(TARGET)/tmp_XXXXX))
-    $(QUIETLY) $(JAVAC) -d $(TMP) -processorpath :$(1) -bootclasspath $(JDK_BOOTCLASSPATH) -cp :$(2) $(filter %.java,$^)
-    $(QUIETLY) test "$(3)" = "" || cp -r $(3) $(TMP)
-    $(QUIETLY) $(call process_options,$(TMP))
-    $(QUIETLY) $(call process_providers,$(TMP))
-    $(QUIETLY) mkdir -p $(shell dirname $(4))
-    $(QUIETLY) $(JAR) -0cf $(4) -C $(TMP) .
-    $(QUIETLY) rm -r $(TMP)
+#  4: class directory
+#  5: stamp file recording the time of the last compilation (written by $(BUILD_HELPER))
+define build_project
+    $(info Compiling $(4))
+    $(QUIETLY) $(JAVA) -cp $(BUILD_HELPER_DIR) JVMCIBuildHelper compile $(4) $(JAVAC_FLAGS) -processorpath :$(1) -bootclasspath $(JDK_BOOTCLASSPATH) -cp :$(2) $(filter %.java,$^)
+    $(QUIETLY) test "$(3)" = "" || cp -r $(3) $(4) || (rm -f $(5); false)
+endef
+
+# Packages the class directories of the projects in a distribution into a JAR file with
+# $(BUILD_HELPER). This merges the provider files created by ServiceProviderProcessor (the
+# processor for the @ServiceProvider annotation) into $(SERVICES_INF), lists the *_OptionDescriptors
+# classes created by OptionProcessor (the processor for the @Option annotation) in
+# META-INF/services/jdk.vm.ci.options.OptionDescriptors and copies HotSpotVMConfig.inline.hpp
+# to the directory where the HotSpot build expects it.
+# Arguments:
+#  1: class directories
+#  2: target JAR file
+define build_jar
+    $(info Building $(2))
+    @# The class directories of all projects in a distribution are merged so we
+    @# cannot determine which project contains HotSpotVMConfig.inline.hpp and
+    @# hardcode its destination instead.
+    $(QUIETLY) $(JAVA) -cp $(BUILD_HELPER_DIR) JVMCIBuildHelper jar $(2) $(HS_COMMON_SRC)/../mxbuild/jvmci/jdk.vm.ci.hotspot/src_gen/hotspot $(1)
 endef
 
 # Verifies that make/defs.make contains an appropriate line for each JVMCI service
@@ -250,10 +346,11 @@ define verify_defs_make
     $(foreach export,$(unconditionalExports),$(if $(findstring $(export),$(1)), ,$(error "The line '$(uncondPattern)$(export)' should not be in $(defs)")))
 endef
 
-all: default
+# Copies the exported JAR files and the contents of their $(SERVICES_INF)
+# directories into $(SHARED_DIR)
+all: default $(BUILD_HELPER)
 \t$(info Put $(EXPORTED_FILES) into SHARED_DIR $(SHARED_DIR))
-\t$(shell mkdir -p $(SHARED_DIR))
-\t$(foreach export,$(EXPORTED_FILES),$(call extract,$(export),$(SHARED_DIR)))
+\t$(QUIETLY) $(JAVA) -cp $(BUILD_HELPER_DIR) JVMCIBuildHelper extract $(SHARED_DIR) $(EXPORTED_FILES)
 
 export: all
 \t$(call verify_defs_make,$(notdir $(wildcard $(SHARED_DIR)/jvmci.services/*)),EXPORT_JRE_LIB_JVMCI_SERVICES_DIR)
@@ -261,9 +358,14 @@ export: all
 
 clean:
 \t$(QUIETLY) rm $(JARS) 2> /dev/null || true
+\t$(QUIETLY) rm -rf $(TARGET)/classes $(BUILD_HELPER_DIR)
 \t$(QUIETLY) rmdir -p $(dir $(JARS)) 2> /dev/null || true
 .PHONY: export clean
 
+$(BUILD_HELPER): $(BUILD_HELPER_SRC)
+\t$(QUIETLY) mkdir -p $(BUILD_HELPER_DIR)
+\t$(QUIETLY) $(JAVAC) -d $(BUILD_HELPER_DIR) $(BUILD_HELPER_SRC)
+
 """)
     assert selectedDists
     selectedDists = [mx.dependency(s) for s in selectedDists]
@@ -0,0 +1,142 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, shlex, shutil, json, time
+from os.path import join, exists
+from argparse import ArgumentParser
+
+"""
+The build variant whose libjvm is compiled with the profiles collected by 'mx pgo'.
+"""
+PGO_VMBUILD = 'product-pgo'
+
+"""
+True while 'mx pgo' builds the instrumented libjvm that collects the profiles.
+"""
+_instrumenting = False
+
+def profile_dir(vm):
+    """
+    Gets the directory of the profiles (GCC .gcda files) collected for 'vm'. The files
+    are named after the absolute paths of the object files, which is why the
+    instrumented and the optimized libjvm are built in the same output directory.
+    """
+    return join(mx_jvmci._suite.get_output_root(), 'pgo', mx_jvmci._hotspotOs(mx.get_os()), vm)
+
+def _has_profile(profileDir):
+    for _, _, files in os.walk(profileDir):
+        if any((f.endswith('.gcda') for f in files)):
+            return True
+    return False
+
+def _check_toolchain():
+    if mx.get_os() != 'linux':
+        mx.abort('Profile-guided optimized VM builds are only supported with GCC on Linux')
+
+def cflags(vm):
+    """
+    Gets the compiler flags with which the HotSpot makefiles build the libjvm of the
+    profile-guided optimized variant of 'vm'.
+    """
+    _check_toolchain()
+    profileDir = profile_dir(vm)
+    if _instrumenting:
+        return ['-fprofile-generate=' + profileDir]
+    if not _has_profile(profileDir):
+        mx.abort('No profile has been collected for the ' + vm + ' VM in ' + profileDir + ' - run "mx --vm ' + vm + ' pgo" first')
+    # The sources may have changed since the profile was collected and the counters
+    # of a multi-threaded VM are not updated atomically
+    return ['-fprofile-use=' + profileDir, '-fprofile-correction', '-Wno-coverage-mismatch', '-Wno-missing-profile']
+
+def _build(vm):
+    # The objects are compiled with different flags in each phase but from the same
+    # sources, so remove them to force make to compile them again
+    mx_jvmci._cleanHotSpot([vm], [PGO_VMBUILD])
+    with mx_jvmci.VM(vm, PGO_VMBUILD):
+        mx_jvmci.build([])
+
+def _default_workloads(vm):
+    if mx_jvmci.isJVMCIEnabled(vm):
+        return [['-XX:+BootstrapJVMCI', '-version']]
+    return [['-version']]
+
+def _train(vm, workloads, jmhBenchmarks):
+    with mx_jvmci.VM(vm, PGO_VMBUILD):
+        for vmArgs in workloads:
+            mx.log('Training the instrumented ' + vm + ' VM with: ' + ' '.join(vmArgs))
+            mx_jvmci.run_vm(vmArgs)
+        if jmhBenchmarks:
+            mx.log('Training the instrumented ' + vm + ' VM with the JMH benchmarks: ' + ' '.join(jmhBenchmarks))
+            # Short runs suffice for the profile, JSON arguments given by the user override these
+            mx_jvmci.jmh([json.dumps({'-f' : 1, '-wi' : 3, '-i' : 3})] + jmhBenchmarks)
+
+def pgo(args):
+    """build a profile-guided optimized VM
+
+    Builds an instrumented product libjvm for the selected VM, trains it with
+    the given workloads and then builds the libjvm again using the collected
+    profiles. The result is deployed into a JVMCI JDK of its own, selected by
+    "--vmbuild product-pgo". Without --workload and --jmh, the instrumented VM
+    is trained with a JVMCI bootstrap (or "-version" for VMs without JVMCI).
+    With --reuse-profile, the last collected profile is used again and only
+    the optimized libjvm is built (e.g. after a source change)."""
+
+    parser = ArgumentParser(prog='mx pgo')
+    parser.add_argument('--workload', action='append', dest='workloads', help='train with a VM run with the arguments <args> (may be repeated)', metavar='<args>')
+    parser.add_argument('--jmh', action='append', dest='jmh', help='train with the JMH benchmarks matching <filter> or with the JMH arguments given as JSON (may be repeated, see "mx jmh")', metavar='<filter>')
+    parser.add_argument('--reuse-profile', action='store_true', help='skip the instrumented build and the training')
+    args = parser.parse_args(args)
+
+    global _instrumenting
+    _check_toolchain()
+    vm = mx_jvmci.get_vm()
+    if vm == 'original':
+        mx.abort('The original VM is a copy of the VM in the bootstrap JDK and cannot be rebuilt')
+    profileDir = profile_dir(vm)
+
+    if not args.reuse_profile:
+        start = time.time()
+        if exists(profileDir):
+            shutil.rmtree(profileDir)
+        mx.ensure_dir_exists(profileDir)
+        mx.log('Building the instrumented ' + vm + ' VM')
+        _instrumenting = True
+        try:
+            _build(vm)
+        finally:
+            _instrumenting = False
+        workloads = [shlex.split(w) for w in args.workloads or []]
+        if not workloads and not args.jmh:
+            workloads = _default_workloads(vm)
+        _train(vm, workloads, args.jmh)
+        if not _has_profile(profileDir):
+            mx.abort('The training runs did not write a profile to ' + profileDir)
+        with open(join(profileDir, 'training.json'), 'w') as fp:
+            json.dump({'workloads' : workloads, 'jmh' : args.jmh or [], 'revision' : mx_jvmci._jvmciRevision(), 'seconds' : time.time() - start}, fp, indent=2)
+
+    mx.log('Building the profile-guided optimized ' + vm + ' VM')
+    _build(vm)
+    mx.log('The profile-guided optimized ' + vm + ' VM is in ' + mx_jvmci.get_jvmci_jdk_dir(build=PGO_VMBUILD, deployDists=False) + ' (use "--vmbuild ' + PGO_VMBUILD + '")')
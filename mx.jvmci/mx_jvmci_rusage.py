@@ -0,0 +1,134 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+"""
+Runs a command and records the resources it used.
+
+Usage: python mx_jvmci_rusage.py <result file> <command> [args...]
+
+The resource usage of the command is obtained with wait4(2) and written to
+<result file> as a JSON object. If the MX_VM_ACCOUNTING_CGROUP environment
+variable denotes a (delegated) cgroup v2 directory writable by the current
+user, the command is run in a fresh child cgroup of that directory and the
+cgroup's peak memory and CPU usage are recorded as well.
+
+This script is run by mx as a separate process and must not import mx.
+"""
+
+import os, sys, json, time, signal, platform
+
+def _create_cgroup():
+    parent = os.environ.get('MX_VM_ACCOUNTING_CGROUP')
+    if not parent or not os.path.isfile(os.path.join(parent, 'cgroup.procs')):
+        return None
+    cgroup = os.path.join(parent, 'mx-vm-' + str(os.getpid()))
+    try:
+        os.mkdir(cgroup)
+    except OSError:
+        return None
+    return cgroup
+
+def _read_cgroup(cgroup, result):
+    try:
+        with open(os.path.join(cgroup, 'memory.peak')) as fp:
+            result['cgroup_memory_peak'] = int(fp.read().strip())
+    except (IOError, ValueError):
+        pass
+    try:
+        with open(os.path.join(cgroup, 'cpu.stat')) as fp:
+            for line in fp:
+                parts = line.split()
+                if len(parts) == 2 and parts[0] in ('usage_usec', 'user_usec', 'system_usec'):
+                    result['cgroup_cpu_' + parts[0]] = int(parts[1])
+    except (IOError, ValueError):
+        pass
+
+def main():
+    resultFile = sys.argv[1]
+    cmd = sys.argv[2:]
+    cgroup = _create_cgroup()
+
+    start = time.time()
+    pid = os.fork()
+    if pid == 0:
+        if cgroup:
+            try:
+                with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as fp:
+                    fp.write('0')
+            except IOError:
+                pass
+        try:
+            os.execvp(cmd[0], cmd)
+        except OSError as e:
+            sys.stderr.write('Could not execute ' + cmd[0] + ': ' + str(e) + '\n')
+        os._exit(127)
+
+    # Forward termination requests to the command
+    def _forward(signum, frame):
+        os.kill(pid, signum)
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGQUIT):
+        signal.signal(signum, _forward)
+
+    while True:
+        try:
+            _, status, ru = os.wait4(pid, 0)
+            break
+        except OSError as e:
+            if e.errno != 4: # EINTR
+                raise
+    wall = time.time() - start
+
+    # ru_maxrss is in bytes on Mac OS X and in kilobytes elsewhere
+    maxrss = ru.ru_maxrss if platform.system() == 'Darwin' else ru.ru_maxrss * 1024
+    result = {
+        'wall' : wall,
+        'user' : ru.ru_utime,
+        'sys' : ru.ru_stime,
+        'maxrss' : maxrss,
+        'minflt' : ru.ru_minflt,
+        'majflt' : ru.ru_majflt,
+        'nvcsw' : ru.ru_nvcsw,
+        'nivcsw' : ru.ru_nivcsw,
+    }
+    if cgroup:
+        _read_cgroup(cgroup, result)
+        try:
+            os.rmdir(cgroup)
+        except OSError:
+            pass
+
+    if os.WIFSIGNALED(status):
+        result['signal'] = os.WTERMSIG(status)
+        exitCode = 128 + os.WTERMSIG(status)
+    else:
+        exitCode = os.WEXITSTATUS(status)
+    result['exitCode'] = exitCode
+    with open(resultFile, 'w') as fp:
+        json.dump(result, fp)
+    sys.exit(exitCode)
+
+if __name__ == '__main__':
+    main()
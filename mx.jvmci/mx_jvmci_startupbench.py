@@ -0,0 +1,186 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import mx, mx_jvmci, os, time, json, math
+from os.path import join, exists
+from argparse import ArgumentParser
+
+_helloWorldSource = """public class HelloWorld {
+    public static void main(String[] args) {
+        System.out.println("Hello World");
+    }
+}
+"""
+
+def _bench_dir():
+    return join(mx_jvmci._suite.get_output_root(), 'startupbench')
+
+def _hello_world_classpath():
+    """
+    Gets the class path of a HelloWorld class, compiling it first if necessary.
+    """
+    classesDir = join(_bench_dir(), 'classes')
+    if not exists(join(classesDir, 'HelloWorld.class')):
+        srcDir = mx.ensure_dir_exists(join(_bench_dir(), 'src'))
+        mx.ensure_dir_exists(classesDir)
+        source = join(srcDir, 'HelloWorld.java')
+        with open(source, 'w') as fp:
+            fp.write(_helloWorldSource)
+        mx.run([mx_jvmci.get_jvmci_bootstrap_jdk().javac, '-d', classesDir, source])
+    return classesDir
+
+def _built_vms(vms, builds):
+    """
+    Gets the (vm, vmbuild) pairs from 'vms' and 'builds' for which a VM has been built.
+    """
+    pairs = []
+    for vmbuild in builds:
+        jdkDir = join(mx_jvmci._jdksDir(), vmbuild)
+        if not exists(jdkDir):
+            continue
+        for vm in vms:
+            if mx_jvmci.isVMSupported(vm) and exists(join(mx_jvmci.vmLibDirInJdk(jdkDir), vm, mx_jvmci._lib('jvm'))):
+                pairs.append((vm, vmbuild))
+    return pairs
+
+def _benchmarks(vm):
+    """
+    Gets the (name, VM arguments) pairs of the startup benchmarks for 'vm'.
+    """
+    noBootstrap = ['-XX:-BootstrapJVMCI'] if vm == 'jvmci' else []
+    benchmarks = [
+        ('version', noBootstrap + ['-version']),
+        ('helloworld', noBootstrap + ['-cp', _hello_world_classpath(), 'HelloWorld']),
+    ]
+    if vm == 'jvmci':
+        benchmarks.append(('bootstrap', ['-XX:+BootstrapJVMCI', '-version']))
+    return benchmarks
+
+def _statistics(samples):
+    samples = sorted(samples)
+    n = len(samples)
+    mean = sum(samples) / n
+    if n % 2:
+        median = samples[n / 2]
+    else:
+        median = (samples[n / 2 - 1] + samples[n / 2]) / 2
+    stddev = math.sqrt(sum(((s - mean) ** 2 for s in samples)) / (n - 1)) if n > 1 else 0.0
+    return {'min' : samples[0], 'max' : samples[-1], 'mean' : mean, 'median' : median, 'stddev' : stddev, 'samples' : samples}
+
+def _measure(vm, vmbuild, vmArgs, repetitions, warmup):
+    def _discard(line):
+        pass
+    samples = []
+    for i in range(warmup + repetitions):
+        start = time.time()
+        mx_jvmci.run_vm(vmArgs, vm=vm, vmbuild=vmbuild, out=_discard, err=_discard)
+        if i >= warmup:
+            samples.append(time.time() - start)
+    return _statistics(samples)
+
+def _load_history(historyFile):
+    history = []
+    if exists(historyFile):
+        with open(historyFile) as fp:
+            for line in fp:
+                line = line.strip()
+                if line:
+                    try:
+                        history.append(json.loads(line))
+                    except ValueError:
+                        mx.warn('Ignoring malformed line in ' + historyFile + ': ' + line)
+    return history
+
+def _baseline(history, vm, vmbuild, benchmark, window):
+    """
+    Gets the median of the medians of the last 'window' recorded results for the given benchmark.
+    """
+    medians = [r['median'] for r in history if r['vm'] == vm and r['vmbuild'] == vmbuild and r['benchmark'] == benchmark][-window:]
+    if not medians:
+        return None
+    return _statistics(medians)['median']
+
+def startupbench(args):
+    """measure the startup and JVMCI bootstrap time of the built VMs
+
+    Runs '-version', a HelloWorld program and (for the jvmci VM) a JVMCI
+    bootstrap for every built VM and VM build. Results are appended to a
+    local history and each median is compared against the median of the
+    previous results to detect startup regressions."""
+
+    vmsDefault = ','.join(mx_jvmci._vmChoices.keys())
+    vmbuildsDefault = ','.join(mx_jvmci._vmbuildChoices)
+
+    parser = ArgumentParser(prog='mx startupbench')
+    parser.add_argument('--vms', help='a comma separated list of VMs to measure (default: ' + vmsDefault + ')', metavar='<args>', default=vmsDefault)
+    parser.add_argument('--builds', help='a comma separated list of build types to measure (default: ' + vmbuildsDefault + ')', metavar='<args>', default=vmbuildsDefault)
+    parser.add_argument('-n', '--repetitions', type=int, default=10, help='number of measured runs per benchmark (default: 10)', metavar='<n>')
+    parser.add_argument('-w', '--warmup', type=int, default=1, help='number of unmeasured runs per benchmark (default: 1)', metavar='<n>')
+    parser.add_argument('--history', help='file with the results of previous runs (default: <output root>/startupbench/history.json)', metavar='<path>')
+    parser.add_argument('--window', type=int, default=5, help='number of previous results to compare against (default: 5)', metavar='<n>')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percentage by which a median may exceed the baseline before it is reported as a regression (default: 10)', metavar='<percent>')
+    parser.add_argument('--no-record', action='store_true', help='do not add the results to the history')
+    args = parser.parse_args(args)
+
+    if args.repetitions < 1:
+        mx.abort('At least one repetition is required')
+    pairs = _built_vms(args.vms.split(','), args.builds.split(','))
+    if not pairs:
+        mx.abort('No VMs have been built')
+
+    historyFile = args.history or join(_bench_dir(), 'history.json')
+    history = _load_history(historyFile)
+    revision = mx_jvmci._jvmciRevision()
+
+    results = []
+    regressions = []
+    for vm, vmbuild in pairs:
+        for benchmark, vmArgs in _benchmarks(vm):
+            mx.log('Measuring ' + benchmark + ' on ' + vm + '-' + vmbuild)
+            stats = _measure(vm, vmbuild, vmArgs, args.repetitions, args.warmup)
+            baseline = _baseline(history, vm, vmbuild, benchmark, args.window)
+            line = '{:<10} {:<10} {:<12} median {:8.3f}s  min {:8.3f}s  max {:8.3f}s  stddev {:7.3f}s'.format(vm, vmbuild, benchmark, stats['median'], stats['min'], stats['max'], stats['stddev'])
+            if baseline:
+                change = (stats['median'] - baseline) * 100 / baseline
+                line += '  {:+6.1f}% vs {:.3f}s'.format(change, baseline)
+                if change > args.threshold:
+                    regressions.append(line)
+            mx.log(line)
+            result = {'timestamp' : time.time(), 'revision' : revision, 'vm' : vm, 'vmbuild' : vmbuild, 'benchmark' : benchmark}
+            result.update(stats)
+            results.append(result)
+
+    if not args.no_record:
+        mx.ensure_dir_exists(os.path.dirname(os.path.abspath(historyFile)))
+        with open(historyFile, 'a') as fp:
+            for result in results:
+                print >> fp, json.dumps(result, sort_keys=True)
+
+    if regressions:
+        mx.log('Startup regressions (more than {}% slower than the baseline):'.format(args.threshold))
+        for line in regressions:
+            mx.log('  ' + line)
+        mx.abort(1)
@@ -0,0 +1,147 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+#
+# Fast removal of large output directories: a directory is first renamed aside
+# (which is atomic and instant, so a new build can start right away) and then
+# deleted by a parallel unlink walker, usually in a detached background process.
+#
+# This module does not import mx as it is also run as a script by that process.
+#
+import os, sys, stat, errno, time, threading, subprocess, Queue
+from os.path import join, exists, dirname, basename
+
+_trashPrefix = '.trash.'
+
+def move_aside(path):
+    """
+    Renames 'path' to a uniquely named sibling, returning the new name or None if
+    'path' does not exist. The sibling is on the same file system as 'path' so the
+    rename is atomic.
+    """
+    if not os.path.lexists(path):
+        return None
+    trash = join(dirname(path), '{}{}.{}.{}'.format(_trashPrefix, basename(path), os.getpid(), int(time.time() * 1000)))
+    os.rename(path, trash)
+    return trash
+
+def leftovers(path):
+    """Gets the directories renamed aside from 'path' whose deletion did not complete (e.g. it was interrupted)."""
+    parent = dirname(path)
+    if not os.path.isdir(parent):
+        return []
+    prefix = _trashPrefix + basename(path) + '.'
+    return [join(parent, n) for n in os.listdir(parent) if n.startswith(prefix)]
+
+def _unlink(path, remove):
+    try:
+        remove(path)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        if e.errno != errno.EACCES:
+            raise
+        # Read-only files (on Windows) and directories without write permission
+        os.chmod(dirname(path), stat.S_IRWXU)
+        if remove == os.unlink:
+            os.chmod(path, stat.S_IRWXU)
+        remove(path)
+
+def delete_trees(paths, workers=16):
+    """
+    Deletes the directory trees 'paths' with 'workers' threads. The files of each
+    directory are unlinked by the thread that lists it while its subdirectories are
+    queued for the other threads, so the latency of file system operations (e.g. on
+    NFS) is overlapped. The directories are removed bottom up once they are empty.
+    """
+    queue = Queue.Queue()
+    dirs = []
+    errors = []
+    lock = threading.Lock()
+    for path in paths:
+        if os.path.isdir(path) and not os.path.islink(path):
+            queue.put((path, 0))
+        elif os.path.lexists(path):
+            _unlink(path, os.unlink)
+
+    def _work():
+        while True:
+            item = queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            directory, depth = item
+            try:
+                with lock:
+                    dirs.append((depth, directory))
+                for name in os.listdir(directory):
+                    path = join(directory, name)
+                    if os.path.isdir(path) and not os.path.islink(path):
+                        queue.put((path, depth + 1))
+                    else:
+                        _unlink(path, os.unlink)
+            except OSError as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                queue.task_done()
+
+    threads = [threading.Thread(target=_work) for _ in range(max(1, workers))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    queue.join()
+    for _ in threads:
+        queue.put(None)
+    for t in threads:
+        t.join()
+
+    for _, directory in sorted(dirs, reverse=True):
+        try:
+            _unlink(directory, os.rmdir)
+        except OSError as e:
+            errors.append(e)
+    return errors
+
+def delete_in_background(paths, workers=16):
+    """
+    Deletes 'paths' (as returned by move_aside) in a detached process that outlives
+    the current one.
+    """
+    paths = [p for p in paths if p]
+    if not paths:
+        return
+    kwargs = {}
+    if sys.platform == 'win32':
+        kwargs['creationflags'] = 0x00000008 # DETACHED_PROCESS
+    else:
+        kwargs['preexec_fn'] = os.setsid
+    with open(os.devnull, 'r+') as devnull:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__).replace('.pyc', '.py'), str(workers)] + paths,
+                         stdin=devnull, stdout=devnull, stderr=devnull, close_fds=sys.platform != 'win32', **kwargs)
+
+if __name__ == '__main__':
+    sys.exit(1 if delete_trees(sys.argv[2:], int(sys.argv[1])) else 0)
@@ -273,7 +273,7 @@ suite = {
     "hotspot" : {
       "native" : True,
       "class" : "HotSpotProject",
-      "output" : "build<nojvmci>",
+      "output" : "build<nojvmci><variant>",
       # vs-<arch>/<buildname>/generated/jvmtifiles/jvmti.h
       # vs-<arch>/<buildname>/<vmbuild>/<lib:jvm>
       # vs-<arch>/<buildname>/<vmbuild>/<libdebug:jvm>
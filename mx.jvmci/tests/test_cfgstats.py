@@ -0,0 +1,79 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import os, gzip, shutil, tempfile, unittest
+from StringIO import StringIO
+import mx_jvmci_cfgstats
+from mx_jvmci_cfgstats import CFGDumpParser
+
+_dump = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'c1visualizer.cfg')
+
+def _parse(content):
+    compilations = []
+    CFGDumpParser(compilations.append).parse(StringIO(content))
+    return compilations
+
+class CFGDumpParserTest(unittest.TestCase):
+    def setUp(self):
+        with open(_dump, 'rb') as fp:
+            self.content = fp.read()
+
+    def test_compilations(self):
+        compilations = _parse(self.content)
+        self.assertEqual(['java.lang.String::hashCode', 'java.lang.Math::max'], [c['method'] for c in compilations])
+        self.assertEqual([{'kind' : 'cfg', 'phase' : 'After Generation of HIR', 'blocks' : 1, 'hir' : 2, 'lir' : 0}], compilations[1]['phases'])
+
+    def test_cfg(self):
+        phases = _parse(self.content)[0]['phases']
+        self.assertEqual({'kind' : 'cfg', 'phase' : 'After Generation of HIR', 'blocks' : 2, 'hir' : 4, 'lir' : 0}, phases[0])
+        self.assertEqual({'kind' : 'cfg', 'phase' : 'Before Code Generation', 'blocks' : 1, 'hir' : 0, 'lir' : 4}, phases[1])
+
+    def test_intervals(self):
+        # Interval 44 is a split child of 42, intervals 43 and 44 are assigned to stack slots
+        phase = _parse(self.content)[0]['phases'][2]
+        self.assertEqual({'kind' : 'intervals', 'phase' : 'After Register Allocation', 'intervals' : 6, 'splits' : 1, 'spilled' : 2}, phase)
+
+    def test_truncated(self):
+        # The incomplete phase is dropped, the complete ones are reported
+        compilations = _parse(self.content[:self.content.index('begin_LIR')])
+        self.assertEqual(1, len(compilations))
+        self.assertEqual(['After Generation of HIR'], [p['phase'] for p in compilations[0]['phases']])
+
+    def test_truncated_gzip(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'dump.cfg.gz')
+            with gzip.open(path, 'wb') as fp:
+                fp.write(self.content)
+            with open(path, 'rb') as fp:
+                compressed = fp.read()
+            with open(path, 'wb') as fp:
+                fp.write(compressed[:len(compressed) - 20])
+            compilations, error = mx_jvmci_cfgstats._summarize_file(path)
+            self.assertIsNotNone(error)
+            self.assertEqual('java.lang.String::hashCode', compilations[0]['method'])
+        finally:
+            shutil.rmtree(tmp)
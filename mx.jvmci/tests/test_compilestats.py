@@ -0,0 +1,97 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import os, unittest
+from mx_jvmci_compilestats import CompilationEventParser, summarize
+
+_log = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'printcompilation.log')
+
+class CompilationEventParserTest(unittest.TestCase):
+    def setUp(self):
+        self.other = []
+        self.parser = CompilationEventParser('server', delegate=self.other.append)
+        with open(_log) as fp:
+            for line in fp:
+                self.parser(line)
+        self.parser.finish()
+        self.events = self.parser.events
+
+    def _event(self, kind, compileId):
+        matches = [e for e in self.events if e['event'] == kind and e['id'] == compileId]
+        self.assertEqual(1, len(matches), str(matches))
+        return matches[0]
+
+    def test_other_output(self):
+        self.assertEqual(['Hello World\n', 'Exiting\n'], self.other)
+
+    def test_compilation(self):
+        # A PrintCompilation line starts a compilation, the PrintCompilation2 line with its id completes it
+        event = self._event('compilation', 4)
+        self.assertEqual('java.lang.String::hashCode', event['method'])
+        self.assertEqual((4, 'C2', False, 55), (event['tier'], event['compiler'], event['osr'], event['bytes']))
+        self.assertEqual((20, 16, 800, 400), (event['time'], event['inlinedBytes'], event['codeSize'], event['instsSize']))
+        self.assertEqual('C1', self._event('compilation', 1)['compiler'])
+
+    def test_compilation_without_size(self):
+        event = self._event('compilation', 2)
+        self.assertEqual((3, 0), (event['time'], event['inlinedBytes']))
+        self.assertNotIn('codeSize', event)
+
+    def test_osr(self):
+        event = self._event('compilation', 3)
+        self.assertTrue(event['osr'])
+        self.assertEqual(('Test::loop', 4, 9), (event['method'], event['bci'], event['time']))
+
+    def test_compiler_name(self):
+        self.assertEqual('JVMCI', self._event('compilation', 7)['compiler'])
+
+    def test_busy(self):
+        # Compilation 2 overlaps with 1 and 3 in C1
+        self.assertEqual([1, 2, 2], [self._event('compilation', i)['busy'] for i in (1, 2, 3)])
+
+    def test_deopt(self):
+        event = self._event('deopt', 1)
+        self.assertEqual('not entrant', event['state'])
+
+    def test_failure(self):
+        event = self._event('failure', 6)
+        self.assertTrue(event['reason'].startswith('COMPILE SKIPPED: out of nodes'))
+        self.assertEqual([], [e for e in self.events if e['event'] == 'compilation' and e['id'] == 6])
+
+    def test_native_wrapper(self):
+        self.assertEqual([], [e for e in self.events if e['id'] == 5])
+
+    def test_unfinished(self):
+        self.assertIsNone(self._event('compilation', 8)['time'])
+
+    def test_summarize(self):
+        summary = summarize(self.events)
+        self.assertEqual(['C1', 'C2', 'JVMCI'], sorted(summary.keys()))
+        c1 = summary['C1']
+        self.assertEqual((3, 1, 114, 17, 1, 2), (c1['compilations'], c1['osr'], c1['bytes'], c1['time'], c1['deopts'], c1['maxBusy']))
+        c2 = summary['C2']
+        # The unfinished compilation does not count towards the bytes and time
+        self.assertEqual((2, 55, 20, 1), (c2['compilations'], c2['bytes'], c2['time'], c2['failures']))
@@ -0,0 +1,64 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import os, unittest
+from StringIO import StringIO
+from mx_jvmci_igvstats import IGVDumpParser
+
+_dump = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'igv.xml')
+
+def _parse(fp):
+    compilations = []
+    IGVDumpParser(compilations.append).parse(fp)
+    return compilations
+
+def _counts(compilation):
+    return [(p['phase'], p['nodes'], p['blocks']) for p in compilation['phases']]
+
+class IGVDumpParserTest(unittest.TestCase):
+    def setUp(self):
+        with open(_dump, 'rb') as fp:
+            self.content = fp.read()
+
+    def test_complete_graphs(self):
+        # Each graph of a group without difference="1" lists all of its nodes
+        compilation = _parse(StringIO(self.content))[0]
+        self.assertEqual('virtual jint java.lang.String.hashCode()', compilation['method'])
+        self.assertEqual([('After Parsing', 4, 2), ('Before matching', 2, 1)], _counts(compilation))
+
+    def test_difference_graphs(self):
+        compilation = _parse(StringIO(self.content))[1]
+        self.assertEqual('java.lang.Math.max(int, int)', compilation['method'])
+        self.assertEqual([('initial state', 2, 0), ('After phase Canonicalizer', 3, 0), ('After phase Lowering', 4, 2)], _counts(compilation))
+
+    def test_truncated(self):
+        # A dump of a VM that crashed in the Lowering phase of the second compilation
+        truncated = self.content[:self.content.index('<removeNode')]
+        compilations = []
+        parser = IGVDumpParser(compilations.append)
+        self.assertRaises(SyntaxError, parser.parse, StringIO(truncated))
+        self.assertEqual(['virtual jint java.lang.String.hashCode()', 'java.lang.Math.max(int, int)'], [c['method'] for c in compilations])
+        self.assertEqual([('initial state', 2, 0), ('After phase Canonicalizer', 3, 0)], _counts(compilations[1]))
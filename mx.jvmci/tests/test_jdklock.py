@@ -0,0 +1,144 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import os, shutil, tempfile, threading, time, unittest
+import mx_jvmci_jdklock
+
+class JDKLockTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.jdkDir = os.path.join(self.tmp, 'product')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _start(self, action):
+        t = threading.Thread(target=action)
+        t.daemon = True
+        t.start()
+        return t
+
+    def _held(self):
+        return mx_jvmci_jdklock._entry(mx_jvmci_jdklock._lock_file(self.jdkDir))
+
+    def test_writer_waits_for_reader_thread(self):
+        reading = threading.Event()
+        done = threading.Event()
+        written = threading.Event()
+        def reader():
+            with mx_jvmci_jdklock.reading(self.jdkDir):
+                reading.set()
+                done.wait(10)
+        def writer():
+            with mx_jvmci_jdklock.writing(self.jdkDir):
+                written.set()
+        r = self._start(reader)
+        self.assertTrue(reading.wait(10))
+        w = self._start(writer)
+        self.assertFalse(written.wait(0.5))
+        done.set()
+        self.assertTrue(written.wait(10))
+        r.join(10)
+        w.join(10)
+        self.assertIsNone(self._held().fp)
+
+    def test_readers_share(self):
+        entered = [threading.Event(), threading.Event()]
+        done = threading.Event()
+        def reader(i):
+            with mx_jvmci_jdklock.reading(self.jdkDir):
+                entered[i].set()
+                done.wait(10)
+        threads = [self._start(lambda i=i: reader(i)) for i in range(2)]
+        self.assertTrue(all(e.wait(10) for e in entered))
+        done.set()
+        for t in threads:
+            t.join(10)
+
+    def test_waiting_writer_keeps_new_readers_out(self):
+        reading = threading.Event()
+        done = threading.Event()
+        order = []
+        def firstReader():
+            with mx_jvmci_jdklock.reading(self.jdkDir):
+                reading.set()
+                done.wait(10)
+        def writer():
+            with mx_jvmci_jdklock.writing(self.jdkDir):
+                order.append('writer')
+        def secondReader():
+            with mx_jvmci_jdklock.reading(self.jdkDir):
+                order.append('reader')
+        r = self._start(firstReader)
+        self.assertTrue(reading.wait(10))
+        w = self._start(writer)
+        while not self._held().waitingWriters:
+            time.sleep(0.01)
+        r2 = self._start(secondReader)
+        time.sleep(0.2)
+        self.assertEqual([], order)
+        done.set()
+        for t in [r, w, r2]:
+            t.join(10)
+        self.assertEqual(['writer', 'reader'], order)
+
+    def test_concurrent_upgrades(self):
+        bothReading = threading.Semaphore(0)
+        upgrade = threading.Event()
+        writers = []
+        overlaps = []
+        def upgrader():
+            with mx_jvmci_jdklock.reading(self.jdkDir):
+                bothReading.release()
+                upgrade.wait(10)
+                with mx_jvmci_jdklock.writing(self.jdkDir):
+                    writers.append(threading.current_thread())
+                    if len(writers) > 1:
+                        overlaps.append(True)
+                    time.sleep(0.1)
+                    writers.pop()
+        threads = [self._start(upgrader) for _ in range(2)]
+        bothReading.acquire()
+        bothReading.acquire()
+        upgrade.set()
+        for t in threads:
+            t.join(10)
+            self.assertFalse(t.is_alive())
+        self.assertEqual([], overlaps)
+        self.assertIsNone(self._held().fp)
+
+    def test_reentrant(self):
+        with mx_jvmci_jdklock.writing(self.jdkDir):
+            with mx_jvmci_jdklock.reading(self.jdkDir):
+                with mx_jvmci_jdklock.writing(self.jdkDir):
+                    self.assertTrue(self._held().exclusive)
+            self.assertTrue(self._held().exclusive)
+        with mx_jvmci_jdklock.reading(self.jdkDir):
+            with mx_jvmci_jdklock.writing(self.jdkDir):
+                self.assertTrue(self._held().exclusive)
+            self.assertFalse(self._held().exclusive)
+            self.assertIsNotNone(self._held().fp)
+        self.assertIsNone(self._held().fp)
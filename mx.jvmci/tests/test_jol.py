@@ -0,0 +1,83 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import os, shutil, struct, tempfile, unittest
+import mx_jvmci_jol
+
+def _utf8(s):
+    return struct.pack('>BH', 1, len(s)) + s
+
+def _classFile(name, superName):
+    """
+    Creates a class file with a constant pool using every kind of constant of a
+    version 52 class file, including the two slot long and double constants.
+    """
+    pool = [
+        _utf8(name.replace('.', '/')),                  # 1
+        struct.pack('>BH', 7, 1),                       # 2: this class
+        struct.pack('>BQ', 5, 1 << 40),                 # 3, 4
+        _utf8((superName or '').replace('.', '/')),     # 5
+        struct.pack('>BH', 7, 5),                       # 6: super class
+        struct.pack('>Bi', 3, 42),                      # 7
+        struct.pack('>BH', 8, 1),                       # 8
+        struct.pack('>Bd', 6, 0.5),                     # 9, 10
+        struct.pack('>BHH', 12, 1, 1),                  # 11
+        struct.pack('>BHH', 9, 2, 11),                  # 12
+        struct.pack('>BBH', 15, 1, 12),                 # 13
+        struct.pack('>BH', 16, 1),                      # 14
+        struct.pack('>BHH', 18, 0, 11),                 # 15
+        struct.pack('>Bf', 4, 1.5),                     # 16
+        struct.pack('>BHH', 10, 2, 11),                 # 17
+        struct.pack('>BHH', 11, 2, 11),                 # 18
+    ]
+    return (struct.pack('>IHHH', 0xCAFEBABE, 0, 52, 19) + ''.join(pool) +
+            struct.pack('>HHHHHHH', 0x21, 2, 6 if superName else 0, 0, 0, 0, 0))
+
+class JolTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _write(self, name, superName):
+        path = os.path.join(self.tmp, name + '.class')
+        with open(path, 'wb') as fp:
+            fp.write(_classFile(name, superName))
+        return path
+
+    def test_superclass(self):
+        self.assertEqual('java.lang.Object', mx_jvmci_jol._superclass(self._write('a.A', 'java.lang.Object')))
+        self.assertEqual('a.A', mx_jvmci_jol._superclass(self._write('a.B', 'a.A')))
+        self.assertIsNone(mx_jvmci_jol._superclass(self._write('java.lang.Object', None)))
+
+    def test_layout_digest_includes_superclasses(self):
+        index = {'a.A' : self._write('a.A', 'java.lang.Object'), 'a.B' : self._write('a.B', 'a.A')}
+        before = mx_jvmci_jol._layout_digest('a.B', index)
+        self.assertEqual(before, mx_jvmci_jol._layout_digest('a.B', index))
+        # A changed superclass changes the layout of the subclass
+        index['a.A'] = self._write('a.A', 'a.Base')
+        self.assertNotEqual(before, mx_jvmci_jol._layout_digest('a.B', index))
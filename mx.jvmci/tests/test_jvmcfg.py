@@ -0,0 +1,71 @@
+#
+# ----------------------------------------------------------------------------------------------------
+#
+# Copyright (c) 2015, 2015, Oracle and/or its affiliates. All rights reserved.
+# DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+#
+# This code is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License version 2 only, as
+# published by the Free Software Foundation.
+#
+# This code is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+# version 2 for more details (a copy is included in the LICENSE file that
+# accompanied this code).
+#
+# You should have received a copy of the GNU General Public License version
+# 2 along with this work; if not, write to the Free Software Foundation,
+# Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+# or visit www.oracle.com if you need additional information or have any
+# questions.
+#
+# ----------------------------------------------------------------------------------------------------
+#
+import os, unittest
+from mx_jvmci import JvmCfg
+
+_jvmCfg = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jvm.cfg')
+
+class JvmCfgTest(unittest.TestCase):
+    def setUp(self):
+        with open(_jvmCfg) as fp:
+            self.lines = fp.readlines()
+        self.cfg = JvmCfg(_jvmCfg, self.lines)
+
+    def test_parse(self):
+        self.assertEqual(['server', 'client', 'hotspot'], list(self.cfg.entries.iterkeys()))
+        self.assertEqual('server', self.cfg.default_vm())
+        self.assertEqual(['server'], self.cfg.known())
+        self.assertTrue(self.cfg.is_known('server'))
+        self.assertFalse(self.cfg.is_known('client'))
+        self.assertFalse(self.cfg.is_known('jvmci'))
+        self.assertEqual({'hotspot' : 'server'}, self.cfg.aliases())
+
+    def test_with_default_vm(self):
+        lines = self.cfg.with_default_vm('jvmci', ['graal'])
+        # The comments stay in front of the declarations
+        self.assertEqual(self.lines[:12], lines[:12])
+        self.assertEqual(['-jvmci KNOWN\n', '-graal ALIASED_TO -jvmci\n'], lines[12:14])
+        self.assertEqual(self.lines[12:], lines[14:])
+        cfg = JvmCfg(_jvmCfg, lines)
+        self.assertEqual('jvmci', cfg.default_vm())
+        self.assertEqual({'graal' : 'jvmci', 'hotspot' : 'server'}, cfg.aliases())
+        # Declaring the default VM again does not change the file
+        self.assertEqual(lines, cfg.with_default_vm('jvmci', ['graal']))
+
+    def test_with_known_vm_as_default(self):
+        lines = self.cfg.with_default_vm('client', [])
+        self.assertEqual(['-client KNOWN\n', '-server KNOWN\n', '-hotspot ALIASED_TO -server\n'], lines[12:])
+        self.assertEqual('client', JvmCfg(_jvmCfg, lines).default_vm())
+
+    def test_round_trip(self):
+        self.assertEqual(self.lines, self.cfg.with_default_vm('server', []))
+        self.assertEqual(self.lines, JvmCfg(_jvmCfg, self.cfg.with_default_vm('jvmci', ['graal'])).without_vm('jvmci'))
+
+    def test_without_vm(self):
+        lines = self.cfg.without_vm('server')
+        self.assertEqual(self.lines[:12] + ['-client IGNORE\n'], lines)
+        self.assertIsNone(JvmCfg(_jvmCfg, lines).default_vm())
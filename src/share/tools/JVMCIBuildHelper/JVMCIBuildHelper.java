@@ -0,0 +1,817 @@
+/*
+ * Copyright (c) 2015, Oracle and/or its affiliates. All rights reserved.
+ * DO NOT ALTER OR REMOVE COPYRIGHT NOTICES OR THIS FILE HEADER.
+ *
+ * This code is free software; you can redistribute it and/or modify it
+ * under the terms of the GNU General Public License version 2 only, as
+ * published by the Free Software Foundation.
+ *
+ * This code is distributed in the hope that it will be useful, but WITHOUT
+ * ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+ * FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+ * version 2 for more details (a copy is included in the LICENSE file that
+ * accompanied this code).
+ *
+ * You should have received a copy of the GNU General Public License version
+ * 2 along with this work; if not, write to the Free Software Foundation,
+ * Inc., 51 Franklin St, Fifth Floor, Boston, MA 02110-1301 USA.
+ *
+ * Please contact Oracle, 500 Oracle Parkway, Redwood Shores, CA 94065 USA
+ * or visit www.oracle.com if you need additional information or have any
+ * questions.
+ *
+ */
+
+import java.io.*;
+import java.net.*;
+import java.nio.file.*;
+import java.util.*;
+import java.util.jar.*;
+import java.util.regex.*;
+import java.util.zip.*;
+
+import javax.annotation.processing.*;
+import javax.lang.model.*;
+import javax.lang.model.element.*;
+import javax.lang.model.util.*;
+import javax.tools.*;
+
+import com.sun.source.util.*;
+
+/**
+ * Helper for the JVMCI part of the HotSpot build (see make/jvmci.make, which is generated by
+ * {@code mx makefile}).
+ *
+ * <pre>
+ * JVMCIBuildHelper compile &lt;class directory&gt; [javac options] &lt;sources&gt;
+ * JVMCIBuildHelper jar &lt;JAR file&gt; &lt;HotSpotVMConfig.inline.hpp directory&gt; &lt;class directories&gt;
+ * JVMCIBuildHelper extract &lt;directory&gt; &lt;JAR files&gt;
+ * </pre>
+ *
+ * The {@code compile} command incrementally compiles the sources of a project into a persistent
+ * class directory. The following files next to the class directory hold the state between
+ * compilations:
+ * <dl>
+ * <dt>&lt;class directory&gt;.stamp</dt>
+ * <dd>touched after each successful compilation; sources newer than it are recompiled</dd>
+ * <dt>&lt;class directory&gt;.deps</dt>
+ * <dd>for each source, the classes it produced, the other files generated for it by annotation
+ * processors and the classes these refer to</dd>
+ * <dt>&lt;class directory&gt;.changed</dt>
+ * <dd>log of the classes (re)compiled or deleted, each with the time of the compilation</dd>
+ * </dl>
+ * A source is recompiled if it changed or if it refers, directly or through other sources that are
+ * recompiled, to a class that was recompiled or deleted since the last compilation, either in the
+ * same project or in a project whose class directory is on the class path. The files generated by
+ * annotation processors (e.g. {@code *_OptionDescriptors} classes and service provider files) are
+ * attributed to the sources of the elements they originate from and are deleted together with the
+ * classes of these sources. All sources are recompiled if there is no previous state or if an
+ * annotation processor on the processor path was recompiled. Note that uses of compile-time
+ * constants are not recorded in class files and hence not tracked; "make clean" forces a full
+ * rebuild.
+ *
+ * The {@code jar} command packages the class directories of a distribution, see
+ * {@link #jar(File, File, List)}. The {@code extract} command copies JAR files and the JVMCI
+ * service files they contain into a directory, see {@link #extract(File, List)}.
+ */
+public class JVMCIBuildHelper {
+
+    static final String PROVIDERS_INF = "META-INF/jvmci.providers/";
+    static final String SERVICES_INF = "META-INF/jvmci.services/";
+    static final String OPTION_DESCRIPTORS = "META-INF/services/jdk.vm.ci.options.OptionDescriptors";
+    static final String VMCONFIG = "hotspot/HotSpotVMConfig.inline.hpp";
+
+    /**
+     * Earliest time (in seconds) representable in a zip file (1980-01-01 00:00:00 UTC).
+     */
+    static final long ZIP_EPOCH = 315532800L;
+
+    public static void main(String[] args) throws IOException {
+        String command = args.length == 0 ? "" : args[0];
+        if (command.equals("compile") && args.length >= 2) {
+            List<String> options = new ArrayList<>();
+            List<String> sources = new ArrayList<>();
+            for (int i = 2; i < args.length; i++) {
+                (args[i].endsWith(".java") ? sources : options).add(args[i]);
+            }
+            System.exit(compile(new File(args[1]), options, sources) ? 0 : 1);
+        } else if (command.equals("jar") && args.length >= 3) {
+            List<File> classDirs = new ArrayList<>();
+            for (int i = 3; i < args.length; i++) {
+                classDirs.add(new File(args[i]));
+            }
+            jar(new File(args[1]), new File(args[2]), classDirs);
+        } else if (command.equals("extract") && args.length >= 2) {
+            List<File> jars = new ArrayList<>();
+            for (int i = 2; i < args.length; i++) {
+                jars.add(new File(args[i]));
+            }
+            extract(new File(args[1]), jars);
+        } else {
+            System.err.println("Usage: JVMCIBuildHelper compile <class directory> [javac options] <sources>");
+            System.err.println("       JVMCIBuildHelper jar <JAR file> <HotSpotVMConfig.inline.hpp directory> <class directories>");
+            System.err.println("       JVMCIBuildHelper extract <directory> <JAR files>");
+            System.exit(1);
+        }
+    }
+
+    /**
+     * The classes produced by and referred to by a source file and the other files (paths relative
+     * to the class directory) generated for it by annotation processors.
+     */
+    static class SourceInfo {
+        final Set<String> produced = new TreeSet<>();
+        final Set<String> referenced = new TreeSet<>();
+        final Set<String> generated = new TreeSet<>();
+    }
+
+    static File sibling(File classDir, String suffix) {
+        return new File(classDir.getPath() + suffix);
+    }
+
+    static boolean compile(File classDir, List<String> options, List<String> sources) throws IOException {
+        long start = System.currentTimeMillis();
+        File stamp = sibling(classDir, ".stamp");
+        File depsFile = sibling(classDir, ".deps");
+        File changedFile = sibling(classDir, ".changed");
+        Map<String, SourceInfo> deps = stamp.exists() && classDir.isDirectory() ? readDeps(depsFile) : null;
+        String classPath = option(options, "-cp", "-classpath");
+        String processorPath = option(options, "-processorpath", null);
+
+        if (deps != null) {
+            for (File dir : directories(processorPath)) {
+                if (sibling(dir, ".stamp").lastModified() > stamp.lastModified()) {
+                    System.out.println("Annotation processor in " + dir + " changed");
+                    deps = null;
+                    break;
+                }
+            }
+        }
+
+        Set<String> toCompile = new TreeSet<>();
+        Set<String> deleted = new TreeSet<>();
+        Set<String> deletedFiles = new TreeSet<>();
+        Set<String> sourceSet = new HashSet<>(sources);
+        if (deps == null) {
+            stamp.delete();
+            depsFile.delete();
+            changedFile.delete();
+            deleteContents(classDir);
+            classDir.mkdirs();
+            deps = new HashMap<>();
+            toCompile.addAll(sources);
+        } else {
+            Set<String> changedClasses = new HashSet<>();
+            for (String source : sources) {
+                if (!deps.containsKey(source) || new File(source).lastModified() > stamp.lastModified()) {
+                    toCompile.add(source);
+                }
+            }
+            for (String source : new ArrayList<>(deps.keySet())) {
+                if (toCompile.contains(source) || !sourceSet.contains(source)) {
+                    changedClasses.addAll(deps.get(source).produced);
+                }
+                if (!sourceSet.contains(source)) {
+                    SourceInfo info = deps.remove(source);
+                    deleted.addAll(info.produced);
+                    deletedFiles.addAll(info.generated);
+                }
+            }
+            for (File dir : directories(classPath)) {
+                changedClasses.addAll(readChanged(sibling(dir, ".changed"), stamp.lastModified()));
+            }
+            // Iterate to a fixed point: a changed member of a superclass or interface can affect
+            // sources that only refer to a subclass or subinterface of it
+            boolean added = true;
+            while (added) {
+                added = false;
+                for (Map.Entry<String, SourceInfo> e : deps.entrySet()) {
+                    if (!toCompile.contains(e.getKey()) && !Collections.disjoint(e.getValue().referenced, changedClasses)) {
+                        toCompile.add(e.getKey());
+                        changedClasses.addAll(e.getValue().produced);
+                        added = true;
+                    }
+                }
+            }
+            for (String source : toCompile) {
+                SourceInfo info = deps.get(source);
+                if (info != null) {
+                    deleted.addAll(info.produced);
+                    deletedFiles.addAll(info.generated);
+                }
+            }
+            for (String className : deleted) {
+                new File(classDir, className.replace('.', File.separatorChar) + ".class").delete();
+            }
+            for (String path : deletedFiles) {
+                new File(classDir, path.replace('/', File.separatorChar)).delete();
+            }
+        }
+
+        Map<String, SourceInfo> compiled = new HashMap<>();
+        if (!toCompile.isEmpty()) {
+            System.out.println("Compiling " + toCompile.size() + " of " + sources.size() + " sources into " + classDir);
+            List<String> javacOptions = new ArrayList<>(options);
+            setOption(javacOptions, "-cp", classDir.getPath() + File.pathSeparator + (classPath == null ? "" : classPath));
+            javacOptions.add("-d");
+            javacOptions.add(classDir.getPath());
+            if (!javac(javacOptions, toCompile, classDir, compiled)) {
+                return false;
+            }
+        }
+
+        deps.putAll(compiled);
+        writeDeps(depsFile, deps);
+        try (PrintStream out = new PrintStream(new FileOutputStream(changedFile, true))) {
+            Set<String> changed = new TreeSet<>(deleted);
+            for (SourceInfo info : compiled.values()) {
+                changed.addAll(info.produced);
+            }
+            for (String className : changed) {
+                out.println(start + " " + className);
+            }
+        }
+        new FileOutputStream(stamp).close();
+        stamp.setLastModified(start);
+        return true;
+    }
+
+    /**
+     * Compiles {@code sources} and records the classes produced by each of them, the files
+     * generated for them by annotation processors and the classes those refer to in
+     * {@code compiled}.
+     */
+    static boolean javac(List<String> options, Set<String> sources, File classDir, Map<String, SourceInfo> compiled) throws IOException {
+        JavaCompiler compiler = ToolProvider.getSystemJavaCompiler();
+        if (compiler == null) {
+            System.err.println("No system Java compiler available (is this a JRE?)");
+            return false;
+        }
+        final Map<String, String> classToSource = new HashMap<>();
+        StandardJavaFileManager standard = compiler.getStandardFileManager(null, null, null);
+        JavaFileManager fileManager = new ForwardingJavaFileManager<JavaFileManager>(standard) {
+            @Override
+            public JavaFileObject getJavaFileForOutput(Location location, String className, JavaFileObject.Kind kind, FileObject sibling) throws IOException {
+                if (kind == JavaFileObject.Kind.CLASS && sibling != null) {
+                    classToSource.put(className, new File(sibling.toUri()).getCanonicalPath());
+                }
+                return super.getJavaFileForOutput(location, className, kind, sibling);
+            }
+        };
+        List<File> files = new ArrayList<>();
+        Map<String, String> pathToSource = new HashMap<>();
+        for (String source : sources) {
+            File file = new File(source);
+            files.add(file);
+            pathToSource.put(file.getCanonicalPath(), source);
+        }
+        JavaCompiler.CompilationTask task = compiler.getTask(null, fileManager, null, options, null, standard.getJavaFileObjectsFromFiles(files));
+        Map<String, Set<String>> origins = new HashMap<>();
+        boolean success;
+        try (URLClassLoader processorLoader = processorLoader(options)) {
+            if (processorLoader != null) {
+                List<Processor> processors = new ArrayList<>();
+                for (Processor processor : ServiceLoader.load(Processor.class, processorLoader)) {
+                    processors.add(new RecordingProcessor(processor, origins));
+                }
+                task.setProcessors(processors);
+            }
+            success = task.call();
+        }
+        fileManager.close();
+        if (!success) {
+            return false;
+        }
+        for (Map.Entry<String, String> e : classToSource.entrySet()) {
+            // A class compiled from a source generated by an annotation processor belongs
+            // to the sources of the elements the generated source originates from
+            Set<String> owners = pathToSource.containsKey(e.getValue()) ? Collections.singleton(e.getValue()) : origins.getOrDefault(e.getValue(), Collections.<String> emptySet());
+            for (String owner : owners) {
+                SourceInfo info = sourceInfo(compiled, pathToSource.get(owner));
+                if (info != null) {
+                    info.produced.add(e.getKey());
+                    info.referenced.addAll(referencedClasses(new File(classDir, e.getKey().replace('.', File.separatorChar) + ".class")));
+                }
+            }
+        }
+        String classDirPath = classDir.getCanonicalPath() + File.separator;
+        for (Map.Entry<String, Set<String>> e : origins.entrySet()) {
+            if (e.getKey().startsWith(classDirPath)) {
+                String path = e.getKey().substring(classDirPath.length()).replace(File.separatorChar, '/');
+                for (String owner : e.getValue()) {
+                    SourceInfo info = sourceInfo(compiled, pathToSource.get(owner));
+                    if (info != null) {
+                        info.generated.add(path);
+                    }
+                }
+            }
+        }
+        for (String source : sources) {
+            if (!compiled.containsKey(source)) {
+                // e.g. package-info.java
+                compiled.put(source, new SourceInfo());
+            }
+        }
+        return true;
+    }
+
+    static SourceInfo sourceInfo(Map<String, SourceInfo> compiled, String source) {
+        if (source == null) {
+            return null;
+        }
+        SourceInfo info = compiled.get(source);
+        if (info == null) {
+            info = new SourceInfo();
+            compiled.put(source, info);
+        }
+        return info;
+    }
+
+    /**
+     * Creates a class loader for the annotation processors on the processor path, as discovered by
+     * javac, or returns null if annotation processing is disabled or the processors are named
+     * explicitly.
+     */
+    static URLClassLoader processorLoader(List<String> options) throws IOException {
+        if (options.contains("-proc:none") || options.contains("-processor")) {
+            return null;
+        }
+        List<URL> urls = new ArrayList<>();
+        String processorPath = option(options, "-processorpath", null);
+        for (String entry : (processorPath == null ? "" : processorPath).split(File.pathSeparator)) {
+            if (!entry.isEmpty()) {
+                urls.add(new File(entry).toURI().toURL());
+            }
+        }
+        return urls.isEmpty() ? null : new URLClassLoader(urls.toArray(new URL[urls.size()]), JVMCIBuildHelper.class.getClassLoader());
+    }
+
+    static String canonicalPath(URI uri) throws IOException {
+        return new File(uri).getCanonicalPath();
+    }
+
+    /**
+     * An annotation processor that records, for each file created by {@code processor}, the
+     * canonical paths of the sources of the elements the file originates from in {@code origins}.
+     */
+    static class RecordingProcessor implements Processor {
+        final Processor processor;
+        final Map<String, Set<String>> origins;
+
+        RecordingProcessor(Processor processor, Map<String, Set<String>> origins) {
+            this.processor = processor;
+            this.origins = origins;
+        }
+
+        @Override
+        public Set<String> getSupportedOptions() {
+            return processor.getSupportedOptions();
+        }
+
+        @Override
+        public Set<String> getSupportedAnnotationTypes() {
+            return processor.getSupportedAnnotationTypes();
+        }
+
+        @Override
+        public SourceVersion getSupportedSourceVersion() {
+            return processor.getSupportedSourceVersion();
+        }
+
+        @Override
+        public void init(final ProcessingEnvironment env) {
+            final Filer filer = new RecordingFiler(env.getFiler(), Trees.instance(env), origins);
+            processor.init(new ProcessingEnvironment() {
+                @Override
+                public Map<String, String> getOptions() {
+                    return env.getOptions();
+                }
+
+                @Override
+                public Messager getMessager() {
+                    return env.getMessager();
+                }
+
+                @Override
+                public Filer getFiler() {
+                    return filer;
+                }
+
+                @Override
+                public Elements getElementUtils() {
+                    return env.getElementUtils();
+                }
+
+                @Override
+                public Types getTypeUtils() {
+                    return env.getTypeUtils();
+                }
+
+                @Override
+                public SourceVersion getSourceVersion() {
+                    return env.getSourceVersion();
+                }
+
+                @Override
+                public Locale getLocale() {
+                    return env.getLocale();
+                }
+            });
+        }
+
+        @Override
+        public boolean process(Set<? extends TypeElement> annotations, RoundEnvironment roundEnv) {
+            return processor.process(annotations, roundEnv);
+        }
+
+        @Override
+        public Iterable<? extends Completion> getCompletions(Element element, AnnotationMirror annotation, ExecutableElement member, String userText) {
+            return processor.getCompletions(element, annotation, member, userText);
+        }
+    }
+
+    static class RecordingFiler implements Filer {
+        final Filer filer;
+        final Trees trees;
+        final Map<String, Set<String>> origins;
+
+        RecordingFiler(Filer filer, Trees trees, Map<String, Set<String>> origins) {
+            this.filer = filer;
+            this.trees = trees;
+            this.origins = origins;
+        }
+
+        <T extends FileObject> T record(T file, Element[] originatingElements) throws IOException {
+            Set<String> sources = new HashSet<>();
+            for (Element e : originatingElements) {
+                TreePath path = trees.getPath(e);
+                if (path != null) {
+                    sources.add(canonicalPath(path.getCompilationUnit().getSourceFile().toUri()));
+                }
+            }
+            origins.put(canonicalPath(file.toUri()), sources);
+            return file;
+        }
+
+        @Override
+        public JavaFileObject createSourceFile(CharSequence name, Element... originatingElements) throws IOException {
+            return record(filer.createSourceFile(name, originatingElements), originatingElements);
+        }
+
+        @Override
+        public JavaFileObject createClassFile(CharSequence name, Element... originatingElements) throws IOException {
+            return record(filer.createClassFile(name, originatingElements), originatingElements);
+        }
+
+        @Override
+        public FileObject createResource(JavaFileManager.Location location, CharSequence pkg, CharSequence relativeName, Element... originatingElements) throws IOException {
+            return record(filer.createResource(location, pkg, relativeName, originatingElements), originatingElements);
+        }
+
+        @Override
+        public FileObject getResource(JavaFileManager.Location location, CharSequence pkg, CharSequence relativeName) throws IOException {
+            return filer.getResource(location, pkg, relativeName);
+        }
+    }
+
+    private static final Pattern DESCRIPTOR_CLASS = Pattern.compile("L([^;<>\\[]+)[;<]");
+
+    /**
+     * Gets the names of the classes referred to by the constant pool of a class file.
+     */
+    static Set<String> referencedClasses(File classFile) throws IOException {
+        Set<String> result = new TreeSet<>();
+        try (DataInputStream in = new DataInputStream(new BufferedInputStream(new FileInputStream(classFile)))) {
+            in.readInt(); // magic
+            in.readUnsignedShort(); // minor_version
+            in.readUnsignedShort(); // major_version
+            int count = in.readUnsignedShort();
+            String[] utf8 = new String[count];
+            List<Integer> classIndexes = new ArrayList<>();
+            for (int i = 1; i < count; i++) {
+                int tag = in.readUnsignedByte();
+                switch (tag) {
+                    case 1: // Utf8
+                        utf8[i] = in.readUTF();
+                        break;
+                    case 7: // Class
+                        classIndexes.add(in.readUnsignedShort());
+                        break;
+                    case 8: // String
+                    case 16: // MethodType
+                        in.skipBytes(2);
+                        break;
+                    case 15: // MethodHandle
+                        in.skipBytes(3);
+                        break;
+                    case 3: // Integer
+                    case 4: // Float
+                    case 9: // Fieldref
+                    case 10: // Methodref
+                    case 11: // InterfaceMethodref
+                    case 12: // NameAndType
+                    case 18: // InvokeDynamic
+                        in.skipBytes(4);
+                        break;
+                    case 5: // Long
+                    case 6: // Double
+                        in.skipBytes(8);
+                        i++;
+                        break;
+                    default:
+                        throw new IOException("Unknown constant pool tag " + tag + " in " + classFile);
+                }
+            }
+            for (int index : classIndexes) {
+                String name = utf8[index];
+                if (name.startsWith("[")) {
+                    addDescriptorClasses(name, result);
+                } else {
+                    result.add(name.replace('/', '.'));
+                }
+            }
+            for (String s : utf8) {
+                if (s != null && s.indexOf(';') != -1) {
+                    addDescriptorClasses(s, result);
+                }
+            }
+        }
+        return result;
+    }
+
+    static void addDescriptorClasses(String descriptor, Set<String> result) {
+        Matcher m = DESCRIPTOR_CLASS.matcher(descriptor);
+        while (m.find()) {
+            result.add(m.group(1).replace('/', '.'));
+        }
+    }
+
+    /**
+     * Packages the contents of class directories into an uncompressed JAR file in a single pass.
+     * The provider files created by ServiceProviderProcessor (the processor for the
+     * {@code @ServiceProvider} annotation) in {@value #PROVIDERS_INF} are merged into one file per
+     * service in {@value #SERVICES_INF} and the {@code *_OptionDescriptors} classes created by
+     * OptionProcessor (the processor for the {@code @Option} annotation) are listed in
+     * {@value #OPTION_DESCRIPTORS}. A {@value #VMCONFIG} file created by HotSpotVMConfigProcessor
+     * is copied to {@code vmconfigDir} unless an identical copy is already there (which would
+     * otherwise cause a recompilation of the C++ code including it).
+     */
+    static void jar(File jarFile, File vmconfigDir, List<File> classDirs) throws IOException {
+        SortedMap<String, File> files = new TreeMap<>();
+        for (File dir : classDirs) {
+            collectFiles(dir, "", files);
+        }
+
+        Map<String, StringBuilder> generated = new TreeMap<>();
+        for (Iterator<Map.Entry<String, File>> i = files.entrySet().iterator(); i.hasNext();) {
+            Map.Entry<String, File> e = i.next();
+            String name = e.getKey();
+            if (name.startsWith(PROVIDERS_INF) || name.startsWith(SERVICES_INF) || name.equals(OPTION_DESCRIPTORS)) {
+                String target = name;
+                String content = new String(Files.readAllBytes(e.getValue().toPath()), "UTF-8");
+                if (name.startsWith(PROVIDERS_INF)) {
+                    target = SERVICES_INF + content.trim();
+                    content = name.substring(PROVIDERS_INF.length()) + "\n";
+                }
+                append(generated, target, content);
+                i.remove();
+            } else if (name.endsWith("_OptionDescriptors.class")) {
+                append(generated, OPTION_DESCRIPTORS, name.substring(0, name.length() - ".class".length()).replace('/', '.') + "\n");
+            } else if (name.equals(VMCONFIG)) {
+                copyIfDifferent(e.getValue(), new File(vmconfigDir, "HotSpotVMConfig.inline.hpp"));
+            }
+        }
+
+        SortedMap<String, byte[]> entries = new TreeMap<>();
+        for (Map.Entry<String, StringBuilder> e : generated.entrySet()) {
+            entries.put(e.getKey(), e.getValue().toString().getBytes("UTF-8"));
+        }
+        for (Map.Entry<String, File> e : files.entrySet()) {
+            entries.put(e.getKey(), Files.readAllBytes(e.getValue().toPath()));
+        }
+        if (!entries.containsKey(JarFile.MANIFEST_NAME)) {
+            entries.put(JarFile.MANIFEST_NAME, "Manifest-Version: 1.0\r\n\r\n".getBytes("UTF-8"));
+        }
+
+        // The manifest must come first, followed by the other entries with their directories
+        Set<String> names = new LinkedHashSet<>();
+        names.add("META-INF/");
+        names.add(JarFile.MANIFEST_NAME);
+        for (String name : entries.keySet()) {
+            for (int slash = name.indexOf('/'); slash != -1; slash = name.indexOf('/', slash + 1)) {
+                names.add(name.substring(0, slash + 1));
+            }
+            names.add(name);
+        }
+
+        // If SOURCE_DATE_EPOCH is set (see https://reproducible-builds.org/specs/source-date-epoch/),
+        // all entries get this (UTC) time such that identical inputs produce identical JAR files
+        String sourceDateEpoch = System.getenv("SOURCE_DATE_EPOCH");
+        long fixedTime = -1;
+        if (sourceDateEpoch != null) {
+            fixedTime = Math.max(ZIP_EPOCH, Long.parseLong(sourceDateEpoch.trim())) * 1000;
+            fixedTime -= TimeZone.getDefault().getOffset(fixedTime);
+        }
+
+        jarFile.getAbsoluteFile().getParentFile().mkdirs();
+        File tmp = new File(jarFile.getPath() + ".tmp");
+        try (JarOutputStream out = new JarOutputStream(new BufferedOutputStream(new FileOutputStream(tmp)))) {
+            for (String name : names) {
+                byte[] data = name.endsWith("/") ? new byte[0] : entries.get(name);
+                File file = files.get(name);
+                ZipEntry entry = new ZipEntry(name);
+                entry.setTime(fixedTime != -1 ? fixedTime : file != null ? file.lastModified() : System.currentTimeMillis());
+                entry.setMethod(ZipEntry.STORED);
+                entry.setSize(data.length);
+                entry.setCompressedSize(data.length);
+                CRC32 crc = new CRC32();
+                crc.update(data);
+                entry.setCrc(crc.getValue());
+                out.putNextEntry(entry);
+                out.write(data);
+                out.closeEntry();
+            }
+        }
+        Files.move(tmp.toPath(), jarFile.toPath(), StandardCopyOption.REPLACE_EXISTING);
+    }
+
+    /**
+     * Copies each JAR file into {@code dir} and the contents of its {@value #SERVICES_INF}
+     * directory into {@code dir/jvmci.services}, without extracting the rest of the JAR file.
+     */
+    static void extract(File dir, List<File> jars) throws IOException {
+        File servicesDir = new File(dir, "jvmci.services");
+        for (File jar : jars) {
+            try (ZipFile zf = new ZipFile(jar)) {
+                for (Enumeration<? extends ZipEntry> e = zf.entries(); e.hasMoreElements();) {
+                    ZipEntry entry = e.nextElement();
+                    if (entry.getName().startsWith(SERVICES_INF) && !entry.isDirectory()) {
+                        servicesDir.mkdirs();
+                        try (InputStream in = zf.getInputStream(entry)) {
+                            Files.copy(in, new File(servicesDir, entry.getName().substring(SERVICES_INF.length())).toPath(), StandardCopyOption.REPLACE_EXISTING);
+                        }
+                    }
+                }
+            }
+            dir.mkdirs();
+            Files.copy(jar.toPath(), new File(dir, jar.getName()).toPath(), StandardCopyOption.REPLACE_EXISTING);
+        }
+    }
+
+    static void append(Map<String, StringBuilder> generated, String name, String content) {
+        StringBuilder sb = generated.get(name);
+        if (sb == null) {
+            sb = new StringBuilder();
+            generated.put(name, sb);
+        }
+        sb.append(content);
+    }
+
+    /**
+     * Adds the files below {@code dir} to {@code files}, keyed by their path relative to the
+     * class directory. Files in later class directories replace those with the same path in
+     * earlier ones.
+     */
+    static void collectFiles(File dir, String prefix, Map<String, File> files) {
+        File[] children = dir.listFiles();
+        if (children != null) {
+            for (File child : children) {
+                if (child.isDirectory()) {
+                    collectFiles(child, prefix + child.getName() + "/", files);
+                } else {
+                    files.put(prefix + child.getName(), child);
+                }
+            }
+        }
+    }
+
+    static void copyIfDifferent(File from, File to) throws IOException {
+        byte[] data = Files.readAllBytes(from.toPath());
+        if (!to.exists() || !Arrays.equals(data, Files.readAllBytes(to.toPath()))) {
+            to.getParentFile().mkdirs();
+            Files.write(to.toPath(), data);
+        }
+    }
+
+    static String option(List<String> options, String name, String alias) {
+        for (int i = 0; i < options.size() - 1; i++) {
+            if (options.get(i).equals(name) || options.get(i).equals(alias)) {
+                return options.get(i + 1);
+            }
+        }
+        return null;
+    }
+
+    static void setOption(List<String> options, String name, String value) {
+        for (int i = 0; i < options.size() - 1; i++) {
+            if (options.get(i).equals(name) || (name.equals("-cp") && options.get(i).equals("-classpath"))) {
+                options.set(i + 1, value);
+                return;
+            }
+        }
+        options.add(name);
+        options.add(value);
+    }
+
+    static List<File> directories(String path) {
+        List<File> result = new ArrayList<>();
+        if (path != null) {
+            for (String entry : path.split(File.pathSeparator)) {
+                if (!entry.isEmpty() && new File(entry).isDirectory()) {
+                    result.add(new File(entry));
+                }
+            }
+        }
+        return result;
+    }
+
+    static Set<String> readChanged(File changedFile, long since) throws IOException {
+        Set<String> result = new HashSet<>();
+        if (changedFile.exists()) {
+            try (BufferedReader in = new BufferedReader(new FileReader(changedFile))) {
+                for (String line = in.readLine(); line != null; line = in.readLine()) {
+                    int space = line.indexOf(' ');
+                    if (space != -1 && Long.parseLong(line.substring(0, space)) > since) {
+                        result.add(line.substring(space + 1));
+                    }
+                }
+            }
+        }
+        return result;
+    }
+
+    /**
+     * Reads a dependency file made up of lines of the form "S &lt;source&gt;" followed by lines of
+     * the form "P &lt;produced class&gt;" and "R &lt;referenced class&gt;".
+     */
+    static Map<String, SourceInfo> readDeps(File depsFile) throws IOException {
+        if (!depsFile.exists()) {
+            return null;
+        }
+        Map<String, SourceInfo> deps = new HashMap<>();
+        try (BufferedReader in = new BufferedReader(new FileReader(depsFile))) {
+            SourceInfo info = null;
+            for (String line = in.readLine(); line != null; line = in.readLine()) {
+                if (line.length() < 2 || (info == null && line.charAt(0) != 'S')) {
+                    return null;
+                }
+                String value = line.substring(2);
+                switch (line.charAt(0)) {
+                    case 'S':
+                        info = new SourceInfo();
+                        deps.put(value, info);
+                        break;
+                    case 'P':
+                        info.produced.add(value);
+                        break;
+                    case 'R':
+                        info.referenced.add(value);
+                        break;
+                    case 'G':
+                        info.generated.add(value);
+                        break;
+                    default:
+                        return null;
+                }
+            }
+        }
+        return deps;
+    }
+
+    static void writeDeps(File depsFile, Map<String, SourceInfo> deps) throws IOException {
+        File tmp = sibling(depsFile, ".tmp");
+        try (PrintStream out = new PrintStream(new FileOutputStream(tmp))) {
+            for (String source : new TreeSet<>(deps.keySet())) {
+                SourceInfo info = deps.get(source);
+                out.println("S " + source);
+                for (String c : info.produced) {
+                    out.println("P " + c);
+                }
+                for (String c : info.referenced) {
+                    out.println("R " + c);
+                }
+                for (String f : info.generated) {
+                    out.println("G " + f);
+                }
+            }
+        }
+        if (!tmp.renameTo(depsFile)) {
+            depsFile.delete();
+            if (!tmp.renameTo(depsFile)) {
+                throw new IOException("Could not rename " + tmp + " to " + depsFile);
+            }
+        }
+    }
+
+    static void deleteContents(File dir) {
+        File[] files = dir.listFiles();
+        if (files != null) {
+            for (File f : files) {
+                if (f.isDirectory()) {
+                    deleteContents(f);
+                }
+                f.delete();
+            }
+        }
+    }
+}